@@ -1,49 +1,86 @@
 import os
 import json
+import hashlib
 from termcolor import colored
 from dotenv import load_dotenv
 from typing import List, Literal
 from pydantic import BaseModel, Field
 from langchain_openai import ChatOpenAI
 from langchain.agents import create_agent
+from langchain_core.messages import ToolMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from tools.scrapper import scrape_url_info
 from tools.get_domain_info import get_domain_info
+from tools.get_dns_info import get_dns_info
+from tools.get_ssl_crt import get_ssl_info
+from tools.brand_lookalike import check_brand_impersonation
+from tools.lexical_prior import lexical_prior, load_model, prior_ready
 from langchain_core.prompts import PromptTemplate
+from langchain_core.tools import tool
 from tools.check_verified_reviews import get_trustpilot_review, extract_with_diffbot
 from tools.final_report import submit_final_report, TrustReport
 from tools.check_community_discussion import check_reddit_reviews
+from tools.evidence_index import with_evidence_retrieval, start_analysis_index, save_analysis_index
+from llm_router import make_chat_model
+from checkpoints import get_checkpointer, run_checkpointed, thread_id, final_verdict, save_final_verdict, history_length
+from freshness import SignalTracker
+from evidence_store import get_evidence_store
+from tracing import annotate, traced
+from token_usage import UsageMeter, record_usage_totals
 import time
 
 
+# Bump when the prompt file, tool set or output schema changes on purpose
+PROMPT_VERSION = "3"
+
+
+def canonical_json(value, indent=None) -> str:
+    return json.dumps(value, sort_keys=True, indent=indent, separators=None if indent else (",", ":"), ensure_ascii=False)
+
+
+def tool_specs(all_tools: List) -> List[dict]:
+    """Name, description and argument schema of every tool, sorted by name."""
+    specs = [convert_to_openai_tool(tool)["function"] for tool in all_tools]
+    return sorted(specs, key=lambda spec: spec["name"])
+
+
+def prompt_fingerprint(system_prompt: str) -> str:
+    return f"v{PROMPT_VERSION}:{hashlib.sha256(system_prompt.encode('utf-8')).hexdigest()[:12]}"
+
+
 def get_system_prompt(file_path: str, all_tools: List) -> str:
+    """Build the shared system prompt prefix.
+
+    Tool specs and the output schema are rendered as canonical JSON so the
+    prefix is byte-identical across requests and provider prompt caching can
+    reuse it; everything domain-specific goes in the user message after it.
+    """
     try:
         with open(file_path, "r", encoding="UTF-8") as file:
             system_prompt = file.read()
 
         agent_template = PromptTemplate(
-            input_variables=["agent_tools"],
+            input_variables=["agent_tools", "output_schema"],
             template=system_prompt,
         )
-        agent_tools = {
-            f"{tool}" : f"{tool.__doc__}" 
-            for tool in all_tools
-        }
 
         system_prompt = agent_template.format(
-            agent_tools=json.dumps(agent_tools)
+            agent_tools=canonical_json(tool_specs(all_tools)),
+            output_schema=canonical_json(domain_response, indent=2),
         )
 
-        print("Agent prompt loaded successfully!")
+        print(f"Agent prompt loaded successfully! ({prompt_fingerprint(system_prompt)})")
         return system_prompt
 
     except FileNotFoundError:
-        print(f"Error: System prompt file not found at {system_prompt}.")
+        print(f"Error: System prompt file not found at {file_path}.")
 
     except KeyError as e:
         print(
-            f"Error: Missing key in system prompt file: {e}. Check the 'agent_config' and 'system_prompt' keys."
+            f"Error: Missing key in system prompt file: {e}. Check the 'agent_tools' and 'output_schema' placeholders."
         )
 
+
 # THE PYDANTIC "FINAL ANSWER" SCHEMA ---
 class TrustReport(BaseModel):
     """The structured trust report for the web extension."""
@@ -61,6 +98,8 @@ class TrustReport(BaseModel):
     )
 
 domain_response = {
+  "title": "domain_response",
+  "description": "The trust verdict for the analysed domain.",
   "type": "object",
   "properties": {
     "Risk Level": {
@@ -88,34 +127,187 @@ domain_response = {
   "required": ["Risk Level", "Rationale", "Confidence Level"]
 }
 
-# MAIN AGENT WORKFLOW ---
-def run_agent_workflow(url: str) -> TrustReport:
-    start_time = time.time()
-    prompt_file_path = "prompts/refined_prompt.md"
+# MODEL CASCADE ---
+# Cheapest model first; the next tier re-judges the same evidence only when needed.
+# A tier may list several providers joined with "|" (e.g. "gpt-5-nano|google_genai:gemini-2.5-flash"),
+# which are routed by latency and health.
+MODEL_TIERS = [m.strip() for m in os.getenv("AGENT_MODEL_TIERS", "gpt-5-nano,gpt-5-mini").split(",") if m.strip()]
+CONFIDENCE_THRESHOLD = float(os.getenv("CASCADE_CONFIDENCE_THRESHOLD", "70"))
+CHECKPOINTS_ENABLED = os.getenv("AGENT_CHECKPOINTS", "true").lower() == "true"
+FRESHNESS_ENABLED = os.getenv("SIGNAL_FRESHNESS", "true").lower() == "true"
+EVIDENCE_STORE_ENABLED = os.getenv("EVIDENCE_STORE", "true").lower() == "true"
+# Off until the lexical model is trained and evaluated on a real labelled set (see tools.lexical_prior)
+LEXICAL_PRIOR_ENABLED = os.getenv("LEXICAL_PRIOR", "false").lower() == "true"
 
-    all_tools = [
-        get_domain_info,
-        scrape_url_info,
-        check_reddit_reviews,
-        get_trustpilot_review
-    ]
+SIGNAL_TOOLS = [
+    get_domain_info,
+    get_dns_info,
+    get_ssl_info,
+    check_brand_impersonation,
+    tool(scrape_url_info),
+    check_reddit_reviews,
+    get_trustpilot_review,
+]
 
-    input_prompt = get_system_prompt(prompt_file_path, all_tools)
-    llm = ChatOpenAI(model="gpt-5-nano")
-    agent = create_agent(
-        model=llm,
-        tools=all_tools,
-        system_prompt=input_prompt,
+# Evidence-heavy tools answer with top BM25 passages instead of raw output
+EVIDENCE_SOURCES = {
+    "scrape_url_info": "scam_detector",
+    "check_reddit_reviews": "reddit",
+    "get_trustpilot_review": "trustpilot",
+}
+
+ESCALATION_PROMPT = """You are a senior reviewer of e-commerce domain trust assessments.
+A first-pass analyst already collected the evidence below with its tools. Do not ask for more
+evidence; weigh what is given and produce the final verdict in the required format."""
+
+
+def build_agent(model: str, tools: List, system_prompt: str, checkpointer=None):
+    return create_agent(
+        model=make_chat_model(model),
+        tools=tools,
+        system_prompt=system_prompt,
         response_format=domain_response,
+        checkpointer=checkpointer,
     )
 
-    response = agent.invoke(
+
+def needs_escalation(reply: dict, threshold: float = CONFIDENCE_THRESHOLD) -> bool:
+    """Escalate low-confidence, unscored or "Mixed" verdicts to a larger model."""
+    confidence = reply.get("Confidence Level") if isinstance(reply, dict) else None
+    if not isinstance(confidence, (int, float)):
+        return True
+    return confidence < threshold or reply.get("Risk Level") == "Mixed"
+
+
+def collect_evidence(messages: List) -> str:
+    """Render the tool outputs of an agent run as one evidence block."""
+    sections = [
+        f"### {message.name}\n{message.content}"
+        for message in messages if isinstance(message, ToolMessage)
+    ]
+    return "\n\n".join(sections) if sections else "No tool evidence was collected."
+
+
+@traced("escalate")
+def escalate(url: str, response: dict, reply: dict, model: str, meter: UsageMeter = None) -> dict:
+    """Re-run the verdict for `url` on `model` using the evidence of a previous run."""
+    reviewer = build_agent(model, [], ESCALATION_PROMPT)
+    escalated = reviewer.invoke(
         {
             "messages": [
-                {"role": "user", "content": f"Is this domain legit {url}. Strictly use the domain name as provided without converting to url"}
+                {
+                    "role": "user",
+                    "content": (
+                        f"Domain: {url}\n\n"
+                        f"First-pass verdict: {json.dumps(reply)}\n\n"
+                        f"Evidence:\n{collect_evidence(response['messages'])}"
+                    ),
+                }
             ]
         }
     )
+    if meter is not None:
+        meter.record_turns(escalated["messages"], tier=MODEL_TIERS.index(model) + 1 if model in MODEL_TIERS else None)
+    return escalated["structured_response"]
+
+
+def with_usage(reply: dict, meter: UsageMeter) -> dict:
+    """The verdict plus this run's token/payload accounting under "Usage" (not stored with the verdict)."""
+    usage = meter.summary()
+    record_usage_totals(usage)
+    annotate(**usage["totals"])
+    print(colored(f"[USAGE] {usage['totals']}, tools by tokens: "
+                  f"{ {name: entry['tokens'] for name, entry in usage['tools'].items()} }", "blue"))
+    return {**reply, "Usage": usage}
+
+
+# MAIN AGENT WORKFLOW ---
+def run_agent_workflow(url: str, request_id: str = None) -> TrustReport:
+    start_time = time.time()
+    prompt_file_path = "prompts/refined_prompt.md"
+    meter = UsageMeter()
+
+    # Only a request id can be retried, so only those runs are checkpointed
+    checkpointer = get_checkpointer() if CHECKPOINTS_ENABLED and request_id else None
+    thread = thread_id(url, request_id) if checkpointer is not None else None
+    if checkpointer is not None:
+        stored = final_verdict(checkpointer, thread)
+        if stored is not None:
+            # A retry of a finished request: nothing is re-run, re-counted or stored again
+            print(colored(f"[CHECKPOINT] Returning the final verdict of {thread}", "blue"))
+            annotate(verdict_reused=True)
+            return {**stored, "Usage": meter.summary()}
+
+    # Each signal tool is wrapped in layers (tools.tool_wrapper.wrap_tool), innermost first:
+    #   1. evidence store: appends every real upstream call to the history
+    #   2. freshness: serves a fresh stored signal instead of calling layer 1
+    #   3. evidence retrieval: compacts long outputs to their most relevant passages
+    #   4. token usage: measures what finally enters the agent context
+    store = get_evidence_store() if EVIDENCE_STORE_ENABLED else None
+    signal_tools = [store.wrap(url, base) if store is not None else base for base in SIGNAL_TOOLS]
+
+    # A re-check only refreshes stale signals, and skips the LLM when none changed
+    tracker = SignalTracker(url) if FRESHNESS_ENABLED else None
+    if tracker is not None and tracker.previous_verdict is not None:
+        refreshed = tracker.refresh_stale(signal_tools)
+        print(colored(f"[FRESH] Refreshed {refreshed}, changed {sorted(tracker.changed)} for {url}", "blue"))
+        if tracker.can_reuse_verdict(signal_tools):
+            # The refreshed signals stay fresh for the next re-check; the verdict keeps its assessment time
+            tracker.keep_verdict()
+            reply = dict(tracker.previous_verdict)
+            reply["Reused Verdict"] = {"assessed_at": tracker.previous["checked_at"]}
+            annotate(verdict_reused=True)
+            if store is not None:
+                store.append_verdict(url, reply)
+            if checkpointer is not None:
+                save_final_verdict(checkpointer, thread, reply)
+            print(colored(f"[TIME] Time taken for agent workflow: {time.time() - start_time} seconds", "blue"))
+            return with_usage(reply, meter)
+
+    # Sorted by name so the tool definitions sent to the provider never reorder
+    all_tools = []
+    for base in signal_tools:
+        agent_tool = tracker.wrap(base) if tracker is not None else base
+        if agent_tool.name in EVIDENCE_SOURCES:
+            agent_tool = with_evidence_retrieval(EVIDENCE_SOURCES[agent_tool.name], agent_tool)
+        all_tools.append(meter.wrap(agent_tool))
+    all_tools.sort(key=lambda agent_tool: agent_tool.name)
+    start_analysis_index(url)
+
+    input_prompt = get_system_prompt(prompt_file_path, all_tools)
+    inputs = {
+        "messages": [
+            # Everything domain-specific lives in this message, after the shared, cacheable system prompt
+            {"role": "user", "content": f"Strictly use the domain name as provided without converting to url. Is this domain legit: {url}"}
+        ]
+    }
+    if LEXICAL_PRIOR_ENABLED:
+        try:
+            model = load_model()
+            if prior_ready(model):
+                prior = lexical_prior(url, model)
+                inputs["messages"][0]["content"] += (
+                    f"\n\nLexical prior from the domain string alone (weak signal, 0 = benign, 1 = scam-like): "
+                    f"{prior['score']}" + (f", driven by {', '.join(prior['drivers'])}" if prior["drivers"] else "")
+                )
+            else:
+                print(colored(f"[PRIOR] Lexical model not validated, prior skipped: {model.get('evaluation')}", "red"))
+        except OSError as e:
+            print(colored(f"[PRIOR] Lexical model unavailable: {e}", "red"))
+
+    change_note = tracker.change_note() if tracker is not None else ""
+    if change_note:
+        inputs["messages"][0]["content"] += f"\n\n{change_note}"
+
+    if checkpointer is not None:
+        # Retries of the same domain/request resume from the last completed step
+        agent = build_agent(MODEL_TIERS[0], all_tools, input_prompt, checkpointer=checkpointer)
+        seen = history_length(agent, thread)
+        response = run_checkpointed(agent, inputs, thread, checkpointer)
+    else:
+        agent = build_agent(MODEL_TIERS[0], all_tools, input_prompt)
+        seen = 0
+        response = agent.invoke(inputs)
     # count = 0
     # print(colored(50 * "=", "green"))
     # for chunk in agent.stream(
@@ -136,15 +328,40 @@ def run_agent_workflow(url: str) -> TrustReport:
     #     print(colored(50 * "=", "green"))
     #     print("\n\n")
 
+    save_analysis_index(url)
+
     print(colored(f"[TIME] Time taken for agent workflow: {time.time() - start_time} seconds", "blue"))
     print(colored(f"[DEBUG] Response: {response}", "yellow"))
     reply = response["structured_response"]  # <-- fix
 
+    # A resumed (or reused) thread returns its whole history; only this invocation's turns are counted
+    new_messages = response["messages"][seen:]
+    meter.record_turns(new_messages)
+
+    tier = 0
+    while needs_escalation(reply) and tier + 1 < len(MODEL_TIERS):
+        tier += 1
+        print(colored(f"[CASCADE] Escalating {url} to {MODEL_TIERS[tier]} (verdict: {reply})", "magenta"))
+        reply = escalate(url, response, reply, MODEL_TIERS[tier], meter)
+
+    reply["Model Tier"] = {"tier": tier + 1, "model": MODEL_TIERS[tier]}
+    # Prompt caching is read off the meter, so escalation turns count too
+    totals = meter.summary()["totals"]
+    print(colored(f"[CACHE] Prompt tokens for {url}: {totals['cached_tokens']} of {totals['input_tokens']} cached", "blue"))
+    annotate(model_tier=tier + 1, prompt_version=PROMPT_VERSION,
+             prompt_input_tokens=totals["input_tokens"], prompt_cached_tokens=totals["cached_tokens"])
+    if tracker is not None:
+        tracker.save(reply)
+    if store is not None:
+        store.append_verdict(url, reply)
+    if checkpointer is not None:
+        save_final_verdict(checkpointer, thread, reply)
+
     # reply = reply.replace("```json", "").replace("```", "").replace("\n", "").strip()
 
     print(colored(f"[DEBUG] Reply: {reply}", "blue"))
 
-    return reply
+    return with_usage(reply, meter)
 
     # return response["structured_response"].model_dump()
     # return {"status": "Done streaming"}
@@ -1,14 +1,28 @@
 import os
-from fastapi import  FastAPI
+import time
+from typing import Optional
+from fastapi import  FastAPI, Header, HTTPException, Query, Request, Response, BackgroundTasks
+from fastapi.responses import FileResponse, PlainTextResponse
 from tools.scrapper import scrape_url_info
 from dotenv import load_dotenv
 from agent_workflow import run_agent_workflow
+from reputation import reputation_verdict
+from profiler import is_admin, profile, request_window, start_window_watcher, list_profiles, profile_path
+from token_usage import metrics_text
+from llm_router import provider_metrics_text
+from tools.cache import shared_cache, single_flight, lease_owner
+from tracing import span, traced, annotate, instrument_requests, get_trace, recent_traces, to_otlp, render_waterfall
+from verdict_store import get_verdict_store, normalize_domain, etag_matches, is_fresh, can_serve_stale, cache_headers
 from fastapi.middleware.cors import CORSMiddleware
 
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+ANALYSIS_LEASE_TTL = int(os.getenv("ANALYSIS_LEASE_TTL", 600))  # seconds; longer than the slowest analysis
+ANALYSIS_WAIT_TIMEOUT = int(os.getenv("ANALYSIS_WAIT_TIMEOUT", 120))  # seconds a request waits for another worker
 
 app = FastAPI()
+instrument_requests()
+start_window_watcher()
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,19 +32,138 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    if request.url.path.startswith(("/debug", "/health", "/metrics")):
+        return await call_next(request)
+    with span(f"{request.method} {request.url.path}", path=request.url.path,
+              request_id=request.headers.get("x-request-id")) as root:
+        request.state.trace_root = root
+        response = await call_next(request)
+        if root is not None:
+            root.set(status_code=response.status_code)
+            response.headers["X-Trace-ID"] = root.trace_id
+        return response
+
 @app.get("/health")
 def read_root():
     return {"message": "Service is up and running"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return metrics_text() + provider_metrics_text()
+
+def analyze(url: str, request_id: Optional[str] = None):
+    """(verdict, usage) of a fresh analysis; usage accounting is returned, never stored with the verdict."""
+    verdict = run_agent_workflow(url=url, request_id=request_id)
+    return verdict, verdict.pop("Usage", None)
+
+
+def analyze_once(url: str, request_id: Optional[str] = None):
+    """(stored record, usage) of an analysis that runs in one worker at a time per domain.
+
+    Requests arriving while any worker analyses the domain wait for that
+    verdict instead of repeating the run; they get no usage of their own.
+    """
+    store = get_verdict_store()
+    started = time.time()
+
+    def run():
+        verdict, usage = analyze(url, request_id)
+        return store.put(url, verdict), usage
+
+    def finished_elsewhere():
+        record = store.get(url)
+        return (record, None) if record is not None and record["updated_at"] >= started else None
+
+    return single_flight(shared_cache("leases"), normalize_domain(url), run, finished_elsewhere,
+                         lease_ttl=ANALYSIS_LEASE_TTL, wait_timeout=ANALYSIS_WAIT_TIMEOUT)
+
+
+def revalidate(url: str, request_id: Optional[str] = None):
+    """Re-run the analysis for a stale verdict, unless a worker is already analysing the domain."""
+    domain = normalize_domain(url)
+    leases, owner = shared_cache("leases"), lease_owner()
+    if not leases.acquire_lease(domain, owner, ANALYSIS_LEASE_TTL):
+        return
+    try:
+        with span("revalidate", new_trace=True, url=url):
+            get_verdict_store().put(url, analyze(url, request_id)[0])
+    except Exception as e:
+        print(f"Background refresh of {domain} failed: {e}")
+    finally:
+        leases.release_lease(domain, owner)
+
+
 @app.get("/validate_url")
-def validate_url(url: str = "enroutejewelry.com", mode: str = "requests"):
+@traced("validate_url", require_trace=False)
+def validate_url(
+    request: Request,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    url: str = "enroutejewelry.com",
+    mode: str = "requests",
+    x_request_id: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    profile_analysis: bool = Query(False, alias="profile"),
+    x_admin_token: Optional[str] = Header(None),
+    debug: bool = False,
+):
 
     # Placeholder for URL validation logic
+    root = getattr(request.state, "trace_root", None)
+    if root is not None:
+        annotate(url=url, threadpool_wait_ms=round((time.time_ns() - root.start_ns) / 1e6, 1))
+
+    # Listed domains are answered before any tool runs
+    result = reputation_verdict(url)
+    if result is not None:
+        result.update({"url": url})
+        return result
 
-    print("🧠 Running LLM analysis ...")
+    # A fresh server-side verdict is answered (or confirmed with a 304) without any work;
+    # a recently expired one is served while it is refreshed in the background
+    store = get_verdict_store()
+    record = store.get(url)
+    verdict_cache = "miss" if record is None else "fresh" if is_fresh(record) else "stale"
+    annotate(verdict_cache=verdict_cache)
+    usage = None
+    # A profiled request always runs the analysis it was asked to profile
+    profile_analysis = profile_analysis and is_admin(x_admin_token)
+    if profile_analysis:
+        record = None
+    if record is not None and not is_fresh(record):
+        if can_serve_stale(record):
+            background_tasks.add_task(revalidate, url, x_request_id)
+        else:
+            record = None
 
-    result = run_agent_workflow(url=url)
+    if record is None:
+        print("🧠 Running LLM analysis ...")
+
+        # Client retries carrying the same X-Request-ID resume the interrupted analysis
+        if profile_analysis:
+            with profile(f"analysis-{normalize_domain(url)}") as profile_file:
+                verdict, usage = analyze(url, x_request_id)
+            response.headers["X-Profile"] = profile_file or "busy"
+            record = store.put(url, verdict)
+        else:
+            record, usage = analyze_once(url, x_request_id)
+
+    result = dict(record["verdict"])
     result.update({"url": url})
+    if debug:
+        # Token/payload accounting exists only for requests that ran the analysis; a debug
+        # body is specific to this request, so it is never validated or cached
+        result["Debug"] = {"verdict_cache": verdict_cache, "usage": usage}
+        response.headers["Cache-Control"] = "no-store"
+        return result
+
+    headers = cache_headers(record)
+    if etag_matches(if_none_match, record["etag"]):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
     
     return result
 
@@ -43,3 +176,57 @@ def validate_url(url: str = "enroutejewelry.com", mode: str = "requests"):
     #     ],
     #     "Confidence Level": 60,
     # }
+
+@app.get("/verdicts/snapshot")
+def verdicts_snapshot(since: int = 0, if_none_match: Optional[str] = Header(None)):
+    """All current verdicts, or those changed after version `since`, for local lookups in the extension."""
+    store = get_verdict_store()
+    etag = f'"{store.version}-{since}"'
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    version, data = store.snapshot(since)
+    return Response(
+        content=data,
+        media_type="application/vnd.rulegit.snapshot+msgpack+zstd",
+        headers={"ETag": f'"{version}-{since}"', "X-Snapshot-Version": str(version), "X-Snapshot-Since": str(since)},
+    )
+
+def require_admin(x_admin_token: Optional[str]):
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Needs ADMIN_TOKEN and a matching X-Admin-Token header")
+
+# Traces carry URLs, tool inputs and timings of other users' requests
+@app.get("/debug/traces")
+def debug_traces(limit: int = 50, x_admin_token: Optional[str] = Header(None)):
+    require_admin(x_admin_token)
+    return recent_traces(limit)
+
+@app.get("/debug/traces/{trace_id}")
+def debug_trace(trace_id: str, x_admin_token: Optional[str] = Header(None)):
+    require_admin(x_admin_token)
+    return to_otlp(get_trace(trace_id))
+
+@app.get("/debug/traces/{trace_id}/waterfall", response_class=PlainTextResponse)
+def debug_trace_waterfall(trace_id: str, x_admin_token: Optional[str] = Header(None)):
+    require_admin(x_admin_token)
+    return render_waterfall(trace_id)
+
+@app.post("/admin/profile")
+def admin_profile(seconds: float = 30, x_admin_token: Optional[str] = Header(None)):
+    """Profile every worker for the next `seconds`; each writes window-<id>-<pid>.collapsed."""
+    require_admin(x_admin_token)
+    return request_window(seconds)
+
+@app.get("/admin/profiles")
+def admin_profiles(x_admin_token: Optional[str] = Header(None)):
+    require_admin(x_admin_token)
+    return list_profiles()
+
+@app.get("/admin/profiles/{name}")
+def admin_profile_file(name: str, x_admin_token: Optional[str] = Header(None)):
+    require_admin(x_admin_token)
+    path = profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"No profile {name}")
+    return FileResponse(path, media_type="text/plain")
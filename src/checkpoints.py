@@ -0,0 +1,127 @@
+"""SQLite checkpoints for agent runs.
+
+An analysis that carries a request id runs on a LangGraph thread keyed by
+domain and request, and the agent state is checkpointed after each step. A
+retry of the same request resumes from the last completed step (finished
+tool calls are not repeated); once the whole workflow finished, the final
+verdict (after escalation) is kept on the thread and a retry gets it back
+as is. Requests without an id are not checkpointed: nothing could resume
+them. Threads older than CHECKPOINT_TTL are garbage-collected.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Optional
+from langgraph.checkpoint.sqlite import SqliteSaver
+from tools.cache import CACHE_DIR
+
+CHECKPOINT_PATH = os.path.join(CACHE_DIR, "checkpoints.sqlite")
+CHECKPOINT_TTL = float(os.getenv("CHECKPOINT_TTL", str(24 * 3600)))
+GC_INTERVAL = 3600  # seconds between garbage collections
+
+_lock = threading.Lock()
+_saver: Optional[SqliteSaver] = None
+_last_gc = 0.0
+
+
+def get_checkpointer() -> SqliteSaver:
+    global _saver
+    with _lock:
+        if _saver is None:
+            os.makedirs(os.path.dirname(CHECKPOINT_PATH), exist_ok=True)
+            conn = sqlite3.connect(CHECKPOINT_PATH, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoint_threads ("
+                " thread_id TEXT PRIMARY KEY,"
+                " updated_at REAL NOT NULL,"
+                " verdict TEXT)"
+            )
+            if "verdict" not in [row[1] for row in conn.execute("PRAGMA table_info(checkpoint_threads)")]:
+                conn.execute("ALTER TABLE checkpoint_threads ADD COLUMN verdict TEXT")
+            conn.commit()
+            _saver = SqliteSaver(conn)
+        return _saver
+
+
+def thread_id(domain: str, request_id: str) -> str:
+    """Thread key for the analysis of `domain` requested as `request_id`."""
+    domain = domain.strip().lower()
+    return f"{domain}:{request_id}"
+
+
+def touch_thread(saver: SqliteSaver, thread: str) -> None:
+    with saver.lock:
+        saver.conn.execute(
+            "INSERT INTO checkpoint_threads (thread_id, updated_at) VALUES (?, ?)"
+            " ON CONFLICT (thread_id) DO UPDATE SET updated_at = excluded.updated_at",
+            (thread, time.time()),
+        )
+        saver.conn.commit()
+
+
+def save_final_verdict(saver: SqliteSaver, thread: str, verdict: dict) -> None:
+    """Keep the workflow's final verdict on its thread for retries of the same request."""
+    with saver.lock:
+        saver.conn.execute(
+            "INSERT INTO checkpoint_threads (thread_id, updated_at, verdict) VALUES (?, ?, ?)"
+            " ON CONFLICT (thread_id) DO UPDATE SET updated_at = excluded.updated_at, verdict = excluded.verdict",
+            (thread, time.time(), json.dumps(verdict, default=str)),
+        )
+        saver.conn.commit()
+
+
+def final_verdict(saver: SqliteSaver, thread: str) -> Optional[dict]:
+    with saver.lock:
+        row = saver.conn.execute("SELECT verdict FROM checkpoint_threads WHERE thread_id = ?", (thread,)).fetchone()
+    return json.loads(row[0]) if row and row[0] else None
+
+
+def gc_checkpoints(saver: SqliteSaver, max_age: float = CHECKPOINT_TTL) -> int:
+    """Delete threads not touched for max_age seconds and return how many were removed."""
+    with saver.lock:
+        rows = saver.conn.execute(
+            "SELECT thread_id FROM checkpoint_threads WHERE updated_at <= ?", (time.time() - max_age,)
+        ).fetchall()
+
+    for (thread,) in rows:
+        saver.delete_thread(thread)
+        with saver.lock:
+            saver.conn.execute("DELETE FROM checkpoint_threads WHERE thread_id = ?", (thread,))
+            saver.conn.commit()
+    return len(rows)
+
+
+def maybe_gc_checkpoints(saver: SqliteSaver) -> None:
+    """Run gc_checkpoints at most once per GC_INTERVAL."""
+    global _last_gc
+    if time.time() - _last_gc < GC_INTERVAL:
+        return
+    _last_gc = time.time()
+    removed = gc_checkpoints(saver)
+    if removed:
+        print(f"[CHECKPOINT] Removed {removed} expired threads")
+
+
+def history_length(agent, thread: str) -> int:
+    """Messages already on a thread, so the ones an invocation adds can be told apart."""
+    return len(agent.get_state({"configurable": {"thread_id": thread}}).values.get("messages", []))
+
+
+def run_checkpointed(agent, inputs: dict, thread: str, saver: SqliteSaver) -> dict:
+    """Invoke a checkpointed agent on a thread, resuming or reusing earlier progress."""
+    config = {"configurable": {"thread_id": thread}}
+    touch_thread(saver, thread)
+    maybe_gc_checkpoints(saver)
+
+    state = agent.get_state(config)
+    if state.values.get("structured_response") is not None and not state.next:
+        print(f"[CHECKPOINT] Reusing finished run for {thread}")
+        return state.values
+    if state.next:
+        print(f"[CHECKPOINT] Resuming {thread} at {state.next}")
+        return agent.invoke(None, config)
+    return agent.invoke(inputs, config)
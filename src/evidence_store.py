@@ -0,0 +1,239 @@
+"""Append-only history of tool outputs and verdicts per domain.
+
+Every real tool call and every verdict is written to SQLite with its domain
+and time, so past scans can be audited or re-scored offline without calling
+any upstream. Payloads above COMPRESS_MIN_BYTES are zstd-compressed; tools
+whose output follows a fixed page template (the scam-detector panels) get a
+dictionary trained on their own past outputs once enough samples exist,
+which shrinks those records several times further.
+
+A signal record is the tool's output as the agent receives it before
+evidence retrieval compacts it: already parsed by the tool (the Trustpilot
+summary, the scam-detector panels), not the raw upstream page. `rescore`
+replays those stored signals through any scoring function, so a new
+scorer can be evaluated on past scans; changes to a tool's own parsing
+still need fresh upstream calls.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+import zstandard
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from langchain_core.tools import BaseTool
+from tools.cache import CACHE_DIR
+from tools.tool_wrapper import as_tool, wrap_tool
+
+STORE_PATH = os.path.join(CACHE_DIR, "evidence.sqlite")
+COMPRESS_MIN_BYTES = 512
+COMPRESSION_LEVEL = 9
+DICTIONARY_TOOLS = {"scrape_url_info"}  # outputs sharing one page template
+DICTIONARY_SAMPLES = 200  # records needed before a dictionary is trained
+DICTIONARY_SIZE = 64 * 1024
+EXPORT_BATCH_SIZE = 500
+
+_store = None
+
+
+def get_evidence_store() -> "EvidenceStore":
+    global _store
+    if _store is None:
+        _store = EvidenceStore(STORE_PATH)
+    return _store
+
+
+class EvidenceStore:
+    """SQLite evidence history. Records are only ever inserted, never updated."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS evidence ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " domain TEXT NOT NULL,"
+            " kind TEXT NOT NULL,"
+            " name TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " codec TEXT NOT NULL,"
+            " raw_size INTEGER NOT NULL,"
+            " payload BLOB NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS evidence_domain_time ON evidence (domain, created_at);"
+            "CREATE INDEX IF NOT EXISTS evidence_time ON evidence (created_at);"
+            "CREATE INDEX IF NOT EXISTS evidence_name ON evidence (name, id);"
+            "CREATE TABLE IF NOT EXISTS dictionaries ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " name TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " data BLOB NOT NULL);"
+        )
+        self._conn.commit()
+        self._dictionaries: Dict[int, zstandard.ZstdCompressionDict] = {}
+        self._active: Dict[str, int] = {
+            name: dict_id for dict_id, name in
+            self._conn.execute("SELECT id, name FROM dictionaries ORDER BY id").fetchall()
+        }
+
+    def _dictionary(self, dict_id: int) -> zstandard.ZstdCompressionDict:
+        if dict_id not in self._dictionaries:
+            with self._lock:
+                (data,) = self._conn.execute("SELECT data FROM dictionaries WHERE id = ?", (dict_id,)).fetchone()
+            self._dictionaries[dict_id] = zstandard.ZstdCompressionDict(data)
+        return self._dictionaries[dict_id]
+
+    def _encode(self, name: str, value: Any):
+        raw = json.dumps(value, default=str).encode("utf-8")
+        if len(raw) < COMPRESS_MIN_BYTES:
+            return "raw", len(raw), raw
+        dict_id = self._active.get(name)
+        if dict_id is not None:
+            compressor = zstandard.ZstdCompressor(level=COMPRESSION_LEVEL, dict_data=self._dictionary(dict_id))
+            return f"zstd-dict:{dict_id}", len(raw), compressor.compress(raw)
+        return "zstd", len(raw), zstandard.ZstdCompressor(level=COMPRESSION_LEVEL).compress(raw)
+
+    def _decode(self, codec: str, payload: bytes) -> Any:
+        if codec == "zstd":
+            payload = zstandard.ZstdDecompressor().decompress(payload)
+        elif codec.startswith("zstd-dict:"):
+            dictionary = self._dictionary(int(codec.split(":", 1)[1]))
+            payload = zstandard.ZstdDecompressor(dict_data=dictionary).decompress(payload)
+        return json.loads(payload)
+
+    def append(self, domain: str, kind: str, name: str, value: Any, created_at: Optional[float] = None) -> int:
+        """Insert one record and return its id."""
+        codec, raw_size, payload = self._encode(name, value)
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO evidence (domain, kind, name, created_at, codec, raw_size, payload)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (domain.strip().lower(), kind, name, created_at or time.time(), codec, raw_size, payload),
+            )
+            self._conn.commit()
+            record_id = cursor.lastrowid
+        if name in DICTIONARY_TOOLS and name not in self._active:
+            with self._lock:
+                (count,) = self._conn.execute("SELECT COUNT(*) FROM evidence WHERE name = ?", (name,)).fetchone()
+            # Retry every DICTIONARY_SAMPLES records in case training on too little data failed
+            if count % DICTIONARY_SAMPLES == 0:
+                self.maybe_train_dictionary(name)
+        return record_id
+
+    def append_signal(self, domain: str, name: str, output: Any) -> int:
+        return self.append(domain, "signal", name, output)
+
+    def append_verdict(self, domain: str, verdict: dict) -> int:
+        return self.append(domain, "verdict", "verdict", verdict)
+
+    def maybe_train_dictionary(self, name: str, min_samples: Optional[int] = None) -> Optional[int]:
+        """Train a zstd dictionary on past outputs of a tool once there are enough of them."""
+        min_samples = min_samples or DICTIONARY_SAMPLES
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT codec, payload FROM evidence WHERE name = ? AND codec != 'raw'"
+                " ORDER BY id DESC LIMIT ?", (name, min_samples * 5),
+            ).fetchall()
+        if len(rows) < min_samples:
+            return None
+
+        samples = [json.dumps(self._decode(codec, payload), default=str).encode("utf-8") for codec, payload in rows]
+        try:
+            dictionary = zstandard.train_dictionary(DICTIONARY_SIZE, samples)
+        except zstandard.ZstdError as e:
+            print(f"[EVIDENCE] Dictionary training for {name} failed: {e}")
+            return None
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO dictionaries (name, created_at, data) VALUES (?, ?, ?)",
+                (name, time.time(), dictionary.as_bytes()),
+            )
+            self._conn.commit()
+            self._active[name] = cursor.lastrowid
+        print(f"[EVIDENCE] Trained {len(dictionary.as_bytes())} byte dictionary for {name} on {len(samples)} samples")
+        return cursor.lastrowid
+
+    def iter_records(self, domain: Optional[str] = None, since: Optional[float] = None,
+                     until: Optional[float] = None, kind: Optional[str] = None,
+                     batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[dict]:
+        """Stream decoded records in insertion order, one batch of rows in memory at a time."""
+        filters, params = [], []
+        for clause, value in (("domain = ?", domain and domain.strip().lower()),
+                              ("created_at >= ?", since), ("created_at < ?", until), ("kind = ?", kind)):
+            if value is not None:
+                filters.append(clause)
+                params.append(value)
+
+        last_id = 0
+        while True:
+            where = " AND ".join(["id > ?"] + filters)
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT id, domain, kind, name, created_at, codec, payload FROM evidence"
+                    f" WHERE {where} ORDER BY id LIMIT ?", (last_id, *params, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            for record_id, row_domain, row_kind, name, created_at, codec, payload in rows:
+                yield {
+                    "id": record_id, "domain": row_domain, "kind": row_kind, "name": name,
+                    "created_at": created_at, "value": self._decode(codec, payload),
+                }
+            last_id = rows[-1][0]
+
+    def domain_history(self, domain: str) -> List[dict]:
+        return list(self.iter_records(domain=domain))
+
+    def latest_signals(self, domain: str, before: Optional[float] = None) -> Dict[str, Any]:
+        """The most recent output of each tool for a domain, e.g. to re-score it offline."""
+        latest = {}
+        for record in self.iter_records(domain=domain, until=before, kind="signal"):
+            latest[record["name"]] = record["value"]
+        return latest
+
+    def rescore(self, score: Callable[[str, Dict[str, Any]], Any], domains: Optional[Iterable[str]] = None,
+                before: Optional[float] = None) -> Iterator[Tuple[str, Any]]:
+        """(domain, score(domain, latest signals)) per domain with stored signals, without upstream calls.
+
+        The signals of every domain are gathered in one streaming pass over the
+        history rather than one query per domain.
+        """
+        wanted = None if domains is None else {domain.strip().lower() for domain in domains}
+        latest: Dict[str, Dict[str, Any]] = {}
+        for record in self.iter_records(until=before, kind="signal"):
+            if wanted is None or record["domain"] in wanted:
+                latest.setdefault(record["domain"], {})[record["name"]] = record["value"]
+        for domain, signals in latest.items():
+            yield domain, score(domain, signals)
+
+    def export_jsonl(self, path: str, **filters) -> int:
+        """Write matching records to a JSON Lines file and return how many were written."""
+        count = 0
+        with open(path, "w", encoding="UTF-8") as file:
+            for record in self.iter_records(**filters):
+                file.write(json.dumps(record, default=str) + "\n")
+                count += 1
+        return count
+
+    def stats(self) -> dict:
+        with self._lock:
+            records, raw, stored = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(raw_size), 0), COALESCE(SUM(LENGTH(payload)), 0) FROM evidence"
+            ).fetchone()
+        return {"records": records, "raw_bytes": raw, "stored_bytes": stored, "dictionaries": dict(self._active)}
+
+    def wrap(self, domain: str, base) -> BaseTool:
+        """Wrap a tool (or plain function) so every real call is appended to the history."""
+        base_tool = as_tool(base)
+
+        def append(output):
+            try:
+                self.append_signal(domain, base_tool.name, output)
+            except sqlite3.Error as e:
+                print(f"[EVIDENCE] Could not store {base_tool.name} output for {domain}: {e}")
+            return output
+
+        return wrap_tool(base_tool, after=append)
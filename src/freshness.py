@@ -0,0 +1,186 @@
+"""Per-signal freshness for re-checks of a domain.
+
+Each tool output (a "signal") is stored per domain with an xxhash content
+hash and the time it was fetched, and stays fresh for its own TTL: WHOIS age
+for weeks, scam-detector pages for a week, DNS/TLS/Reddit/Trustpilot for a
+day. A re-check refreshes only stale signals. When no hash changed, the
+previous verdict is reused without an LLM call; otherwise the agent is served
+fresh signals from the store and told which ones changed.
+"""
+
+import json
+import time
+import xxhash
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+from langchain_core.tools import BaseTool
+from termcolor import colored
+from tools.cache import SQLiteCache, shared_cache
+from tools.tool_wrapper import as_tool, wrap_tool
+from tracing import annotate, in_context, traced
+
+SIGNAL_TTLS = {
+    "get_domain_info": 30 * 86400,
+    "check_brand_impersonation": 30 * 86400,
+    "scrape_url_info": 7 * 86400,
+    "get_dns_info": 86400,
+    "get_ssl_info": 86400,
+    "check_reddit_reviews": 86400,
+    "get_trustpilot_review": 86400,
+}
+DEFAULT_SIGNAL_TTL = 86400
+RECORD_TTL = 90 * 86400  # how long a domain's signals and verdict are kept at all
+MAX_REFRESH_WORKERS = 6
+
+# Fields that move every day without the underlying evidence changing
+VOLATILE_KEYS = {"cert_age_days", "days_to_expiry"}
+
+_signal_store = None
+
+
+def get_signal_store() -> SQLiteCache:
+    global _signal_store
+    if _signal_store is None:
+        _signal_store = shared_cache("signals")
+    return _signal_store
+
+
+def _parsed(output: Any) -> Any:
+    if isinstance(output, str):
+        try:
+            return json.loads(output)
+        except ValueError:
+            pass
+    return output
+
+
+def _strip_volatile(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _strip_volatile(item) for key, item in value.items() if key not in VOLATILE_KEYS}
+    if isinstance(value, list):
+        return [_strip_volatile(item) for item in value]
+    return value
+
+
+def content_hash(output: Any) -> str:
+    """xxh3 hash of a tool output, insensitive to key order and day-to-day counters."""
+    canonical = json.dumps(_strip_volatile(_parsed(output)), sort_keys=True, default=str)
+    return xxhash.xxh3_64_hexdigest(canonical)
+
+
+def is_error(output: Any) -> bool:
+    output = _parsed(output)
+    return isinstance(output, dict) and ("error" in output or "Error" in output)
+
+
+class SignalTracker:
+    """Signals and last verdict of one domain, refreshed per signal TTL."""
+
+    def __init__(self, domain: str, store: Optional[SQLiteCache] = None):
+        self.domain = domain.strip().lower()
+        self.store = store or get_signal_store()
+        self.previous = self.store.get(self.domain) or {"signals": {}, "verdict": None}
+        self.signals: Dict[str, dict] = dict(self.previous["signals"])
+        self.changed = set()
+        self.failed = set()
+
+    @property
+    def previous_verdict(self) -> Optional[dict]:
+        return self.previous.get("verdict")
+
+    def is_fresh(self, name: str, now: Optional[float] = None) -> bool:
+        entry = self.signals.get(name)
+        ttl = SIGNAL_TTLS.get(name, DEFAULT_SIGNAL_TTL)
+        return entry is not None and (now or time.time()) - entry["checked_at"] < ttl
+
+    def record(self, name: str, output: Any) -> None:
+        if is_error(output):
+            # Failed lookups are never treated as fresh or as unchanged
+            self.failed.add(name)
+            return
+        digest = content_hash(output)
+        old = self.previous["signals"].get(name)
+        if old is None or old["hash"] != digest:
+            self.changed.add(name)
+        self.signals[name] = {"hash": digest, "checked_at": time.time(), "output": output}
+
+    def reuse(self, name: str) -> Optional[Any]:
+        """Stored output of a fresh signal, or None when it has to be fetched."""
+        fresh = self.is_fresh(name)
+        annotate(signal_fresh=fresh)
+        if not fresh:
+            return None
+        print(colored(f"[FRESH] Reusing {name} for {self.domain}", "blue"))
+        return self.signals[name]["output"]
+
+    def fetch(self, base_tool: BaseTool, kwargs: dict) -> Any:
+        """Tool output for this domain, from the store while fresh."""
+        output = self.reuse(base_tool.name)
+        if output is None:
+            output = base_tool.invoke(kwargs)
+            self.record(base_tool.name, output)
+        return output
+
+    def wrap(self, base) -> BaseTool:
+        """Wrap a tool (or plain function) so fresh signals are served from the store."""
+        base_tool = as_tool(base)
+
+        def keep(output):
+            self.record(base_tool.name, output)
+            return output
+
+        return wrap_tool(base_tool, before=lambda kwargs: self.reuse(base_tool.name), after=keep)
+
+    @traced("refresh_stale_signals")
+    def refresh_stale(self, tools: Iterable) -> List[str]:
+        """Re-run every stale signal concurrently and return their names."""
+        stale = [base for base in map(as_tool, tools) if not self.is_fresh(base.name)]
+
+        def refresh(base_tool):
+            try:
+                self.fetch(base_tool, {next(iter(base_tool.args)): self.domain})
+            except Exception as e:
+                print(colored(f"[FRESH] Refreshing {base_tool.name} failed: {e}", "red"))
+                self.failed.add(base_tool.name)
+
+        if stale:
+            with ThreadPoolExecutor(max_workers=MAX_REFRESH_WORKERS) as executor:
+                futures = [executor.submit(in_context(refresh, f"refresh {base.name}"), base) for base in stale]
+                for future in futures:
+                    future.result()
+        return [base.name for base in stale]
+
+    def can_reuse_verdict(self, tools: Iterable) -> bool:
+        """True when a verdict exists and every signal is fresh and unchanged."""
+        names = [as_tool(base).name for base in tools]
+        return (
+            self.previous_verdict is not None
+            and not self.changed
+            and not self.failed
+            and all(self.is_fresh(name) for name in names)
+        )
+
+    def change_note(self) -> str:
+        """Tell the model which signals changed since the previous verdict."""
+        if self.previous_verdict is None or not (self.changed or self.failed):
+            return ""
+        checked = datetime.fromtimestamp(self.previous["checked_at"], timezone.utc).strftime("%Y-%m-%d")
+        note = (
+            f"This domain was last assessed on {checked} as {self.previous_verdict.get('Risk Level')}. "
+            f"Signals changed since then: {', '.join(sorted(self.changed)) or 'none'}."
+        )
+        if self.failed:
+            note += f" Signals that could not be refreshed: {', '.join(sorted(self.failed))}."
+        return note
+
+    def save(self, verdict: dict, assessed_at: Optional[float] = None) -> None:
+        self.store.set(
+            self.domain,
+            {"signals": self.signals, "verdict": verdict, "checked_at": assessed_at or time.time()},
+            RECORD_TTL,
+        )
+
+    def keep_verdict(self) -> None:
+        """Save the refreshed signals with the previous verdict and the time it was assessed."""
+        self.save(self.previous_verdict, assessed_at=self.previous["checked_at"])
@@ -0,0 +1,231 @@
+"""Latency-aware routing across chat model providers.
+
+`LLMRouter` is a chat model that forwards each call to one of several
+provider models (OpenAI, Gemini, ...). Every provider keeps a rolling window
+of call latencies and failures; calls go to the fastest healthy provider,
+and when `hedge_after` is set a second provider is started if the first has
+not answered by then, whichever answers first wins. An unhealthy provider is
+not written off: every PROBE_INTERVAL seconds one call is sent to it first
+(half-open), and a successful probe clears its failure history. Tool binding is applied
+to every provider, so the agent's tools and the `domain_response` structured
+output (bound as a tool) work the same whichever provider answers.
+Provider health is served as Prometheus gauges on /metrics.
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from langchain_core.callbacks import CallbackManager
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from termcolor import colored
+from tracing import in_context
+
+WINDOW = 50  # calls remembered per provider
+MIN_SAMPLES = 5  # calls before a provider can be judged unhealthy
+MAX_ERROR_RATE = 0.5
+HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER", "0"))  # seconds, 0 disables hedging
+PROBE_INTERVAL = float(os.getenv("LLM_PROBE_INTERVAL", "30"))  # seconds between calls to an unhealthy provider
+
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-router")
+
+
+class ProviderStats:
+    """Rolling latency and error rate of one provider."""
+
+    def __init__(self, window: int = WINDOW, probe_interval: float = PROBE_INTERVAL):
+        self.probe_interval = probe_interval
+        self._latencies = deque(maxlen=window)
+        self._outcomes = deque(maxlen=window)
+        self._last_attempt = 0.0  # last failure or probe, whichever is later
+        self._lock = threading.Lock()
+
+    def _healthy(self) -> bool:
+        if len(self._outcomes) < MIN_SAMPLES:
+            return True
+        return self._outcomes.count(False) / len(self._outcomes) <= MAX_ERROR_RATE
+
+    def record(self, latency: float, ok: bool) -> None:
+        with self._lock:
+            if ok and not self._healthy():
+                # A successful probe closes the circuit again
+                self._outcomes.clear()
+            self._outcomes.append(ok)
+            if ok:
+                self._latencies.append(latency)
+            else:
+                self._last_attempt = time.time()
+
+    def claim_probe(self) -> bool:
+        """True for at most one caller per probe interval while the provider is unhealthy."""
+        with self._lock:
+            if self._healthy() or time.time() - self._last_attempt < self.probe_interval:
+                return False
+            self._last_attempt = time.time()
+            return True
+
+    @property
+    def latency(self) -> float:
+        """Mean latency of recent successful calls; 0 for an unmeasured provider so it gets tried."""
+        with self._lock:
+            return sum(self._latencies) / len(self._latencies) if self._latencies else 0.0
+
+    @property
+    def error_rate(self) -> float:
+        with self._lock:
+            return self._outcomes.count(False) / len(self._outcomes) if self._outcomes else 0.0
+
+    @property
+    def healthy(self) -> bool:
+        with self._lock:
+            return self._healthy()
+
+    def snapshot(self) -> dict:
+        return {
+            "latency": round(self.latency, 3),
+            "error_rate": round(self.error_rate, 3),
+            "healthy": self.healthy,
+            "calls": len(self._outcomes),
+        }
+
+
+# Shared by every router in the process, so health survives across analyses
+_provider_stats: Dict[str, ProviderStats] = {}
+_stats_lock = threading.Lock()
+
+
+def get_provider_stats(name: str) -> ProviderStats:
+    with _stats_lock:
+        if name not in _provider_stats:
+            _provider_stats[name] = ProviderStats()
+        return _provider_stats[name]
+
+
+def provider_health() -> Dict[str, dict]:
+    """Current latency/error snapshot of every provider seen so far."""
+    with _stats_lock:
+        names = list(_provider_stats)
+    return {name: get_provider_stats(name).snapshot() for name in names}
+
+
+def provider_metrics_text() -> str:
+    """Provider health in the Prometheus text exposition format, served on /metrics."""
+    health = provider_health()
+    lines = []
+    for key, help_text in (("latency", "Mean latency in seconds of recent successful calls"),
+                           ("error_rate", "Share of recent calls that failed"),
+                           ("healthy", "1 while the provider takes traffic, 0 while it is only probed"),
+                           ("calls", "Calls in the rolling window")):
+        lines += [f"# HELP rulegit_llm_provider_{key} {help_text}.", f"# TYPE rulegit_llm_provider_{key} gauge"]
+        lines += [f'rulegit_llm_provider_{key}{{provider="{name}"}} {float(entry[key]):g}'
+                  for name, entry in sorted(health.items())]
+    return "\n".join(lines) + "\n"
+
+
+def child_callbacks(run_manager) -> CallbackManager:
+    """Callbacks for a provider call, nested under the router's own LLM run."""
+    return CallbackManager(
+        handlers=run_manager.inheritable_handlers,
+        inheritable_handlers=run_manager.inheritable_handlers,
+        parent_run_id=run_manager.run_id,
+        tags=run_manager.inheritable_tags,
+        inheritable_tags=run_manager.inheritable_tags,
+        metadata=run_manager.inheritable_metadata,
+        inheritable_metadata=run_manager.inheritable_metadata,
+    )
+
+
+class LLMRouter(BaseChatModel):
+    """Chat model that routes each call to the fastest healthy provider."""
+
+    providers: List[Tuple[str, Any]]
+    hedge_after: float = HEDGE_AFTER
+
+    @property
+    def _llm_type(self) -> str:
+        return "llm-router"
+
+    def ranked_providers(self) -> List[Tuple[str, Any]]:
+        """A due probe first, then healthy providers, then by rolling latency, then in configured order."""
+        probe = next((name for name, _ in self.providers if get_provider_stats(name).claim_probe()), None)
+
+        def key(item):
+            position, (name, _) = item
+            stats = get_provider_stats(name)
+            return (name != probe, not stats.healthy, stats.latency, position)
+
+        return [provider for _, provider in sorted(enumerate(self.providers), key=key)]
+
+    def bind_tools(self, tools: Sequence, **kwargs: Any) -> "LLMRouter":
+        return self.model_copy(update={
+            "providers": [(name, model.bind_tools(tools, **kwargs)) for name, model in self.providers]
+        })
+
+    def _call(self, name: str, model, messages: List[BaseMessage], stop: Optional[List[str]],
+              run_manager=None, **kwargs: Any) -> BaseMessage:
+        start = time.time()
+        config = {"callbacks": child_callbacks(run_manager)} if run_manager else None
+        try:
+            message = model.invoke(messages, config, stop=stop, **kwargs)
+        except Exception:
+            get_provider_stats(name).record(time.time() - start, ok=False)
+            raise
+        get_provider_stats(name).record(time.time() - start, ok=True)
+        message.response_metadata["llm_provider"] = name
+        return message
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        candidates = self.ranked_providers()
+        errors = []
+        running = {}
+
+        def launch():
+            name, model = candidates.pop(0)
+            call = in_context(self._call, f"llm.provider {name}", provider=name)
+            running[_executor.submit(call, name, model, messages, stop, run_manager, **kwargs)] = name
+
+        launch()
+        while running:
+            hedge = self.hedge_after > 0 and len(running) == 1 and candidates
+            done, _ = wait(running, timeout=self.hedge_after if hedge else None, return_when=FIRST_COMPLETED)
+            if not done:
+                print(colored(f"[ROUTER] {list(running.values())[0]} slower than {self.hedge_after}s, hedging", "magenta"))
+                launch()
+                continue
+
+            for future in done:
+                name = running.pop(future)
+                if future.exception() is None:
+                    # The losing hedge keeps running in the pool and still records its latency
+                    return ChatResult(generations=[ChatGeneration(message=future.result())])
+                print(colored(f"[ROUTER] Provider {name} failed: {future.exception()}", "red"))
+                errors.append(future.exception())
+
+            if not running and candidates:
+                launch()
+
+        raise errors[-1]
+
+
+def make_chat_model(spec: str) -> BaseChatModel:
+    """Chat model for a tier spec.
+
+    A spec is one model ("gpt-5-nano" or "provider:model") or several joined
+    with "|", which are routed with `LLMRouter`.
+    """
+    from langchain_openai import ChatOpenAI
+    from langchain.chat_models import init_chat_model
+
+    def single(name):
+        # Bare names stay on ChatOpenAI; "google_genai:gemini-2.5-flash" needs its provider package
+        return init_chat_model(name) if ":" in name else ChatOpenAI(model=name)
+
+    names = [name.strip() for name in spec.split("|") if name.strip()]
+    if len(names) == 1:
+        return single(names[0])
+    return LLMRouter(providers=[(name, single(name)) for name in names])
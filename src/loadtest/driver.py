@@ -0,0 +1,201 @@
+"""Concurrency ramp against /validate_url.
+
+Each level runs `concurrency` clients for `duration` seconds, every client
+issuing requests back to back, and reports throughput, latency percentiles,
+errors and the token usage from the response debug block. The saturation
+point is the first level whose throughput gain over the previous level drops
+below --min-gain while latency keeps growing.
+
+Against a running app (pointed at loadtest.stubs):
+
+    python -m loadtest.driver --base-url http://127.0.0.1:8000 --levels 1,2,4,8,16 --duration 30
+
+or start the stubs and uvicorn workers itself, with a throwaway cache dir:
+
+    python -m loadtest.driver --spawn --workers 2 --levels 1,4,16,64 --report report.json
+
+By default every request asks about a new domain so each one runs a full
+analysis; --hot-ratio sends that share of requests to a small set of
+repeated domains instead (server-side verdict cache hits).
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+import httpx
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+HOT_DOMAINS = 20
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class DomainPicker:
+    """Fresh domains, or with probability hot_ratio one of a few repeated ones."""
+
+    def __init__(self, hot_ratio: float = 0.0, seed: Optional[int] = None):
+        self.hot_ratio = hot_ratio
+        self.run = f"{int(time.time()) % 100000}"
+        self._rng = random.Random(seed)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self) -> str:
+        with self._lock:
+            self._count += 1
+            if self._rng.random() < self.hot_ratio:
+                return f"loadtest-hot-{self._rng.randrange(HOT_DOMAINS)}.com"
+            return f"loadtest-{self.run}-{self._count}.com"
+
+
+def percentile_ms(latencies: List[float], q: float) -> Optional[float]:
+    return round(float(np.percentile(latencies, q)) * 1000, 1) if latencies else None
+
+
+def run_level(client: httpx.Client, base_url: str, concurrency: int, duration: float,
+              pick_domain: DomainPicker) -> dict:
+    """Run `concurrency` closed-loop clients for `duration` seconds."""
+    latencies, errors, usages = [], [], []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client_loop():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                response = client.get(f"{base_url}/validate_url", params={"url": pick_domain(), "debug": "true"})
+                failed = response.status_code >= 400
+                usage = None if failed else (response.json().get("Debug") or {}).get("usage")
+            except httpx.HTTPError as e:
+                failed, usage = type(e).__name__, None
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if failed:
+                    errors.append(failed)
+                if usage:
+                    usages.append(usage["totals"])
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(client_loop) for _ in range(concurrency)]:
+            future.result()
+    wall = time.perf_counter() - started
+
+    succeeded = len(latencies) - len(errors)
+    report = {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "error_rate": round(len(errors) / len(latencies), 4) if latencies else 0.0,
+        "throughput_rps": round(succeeded / wall, 2),
+        "p50_ms": percentile_ms(latencies, 50),
+        "p90_ms": percentile_ms(latencies, 90),
+        "p99_ms": percentile_ms(latencies, 99),
+        "max_ms": round(max(latencies) * 1000, 1) if latencies else None,
+    }
+    for key in ("input_tokens", "cached_tokens", "output_tokens", "tool_tokens", "tool_bytes"):
+        values = [usage.get(key, 0) for usage in usages]
+        report[f"avg_{key}"] = round(sum(values) / len(values), 1) if values else None
+    return report
+
+
+def find_saturation(levels: List[dict], min_gain: float = 0.1) -> Optional[dict]:
+    """First level where throughput grew by less than min_gain over the previous one."""
+    for previous, level in zip(levels, levels[1:]):
+        if previous["throughput_rps"] <= 0:
+            continue
+        gain = level["throughput_rps"] / previous["throughput_rps"] - 1
+        if gain < min_gain:
+            return {"concurrency": previous["concurrency"], "throughput_rps": previous["throughput_rps"],
+                    "next_level_gain": round(gain, 3), "p99_ms": previous["p99_ms"]}
+    return None
+
+
+def spawn_app(env: Dict[str, str], port: int, workers: int, timeout: float = 60) -> subprocess.Popen:
+    """Start uvicorn workers for app:app with `env` and wait for /health."""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        cwd=SRC_DIR, env={**os.environ, **env}, stdout=subprocess.DEVNULL,
+    )
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"App exited with status {process.returncode} before becoming healthy")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"App did not become healthy on port {port} within {timeout}s")
+
+
+def print_table(levels: List[dict]) -> None:
+    columns = ["concurrency", "requests", "errors", "throughput_rps", "p50_ms", "p90_ms", "p99_ms", "max_ms",
+               "avg_input_tokens", "avg_tool_tokens"]
+    print(" ".join(f"{column:>16}" for column in columns))
+    for level in levels:
+        print(" ".join(f"{str(level[column]):>16}" for column in columns))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--levels", default="1,2,4,8,16", help="comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per level")
+    parser.add_argument("--hot-ratio", type=float, default=0.0)
+    parser.add_argument("--min-gain", type=float, default=0.1, help="throughput gain below which a level saturates")
+    parser.add_argument("--timeout", type=float, default=300, help="per-request timeout in seconds")
+    parser.add_argument("--spawn", action="store_true", help="start stub upstreams and uvicorn workers")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--report", help="write the JSON report here")
+    args = parser.parse_args()
+
+    stubs = app_process = None
+    if args.spawn:
+        from loadtest.stubs import StubUpstreams
+
+        stubs = StubUpstreams().start()
+        env = {**stubs.env(), "RULEGIT_CACHE_DIR": tempfile.mkdtemp(prefix="rulegit-loadtest-")}
+        app_process = spawn_app(env, args.port, args.workers)
+        args.base_url = f"http://127.0.0.1:{args.port}"
+
+    pick_domain = DomainPicker(args.hot_ratio)
+    levels = []
+    try:
+        limits = httpx.Limits(max_connections=max(int(level) for level in args.levels.split(",")))
+        with httpx.Client(timeout=args.timeout, limits=limits) as client:
+            for concurrency in [int(level) for level in args.levels.split(",")]:
+                levels.append(run_level(client, args.base_url, concurrency, args.duration, pick_domain))
+                print(json.dumps(levels[-1]), file=sys.stderr)
+    finally:
+        if app_process is not None:
+            app_process.terminate()
+            app_process.wait()
+        if stubs is not None:
+            stubs.stop()
+
+    report = {
+        "base_url": args.base_url,
+        "workers": args.workers if args.spawn else None,
+        "duration_s": args.duration,
+        "hot_ratio": args.hot_ratio,
+        "levels": levels,
+        "saturation": find_saturation(levels, args.min_gain),
+        "upstream_calls": stubs.stats() if stubs is not None else None,
+    }
+    print_table(levels)
+    print(f"Saturation: {report['saturation'] or 'not reached'}")
+    if args.report:
+        with open(args.report, "w", encoding="UTF-8") as file:
+            json.dump(report, file, indent=2)
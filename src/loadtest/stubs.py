@@ -0,0 +1,367 @@
+"""Local stand-ins for every upstream the agent calls, for load tests.
+
+Each stub answers in the shape of the real API with deterministic per-domain
+data, after a latency drawn from its distribution, and fails a configurable
+share of calls:
+
+    openai         POST /v1/chat/completions (tool calls, then the structured verdict)
+    tavily         POST /search, POST /extract
+    diffbot        GET  /v3/analyze?url=https://www.trustpilot.com/review/<domain>
+    scam_detector  GET  /validator/<slug>-review (the panels scrape_url_info parses)
+    rdap           GET  /dns.json (bootstrap), GET /domain/<domain>
+    whois          port-43 style TCP responder
+
+    python -m loadtest.stubs --latency openai=lognormal:1.2,0.5 --error-rate diffbot=0.05
+
+prints the environment that points the app at the stubs (OPENAI_BASE_URL,
+TAVILY_API_BASE_URL, DIFFBOT_URL, SCAM_DETECTOR_URL, RDAP_BOOTSTRAP_URL,
+WHOIS_SERVER). DNS and TLS lookups are not stubbed.
+
+Latency specs: "fixed:<s>", "uniform:<low>,<high>" or "lognormal:<median>,<sigma>".
+"""
+
+import re
+import sys
+import json
+import math
+import time
+import random
+import socketserver
+import threading
+import argparse
+import xxhash
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from typing import Callable, Dict, Optional, Tuple
+
+DEFAULT_LATENCIES = {
+    "openai": "lognormal:1.2,0.5",
+    "tavily": "lognormal:0.8,0.4",
+    "diffbot": "lognormal:1.5,0.5",
+    "scam_detector": "lognormal:0.6,0.4",
+    "rdap": "lognormal:0.3,0.3",
+    "whois": "lognormal:0.5,0.4",
+}
+RDAP_TLDS = ["com", "net", "org", "shop", "store", "top", "xyz", "online", "site", "co", "io", "us", "uk"]
+DOMAIN_RE = re.compile(r"(?:legit:\s*|Domain:\s*)([A-Za-z0-9.-]+\.[A-Za-z]{2,})")
+DOMAIN_PARAMS = {"domain", "url", "query"}
+PROMPT_CACHE_BLOCK = 128  # providers cache prompt prefixes in blocks of this many tokens
+
+
+class Latency:
+    """A latency distribution parsed from a spec string."""
+
+    def __init__(self, spec: str = "fixed:0"):
+        kind, _, args = spec.partition(":")
+        self.kind = kind
+        self.args = [float(arg) for arg in args.split(",") if arg]
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.args[0] if self.args else 0.0
+        if self.kind == "uniform":
+            return rng.uniform(self.args[0], self.args[1])
+        median, sigma = self.args
+        return rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+
+
+class Behaviour:
+    """Latency and error rate of one stub upstream."""
+
+    def __init__(self, latency: str = "fixed:0", error_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency = Latency(latency)
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def wait(self) -> bool:
+        """Sleep for one latency sample; True when this call should fail."""
+        with self._lock:
+            delay = self.latency.sample(self._rng)
+            failed = self._rng.random() < self.error_rate
+            self.calls += 1
+            self.errors += failed
+        time.sleep(delay)
+        return failed
+
+
+def _seed(domain: str) -> int:
+    return xxhash.xxh3_64_intdigest(domain.lower())
+
+
+# --- Per-upstream responses: (status, content type, body) ---
+
+def openai_response(method: str, path: str, query: dict, body: bytes, seen_prompts: set) -> Tuple[int, str, bytes]:
+    if not path.endswith("/chat/completions"):
+        return 404, "application/json", b'{"error": {"message": "not found"}}'
+    request = json.loads(body)
+    messages = request.get("messages", [])
+    tools = [tool["function"] for tool in request.get("tools", []) if tool.get("type") == "function"]
+    text = " ".join(str(message.get("content") or "") for message in messages if message.get("role") == "user")
+    match = DOMAIN_RE.search(text)
+    domain = match.group(1) if match else "example.com"
+    answered = any(message.get("role") == "tool" for message in messages)
+    data_tools = [tool for tool in tools if tool["name"] != "domain_response"]
+
+    content = None
+    if data_tools and not answered:
+        calls = []
+        for i, tool in enumerate(data_tools):
+            properties = list(tool.get("parameters", {}).get("properties", {}))
+            params = [name for name in properties if name in DOMAIN_PARAMS] or properties[:1]
+            calls.append({"id": f"call_{i}", "type": "function",
+                          "function": {"name": tool["name"], "arguments": json.dumps({name: domain for name in params})}})
+    else:
+        rng = random.Random(_seed(domain))
+        verdict = {
+            "Risk Level": rng.choice(["Low", "Medium", "High", "Critical"]),
+            "Rationale": [f"Stub verdict for {domain}: registered {rng.randint(1, 3000)} days ago.",
+                          "Community and review signals were synthesized by the load-test stub."],
+            "Confidence Level": rng.randint(75, 95),
+        }
+        if request.get("response_format", {}).get("type") == "json_schema":
+            content, calls = json.dumps(verdict), []
+        else:
+            calls = [{"id": "call_final", "type": "function",
+                      "function": {"name": "domain_response", "arguments": json.dumps(verdict)}}]
+
+    # Tokens approximated from payload size; the system prompt is a cacheable prefix after its first use
+    prompt_tokens = len(body) // 4
+    system = next((str(message.get("content")) for message in messages if message.get("role") == "system"), "")
+    system_key = xxhash.xxh3_64_intdigest(system)
+    cached = (len(system) // 4) // PROMPT_CACHE_BLOCK * PROMPT_CACHE_BLOCK if system_key in seen_prompts else 0
+    seen_prompts.add(system_key)
+    completion_tokens = 40 * len(calls) if calls else len(content) // 4
+    completion = {
+        "id": f"chatcmpl-stub-{time.time_ns()}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", "stub"),
+        "choices": [{"index": 0, "finish_reason": "tool_calls" if calls else "stop",
+                     "message": {"role": "assistant", "content": content, "tool_calls": calls or None}}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens,
+                  "prompt_tokens_details": {"cached_tokens": min(cached, prompt_tokens)}},
+    }
+    return 200, "application/json", json.dumps(completion).encode()
+
+
+def tavily_response(method: str, path: str, query: dict, body: bytes, _) -> Tuple[int, str, bytes]:
+    request = json.loads(body or b"{}")
+    if path.endswith("/extract"):
+        urls = request.get("urls") or []
+        results = [{"url": url, "raw_content": f"Stub page content for {url}. " * 20} for url in urls]
+        return 200, "application/json", json.dumps({"results": results, "failed_results": []}).encode()
+    domain = (DOMAIN_RE.search("legit: " + request.get("query", "").replace('"', "")) or [None, "example.com"])[1]
+    rng = random.Random(_seed(domain))
+    results = [{
+        "title": f"Is {domain} legit? Thread {i}",
+        "url": f"https://www.reddit.com/r/Scams/comments/stub{i}/{domain.replace('.', '_')}/",
+        "content": f"I ordered from {domain} " + rng.choice(["and never received anything.", "and it arrived fine.",
+                                                            "and got a cheap knockoff."]) * 5,
+        "score": round(rng.random(), 3),
+        "published_date": "2025-06-01",
+    } for i in range(rng.randint(0, request.get("max_results", 10)))]
+    return 200, "application/json", json.dumps({"query": request.get("query"), "results": results}).encode()
+
+
+def diffbot_response(method: str, path: str, query: dict, body: bytes, _) -> Tuple[int, str, bytes]:
+    url = (query.get("url") or [""])[0]
+    domain = url.rstrip("/").rsplit("/", 1)[-1].removeprefix("www.")
+    rng = random.Random(_seed(domain))
+    if url.rstrip("/").endswith(f"www.{domain}") or rng.random() < 0.3:
+        return 200, "application/json", json.dumps({"errorCode": 404, "error": "Could not download page"}).encode()
+    five = rng.randint(10, 80)
+    page = {
+        "type": "article",
+        "title": f"{domain} Reviews | Read Customer Service Reviews",
+        "text": f"TrustScore {rng.randint(10, 48) / 10} {rng.randint(3, 9000):,} reviews "
+                f"5-star {five}% 1-star {100 - five}%",
+        "posts": [{"date": "2025-05-0{}".format(i + 1), "rating": rng.randint(1, 5),
+                   "title": "Stub review", "text": "Synthetic review text. " * 10} for i in range(5)],
+    }
+    return 200, "application/json", json.dumps({"objects": [page]}).encode()
+
+
+def scam_detector_response(method: str, path: str, query: dict, body: bytes, _) -> Tuple[int, str, bytes]:
+    slug = path.rsplit("/", 1)[-1].removesuffix("-review")
+    rng = random.Random(_seed(slug))
+    panels = "".join(
+        f'<div class="panel"><div class="panel-heading"><h4>{heading}</h4></div>'
+        f'<div class="panel-body"><div class="content-wrapper"><p><strong>Result:</strong> {value}</p></div></div></div>'
+        for heading, value in [("Blacklist Check", rng.choice(["Clean", "Flagged"])),
+                               ("HTTPS Connection", "Valid"), ("Domain Age", f"{rng.randint(1, 3000)} days")]
+    )
+    html = (
+        f'<html><body><span class="domain-name">{slug.replace("-", ".")}</span>'
+        f'<div class="totalRankDiv"><p class="totalPercent"><strong>{rng.randint(1, 100)}</strong></p></div>'
+        f'<div class="about-text"><p>Stub review page for {slug}.</p></div>{panels}</body></html>'
+    )
+    return 200, "text/html; charset=utf-8", html.encode()
+
+
+def rdap_response(method: str, path: str, query: dict, body: bytes, base_url: str) -> Tuple[int, str, bytes]:
+    if path.endswith("/dns.json"):
+        bootstrap = {"version": "1.0", "services": [[RDAP_TLDS, [base_url]]]}
+        return 200, "application/json", json.dumps(bootstrap).encode()
+    domain = path.rsplit("/", 1)[-1].lower()
+    rng = random.Random(_seed(domain))
+    created = time.time() - rng.randint(2, 4000) * 86400
+    record = {
+        "objectClassName": "domain",
+        "ldhName": domain,
+        "events": [
+            {"eventAction": "registration", "eventDate": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(created))},
+            {"eventAction": "expiration", "eventDate": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(created + 3 * 365 * 86400))},
+        ],
+        "entities": [{"roles": ["registrar"], "handle": "STUB",
+                      "vcardArray": ["vcard", [["version", {}, "text", "4.0"], ["fn", {}, "text", "Stub Registrar"]]]}],
+    }
+    return 200, "application/rdap+json", json.dumps(record).encode()
+
+
+def whois_text(domain: str) -> str:
+    rng = random.Random(_seed(domain))
+    created = time.gmtime(time.time() - rng.randint(2, 4000) * 86400)
+    return (
+        f"Domain Name: {domain.upper()}\r\n"
+        f"Registrar: Stub Registrar\r\n"
+        f"Creation Date: {time.strftime('%Y-%m-%dT%H:%M:%SZ', created)}\r\n"
+        f"Registry Expiry Date: {created.tm_year + 3}-01-01T00:00:00Z\r\n"
+    )
+
+
+# --- Servers ---
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, name: str, behaviour: Behaviour, respond: Callable):
+        super().__init__(address, _StubHandler)
+        self.name = name
+        self.behaviour = behaviour
+        self.respond = respond
+        self.state = set()
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _handle(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        server = self.server
+        if server.behaviour.wait():
+            status, content_type, payload = 500, "application/json", b'{"error": {"message": "stub upstream error"}}'
+        else:
+            parts = urlsplit(self.path)
+            extra = server.state if server.name == "openai" else f"http://{self.headers.get('Host')}/"
+            status, content_type, payload = server.respond(self.command, parts.path, parse_qs(parts.query), body, extra)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = _handle
+
+    def log_message(self, *args):
+        pass
+
+
+class _WhoisHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        domain = self.rfile.readline().decode("utf-8", "replace").strip()
+        if self.server.behaviour.wait():
+            return  # a dropped connection, as flaky port-43 servers do
+        self.wfile.write(whois_text(domain).encode("utf-8"))
+
+
+class _WhoisServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+HTTP_STUBS = {
+    "openai": openai_response,
+    "tavily": tavily_response,
+    "diffbot": diffbot_response,
+    "scam_detector": scam_detector_response,
+    "rdap": rdap_response,
+}
+
+
+class StubUpstreams:
+    """All stub servers on ephemeral ports of one host."""
+
+    def __init__(self, latencies: Optional[Dict[str, str]] = None, error_rates: Optional[Dict[str, float]] = None,
+                 host: str = "127.0.0.1", seed: Optional[int] = None):
+        latencies = {**DEFAULT_LATENCIES, **(latencies or {})}
+        error_rates = error_rates or {}
+        self.host = host
+        self.behaviours = {
+            name: Behaviour(latencies[name], error_rates.get(name, 0.0), None if seed is None else seed + i)
+            for i, name in enumerate(DEFAULT_LATENCIES)
+        }
+        self.servers = {}
+
+    def start(self) -> "StubUpstreams":
+        for name, respond in HTTP_STUBS.items():
+            self.servers[name] = _StubHTTPServer((self.host, 0), name, self.behaviours[name], respond)
+        self.servers["whois"] = _WhoisServer((self.host, 0), _WhoisHandler)
+        self.servers["whois"].behaviour = self.behaviours["whois"]
+        for name, server in self.servers.items():
+            threading.Thread(target=server.serve_forever, name=f"stub-{name}", daemon=True).start()
+        return self
+
+    def url(self, name: str) -> str:
+        return f"http://{self.host}:{self.servers[name].server_address[1]}"
+
+    def env(self) -> Dict[str, str]:
+        """Environment that points the app at the stubs."""
+        return {
+            "OPENAI_BASE_URL": f"{self.url('openai')}/v1",
+            "OPENAI_API_KEY": "stub",
+            "TAVILY_API_BASE_URL": self.url("tavily"),
+            "TAVILY_API_KEY": "stub",
+            "DIFFBOT_URL": f"{self.url('diffbot')}/v3/analyze",
+            "DIFFBOT_API_KEY": "stub",
+            "SCAM_DETECTOR_URL": f"{self.url('scam_detector')}/validator/",
+            "RDAP_BOOTSTRAP_URL": f"{self.url('rdap')}/dns.json",
+            "WHOIS_SERVER": f"{self.host}:{self.servers['whois'].server_address[1]}",
+        }
+
+    def stats(self) -> Dict[str, dict]:
+        return {name: {"calls": item.calls, "errors": item.errors} for name, item in self.behaviours.items()}
+
+    def stop(self) -> None:
+        for server in self.servers.values():
+            server.shutdown()
+            server.server_close()
+
+
+def _pairs(values, cast):
+    return {name: cast(value) for name, _, value in (item.partition("=") for item in values or [])}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--latency", action="append", help="upstream=spec, e.g. openai=lognormal:1.2,0.5")
+    parser.add_argument("--error-rate", action="append", help="upstream=rate, e.g. diffbot=0.05")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    stubs = StubUpstreams(_pairs(args.latency, str), _pairs(args.error_rate, float), args.host, args.seed).start()
+    for key, value in stubs.env().items():
+        print(f"export {key}={value}")
+    sys.stdout.flush()
+    try:
+        while True:
+            time.sleep(60)
+            print(json.dumps(stubs.stats()), file=sys.stderr)
+    except KeyboardInterrupt:
+        stubs.stop()
@@ -0,0 +1,206 @@
+"""Opt-in sampling profiler writing collapsed-stack (flamegraph) files.
+
+Disabled unless ADMIN_TOKEN is set. With it, an admin can:
+
+- profile one analysis: GET /validate_url?url=...&profile=true with the
+  X-Admin-Token header; the verdict cache is bypassed so the analysis runs,
+  and the X-Profile response header names the file written;
+- profile a time window on every worker: POST /admin/profile?seconds=30. The
+  request is written to a trigger file that each worker process polls once a
+  second, so every uvicorn worker writes its own file for the same window.
+
+A sampler thread reads `sys._current_frames()` every PROFILE_INTERVAL
+seconds; nothing is hooked into unprofiled requests. Samples of threads idle
+in a lock, queue or selector are dropped unless PROFILE_INCLUDE_IDLE is set,
+so the files show CPU time (BeautifulSoup, whois regexes, serialization,
+LangChain). Files go to CACHE_DIR/profiles as "frame;frame;... count" lines,
+readable by flamegraph.pl, speedscope or inferno:
+
+    flamegraph.pl src/.cache/profiles/analysis-*.collapsed > flame.svg
+"""
+
+import os
+import sys
+import json
+import time
+import secrets
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from tools.cache import CACHE_DIR
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_DIR = os.path.join(CACHE_DIR, "profiles")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.01"))  # seconds between samples
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "300"))
+PROFILE_INCLUDE_IDLE = os.getenv("PROFILE_INCLUDE_IDLE", "false").lower() == "true"
+TRIGGER_FILE = "window.json"
+WATCH_INTERVAL = 1.0
+
+# Leaf frames of threads that are blocked rather than running
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+}
+
+_profile_lock = threading.Lock()  # one profile per process at a time
+
+
+def profiling_enabled() -> bool:
+    return bool(ADMIN_TOKEN)
+
+
+def is_admin(token: Optional[str]) -> bool:
+    return profiling_enabled() and token is not None and secrets.compare_digest(token, ADMIN_TOKEN)
+
+
+class SamplingProfiler:
+    """Samples the stacks of every other thread of the process into collapsed-stack counts."""
+
+    def __init__(self, interval: float = PROFILE_INTERVAL, max_seconds: float = PROFILE_MAX_SECONDS,
+                 include_idle: bool = PROFILE_INCLUDE_IDLE):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.include_idle = include_idle
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self._labels: Dict = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self.started_at = None
+        self.stopped_at = None
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            path = code.co_filename.replace("\\", "/").split("/")
+            label = self._labels[code] = f"{code.co_name} ({'/'.join(path[-2:])})"
+        return label
+
+    def sample(self) -> None:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == threading.get_ident():
+                continue
+            code = frame.f_code
+            if not self.include_idle and (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            self.counts[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self) -> None:
+        deadline = self.started_at + self.max_seconds
+        while not self._stop.wait(self.interval) and time.time() < deadline:
+            self.sample()
+
+    def start(self) -> "SamplingProfiler":
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.stopped_at = time.time()
+        return self.counts
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.counts.items()))
+
+    def write(self, name: str) -> str:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{name}.collapsed")
+        with open(path, "w", encoding="UTF-8") as file:
+            file.write(self.collapsed())
+        print(f"[PROFILE] {self.samples} samples over {self.stopped_at - self.started_at:.1f}s -> {path}")
+        return path
+
+
+def _safe_name(text: str) -> str:
+    return "".join(char if char.isalnum() or char in "-._" else "_" for char in text)[:80]
+
+
+@contextmanager
+def profile(name: str):
+    """Sample the process while the block runs; yields the file name, or None if a profile is already running."""
+    if not _profile_lock.acquire(blocking=False):
+        yield None
+        return
+    file_name = f"{_safe_name(name)}-{os.getpid()}-{int(time.time())}"
+    profiler = SamplingProfiler().start()
+    try:
+        yield f"{file_name}.collapsed"
+    finally:
+        profiler.stop()
+        profiler.write(file_name)
+        _profile_lock.release()
+
+
+# --- Time windows across worker processes ---
+
+def request_window(seconds: float) -> dict:
+    """Ask every worker to profile for the next `seconds` (capped at PROFILE_MAX_SECONDS)."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    window = {"id": secrets.token_hex(4), "until": time.time() + min(seconds, PROFILE_MAX_SECONDS)}
+    temporary = os.path.join(PROFILE_DIR, f".{TRIGGER_FILE}.{os.getpid()}")
+    with open(temporary, "w", encoding="UTF-8") as file:
+        json.dump(window, file)
+    os.replace(temporary, os.path.join(PROFILE_DIR, TRIGGER_FILE))
+    return window
+
+
+def _watch_windows() -> None:
+    seen = None
+    path = os.path.join(PROFILE_DIR, TRIGGER_FILE)
+    while True:
+        time.sleep(WATCH_INTERVAL)
+        try:
+            with open(path, "r", encoding="UTF-8") as file:
+                window = json.load(file)
+        except (OSError, ValueError):
+            continue
+        if window["id"] == seen or window["until"] <= time.time():
+            continue
+        seen = window["id"]
+        with profile(f"window-{window['id']}") as file_name:
+            if file_name is not None:
+                time.sleep(max(0.0, window["until"] - time.time()))
+
+
+_watcher = None
+
+
+def start_window_watcher() -> None:
+    """Poll for profiling windows in this worker (only when profiling is enabled)."""
+    global _watcher
+    if _watcher is None and profiling_enabled():
+        _watcher = threading.Thread(target=_watch_windows, name="profile-window-watcher", daemon=True)
+        _watcher.start()
+
+
+def list_profiles() -> List[dict]:
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    return [
+        {"name": name, "bytes": os.path.getsize(os.path.join(PROFILE_DIR, name)),
+         "modified": int(os.path.getmtime(os.path.join(PROFILE_DIR, name)))}
+        for name in sorted(os.listdir(PROFILE_DIR)) if name.endswith(".collapsed")
+    ]
+
+
+def profile_path(name: str) -> Optional[str]:
+    """Path of a profile file by name, refusing anything outside PROFILE_DIR."""
+    if name != os.path.basename(name) or not name.endswith(".collapsed"):
+        return None
+    path = os.path.join(PROFILE_DIR, name)
+    return path if os.path.isfile(path) else None
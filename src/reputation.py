@@ -0,0 +1,234 @@
+"""Allow/deny reputation lists checked before any tool runs.
+
+Plain-text lists (one domain per line; CSV rows such as Tranco's "1,google.com"
+use their last field) are read from REPUTATION_DIR: `allow*.txt` files form
+the allowlist and `deny*.txt` files the denylist. Each list is compiled once
+into two files under the cache directory:
+
+- a Bloom filter (~1.2 MB per million domains at a 1% false-positive rate),
+  which rejects almost every lookup after a handful of bit tests;
+- a sorted array of 64-bit xxh3 fingerprints, binary-searched to confirm a
+  Bloom hit so false positives never produce a verdict.
+
+Both are memory-mapped read-only, so every worker process shares the same
+pages. Source files are re-checked every RELOAD_INTERVAL seconds and
+recompiled when they change.
+"""
+
+import os
+import glob
+import time
+import struct
+import threading
+import numpy as np
+import xxhash
+from typing import Dict, Iterable, List, Optional
+from tld import get_fld
+from tools.cache import CACHE_DIR
+from tools.get_domain_info import to_hostname
+
+REPUTATION_DIR = os.getenv(
+    "REPUTATION_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "reputation"),
+)
+COMPILED_DIR = os.path.join(CACHE_DIR, "reputation")
+FALSE_POSITIVE_RATE = 0.01
+RELOAD_INTERVAL = 5  # seconds between source file checks
+
+_HEADER = struct.Struct("<8sQQQ")  # magic, bit count, hash count, entry count
+_MAGIC = b"RLBLOOM1"
+_MASK64 = (1 << 64) - 1  # positions wrap like the uint64 arithmetic used at build time
+
+
+def normalize_domain(domain: str) -> str:
+    domain = domain.strip().lower().rstrip(".")
+    return domain[4:] if domain.startswith("www.") else domain
+
+
+def _hashes(domain: str):
+    digest = xxhash.xxh3_128_intdigest(domain.encode("utf-8"))
+    return digest >> 64, (digest & 0xFFFFFFFFFFFFFFFF) | 1
+
+
+def read_domains(paths: Iterable[str]) -> List[str]:
+    domains = set()
+    for path in paths:
+        with open(path, "r", encoding="UTF-8", errors="ignore") as file:
+            for line in file:
+                line = line.split("#", 1)[0].strip()
+                if line:
+                    domains.add(normalize_domain(line.rsplit(",", 1)[-1]))
+    domains.discard("")
+    return sorted(domains)
+
+
+def build_list(domains: List[str], bloom_path: str, exact_path: str,
+               false_positive_rate: float = FALSE_POSITIVE_RATE) -> None:
+    """Write the Bloom filter and fingerprint files for a list of domains."""
+    n = max(len(domains), 1)
+    bits = int(np.ceil(-n * np.log(false_positive_rate) / np.log(2) ** 2))
+    bits = (bits + 7) // 8 * 8
+    hash_count = max(1, int(round(bits / n * np.log(2))))
+
+    pairs = np.array([_hashes(domain) for domain in domains], dtype=np.uint64).reshape(-1, 2)
+    with np.errstate(over="ignore"):
+        positions = (pairs[:, :1] + np.arange(hash_count, dtype=np.uint64) * pairs[:, 1:]) % np.uint64(bits)
+    positions = positions.ravel()
+    bloom = np.zeros(bits // 8, dtype=np.uint8)
+    np.bitwise_or.at(bloom, (positions >> np.uint64(3)).astype(np.int64),
+                     (1 << (positions & np.uint64(7))).astype(np.uint8))
+
+    fingerprints = np.unique(np.array(
+        [xxhash.xxh3_64_intdigest(domain.encode("utf-8")) for domain in domains], dtype="<u8"
+    ))
+
+    # Written next to the target and renamed, so readers never map a partial file
+    for path, payload in (
+        (bloom_path, _HEADER.pack(_MAGIC, bits, hash_count, len(domains)) + bloom.tobytes()),
+        (exact_path, fingerprints.tobytes()),
+    ):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(payload)
+        os.replace(tmp_path, path)
+
+
+class ReputationList:
+    """A memory-mapped Bloom filter plus exact fingerprint tier."""
+
+    def __init__(self, bloom_path: str, exact_path: str):
+        with open(bloom_path, "rb") as file:
+            magic, self.bits, self.hash_count, self.size = _HEADER.unpack(file.read(_HEADER.size))
+        if magic != _MAGIC:
+            raise ValueError(f"Not a reputation Bloom filter: {bloom_path}")
+        self._bloom = np.memmap(bloom_path, dtype=np.uint8, mode="r", offset=_HEADER.size)
+        self._exact = (
+            np.memmap(exact_path, dtype="<u8", mode="r")
+            if os.path.getsize(exact_path) else np.zeros(0, dtype="<u8")
+        )
+
+    def might_contain(self, domain: str) -> bool:
+        h1, h2 = _hashes(domain)
+        for i in range(self.hash_count):
+            position = ((h1 + i * h2) & _MASK64) % self.bits
+            if not self._bloom[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def __contains__(self, domain: str) -> bool:
+        if not self.size or not self.might_contain(domain):
+            return False
+        fingerprint = np.uint64(xxhash.xxh3_64_intdigest(domain.encode("utf-8")))
+        index = np.searchsorted(self._exact, fingerprint)
+        return bool(index < len(self._exact) and self._exact[index] == fingerprint)
+
+
+def candidate_names(url: str) -> List[str]:
+    """The hostname and its parents down to the registrable domain.
+
+    Private suffixes count, so allowlisting a platform (myshopify.com) does
+    not allowlist every store hosted on it.
+    """
+    hostname = normalize_domain(to_hostname(url))
+    stop = get_fld(hostname, fix_protocol=True, fail_silently=True, search_private=True) or hostname
+    labels = hostname.split(".")
+    names = []
+    for i in range(len(labels)):
+        name = ".".join(labels[i:])
+        names.append(name)
+        if name == stop:
+            break
+    return names
+
+
+class ReputationLists:
+    """Allow and deny lists compiled from REPUTATION_DIR, reloaded when the sources change."""
+
+    KINDS = ("deny", "allow")
+
+    def __init__(self, source_dir: str = REPUTATION_DIR, compiled_dir: str = COMPILED_DIR):
+        self.source_dir = source_dir
+        self.compiled_dir = compiled_dir
+        self._lock = threading.Lock()
+        self._lists: Dict[str, Optional[ReputationList]] = {}
+        self._signatures: Dict[str, str] = {}
+        self._checked_at = 0.0
+        self.reload()
+
+    def _sources(self, kind: str) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.source_dir, f"{kind}*.txt")))
+
+    def _signature(self, paths: List[str]) -> str:
+        stamp = "|".join(f"{path}:{os.path.getmtime(path)}:{os.path.getsize(path)}" for path in paths)
+        return xxhash.xxh3_64_hexdigest(stamp)
+
+    def reload(self) -> bool:
+        """Recompile and remap lists whose source files changed; True if any did."""
+        changed = False
+        with self._lock:
+            self._checked_at = time.time()
+            for kind in self.KINDS:
+                paths = self._sources(kind)
+                signature = self._signature(paths)
+                if self._signatures.get(kind) == signature:
+                    continue
+                changed = True
+                self._signatures[kind] = signature
+                if not paths:
+                    self._lists[kind] = None
+                    continue
+
+                # Compiled files are named after their sources, so workers reuse each other's build
+                os.makedirs(self.compiled_dir, exist_ok=True)
+                bloom_path = os.path.join(self.compiled_dir, f"{kind}-{signature}.bloom")
+                exact_path = os.path.join(self.compiled_dir, f"{kind}-{signature}.exact")
+                if not (os.path.exists(bloom_path) and os.path.exists(exact_path)):
+                    domains = read_domains(paths)
+                    build_list(domains, bloom_path, exact_path)
+                    print(f"[REPUTATION] Compiled {len(domains)} {kind}list domains")
+                self._lists[kind] = ReputationList(bloom_path, exact_path)
+        return changed
+
+    def maybe_reload(self) -> None:
+        if time.time() - self._checked_at >= RELOAD_INTERVAL:
+            self.reload()
+
+    def lookup(self, url: str) -> Optional[str]:
+        """"deny" or "allow" when the domain (or a parent) is listed; the denylist wins."""
+        self.maybe_reload()
+        names = candidate_names(url)
+        for kind in self.KINDS:
+            reputation_list = self._lists.get(kind)
+            if reputation_list is not None and any(name in reputation_list for name in names):
+                return kind
+        return None
+
+
+_reputation_lists = None
+
+
+def get_reputation_lists() -> ReputationLists:
+    global _reputation_lists
+    if _reputation_lists is None:
+        _reputation_lists = ReputationLists()
+    return _reputation_lists
+
+
+def reputation_verdict(url: str) -> Optional[dict]:
+    """An immediate verdict for listed domains, in the agent's response format."""
+    kind = get_reputation_lists().lookup(url)
+    if kind == "deny":
+        return {
+            "Risk Level": "Critical",
+            "Rationale": [f"{normalize_domain(to_hostname(url))} is on the confirmed-scam denylist."],
+            "Confidence Level": 99,
+            "Fast Path": "denylist",
+        }
+    if kind == "allow":
+        return {
+            "Risk Level": "Low",
+            "Rationale": [f"{normalize_domain(to_hostname(url))} is on the trusted-retailer allowlist."],
+            "Confidence Level": 95,
+            "Fast Path": "allowlist",
+        }
+    return None
@@ -0,0 +1,221 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+import agent_workflow
+from agent_workflow import needs_escalation, collect_evidence, get_system_prompt
+from tools.get_domain_info import get_domain_info
+from tools.get_dns_info import get_dns_info
+from tools.get_ssl_crt import get_ssl_info
+from tests.test_domains import GOOD_DOMAINS, BAD_DOMAINS
+
+
+class FakeAgent:
+    """Stands in for a compiled agent: records the call and returns a fixed verdict."""
+
+    def __init__(self, model, tools, verdict, calls):
+        self.model = model
+        self.tools = tools
+        self.verdict = verdict
+        self.calls = calls
+
+    def invoke(self, inputs):
+        self.calls.append((self.model, len(self.tools), inputs["messages"][0]["content"]))
+        messages = [
+            HumanMessage(content=inputs["messages"][0]["content"]),
+            ToolMessage(content='{"domain_age_days": 12}', name="get_domain_info", tool_call_id="1"),
+            AIMessage(content="done"),
+        ]
+        return {"messages": messages, "structured_response": dict(self.verdict)}
+
+
+def fake_tiers(monkeypatch, verdicts):
+    calls = []
+    monkeypatch.setattr(agent_workflow, "MODEL_TIERS", list(verdicts))
+    monkeypatch.setattr(agent_workflow, "CHECKPOINTS_ENABLED", False)
+    monkeypatch.setattr(agent_workflow, "FRESHNESS_ENABLED", False)
+    monkeypatch.setattr(agent_workflow, "EVIDENCE_STORE_ENABLED", False)
+    monkeypatch.setattr(
+        agent_workflow, "build_agent",
+        lambda model, tools, prompt, checkpointer=None: FakeAgent(model, tools, verdicts[model], calls),
+    )
+    return calls
+
+
+def test_needs_escalation():
+    """Low confidence, missing confidence and Mixed verdicts escalate"""
+    assert not needs_escalation({"Risk Level": "Low", "Confidence Level": 90}, threshold=70)
+    assert needs_escalation({"Risk Level": "Low", "Confidence Level": 40}, threshold=70)
+    assert needs_escalation({"Risk Level": "Mixed", "Confidence Level": 95}, threshold=70)
+    assert needs_escalation({"Risk Level": "High"}, threshold=70)
+
+
+def test_confident_verdict_stays_on_first_tier(monkeypatch):
+    """A confident verdict from the cheap model is returned without a second call"""
+    calls = fake_tiers(monkeypatch, {
+        "small": {"Risk Level": "Low", "Rationale": ["Old domain"], "Confidence Level": 92},
+        "large": {"Risk Level": "High", "Rationale": ["Unused"], "Confidence Level": 99},
+    })
+
+    reply = agent_workflow.run_agent_workflow(GOOD_DOMAINS[0])
+
+    assert reply["Risk Level"] == "Low"
+    assert reply["Model Tier"] == {"tier": 1, "model": "small"}
+    assert [model for model, _, _ in calls] == ["small"]
+
+
+def test_ambiguous_verdict_escalates_with_same_evidence(monkeypatch):
+    """A Mixed verdict is re-judged by the next tier, without tools, on the first run's evidence"""
+    calls = fake_tiers(monkeypatch, {
+        "small": {"Risk Level": "Mixed", "Rationale": ["Unclear"], "Confidence Level": 55},
+        "large": {"Risk Level": "High", "Rationale": ["New domain"], "Confidence Level": 85},
+    })
+
+    reply = agent_workflow.run_agent_workflow(BAD_DOMAINS[0])
+
+    assert reply["Risk Level"] == "High"
+    assert reply["Model Tier"] == {"tier": 2, "model": "large"}
+    (_, first_tools, _), (model, tools, content) = calls
+    assert first_tools > 0 and model == "large" and tools == 0
+    assert '{"domain_age_days": 12}' in content and BAD_DOMAINS[0] in content
+
+
+def test_second_recheck_makes_no_tool_calls(monkeypatch, tmp_path):
+    """Signals refreshed by a re-check that reused the verdict stay fresh for the next one"""
+    import freshness
+    from langchain_core.tools import tool
+    from tools.cache import SQLiteCache
+
+    tool_calls = []
+
+    @tool
+    def get_domain_info(url: str) -> dict:
+        """WHOIS lookup."""
+        tool_calls.append("get_domain_info")
+        return {"domain": url, "creation_date": "2015-03-01"}
+
+    @tool
+    def check_reddit_reviews(domain: str) -> dict:
+        """Reddit search."""
+        tool_calls.append("check_reddit_reviews")
+        return {"domain": domain, "results": []}
+
+    class ToolCallingAgent(FakeAgent):
+        def invoke(self, inputs):
+            for agent_tool in self.tools:
+                agent_tool.invoke({next(iter(agent_tool.args)): GOOD_DOMAINS[0]})
+            return super().invoke(inputs)
+
+    verdict = {"Risk Level": "Low", "Rationale": ["Old domain"], "Confidence Level": 92}
+    fake_tiers(monkeypatch, {"small": verdict})
+    store = SQLiteCache(str(tmp_path / "signals.sqlite"))
+    monkeypatch.setattr(agent_workflow, "FRESHNESS_ENABLED", True)
+    monkeypatch.setattr(freshness, "_signal_store", store)
+    monkeypatch.setattr(agent_workflow, "SIGNAL_TOOLS", [get_domain_info, check_reddit_reviews])
+    monkeypatch.setattr(agent_workflow, "build_agent",
+                        lambda model, tools, prompt, checkpointer=None: ToolCallingAgent(model, tools, verdict, []))
+
+    agent_workflow.run_agent_workflow(GOOD_DOMAINS[0])
+    assessed_at = store.get(GOOD_DOMAINS[0])["checked_at"]
+    record = store.get(GOOD_DOMAINS[0])
+    record["signals"]["check_reddit_reviews"]["checked_at"] -= 2 * 86400
+    store.set(GOOD_DOMAINS[0], record, 3600)
+
+    tool_calls.clear()
+    first = agent_workflow.run_agent_workflow(GOOD_DOMAINS[0])
+    assert tool_calls == ["check_reddit_reviews"]
+
+    tool_calls.clear()
+    second = agent_workflow.run_agent_workflow(GOOD_DOMAINS[0])
+    assert tool_calls == []
+    assert first["Reused Verdict"] == second["Reused Verdict"] == {"assessed_at": assessed_at}
+    assert second["Risk Level"] == "Low"
+
+
+def checkpointed_tiers(monkeypatch, tmp_path, verdicts):
+    import checkpoints
+
+    calls = fake_tiers(monkeypatch, verdicts)
+    monkeypatch.setattr(agent_workflow, "CHECKPOINTS_ENABLED", True)
+    monkeypatch.setattr(checkpoints, "CHECKPOINT_PATH", str(tmp_path / "checkpoints.sqlite"))
+    monkeypatch.setattr(checkpoints, "_saver", None)
+    monkeypatch.setattr(agent_workflow, "run_checkpointed", lambda agent, inputs, thread, saver: agent.invoke(inputs))
+    monkeypatch.setattr(agent_workflow, "history_length", lambda agent, thread: 0)
+    return calls
+
+
+def test_retried_request_returns_final_verdict(monkeypatch, tmp_path):
+    """A retry of a finished request gets the escalated verdict back without running or counting anything"""
+    calls = checkpointed_tiers(monkeypatch, tmp_path, {
+        "small": {"Risk Level": "Mixed", "Rationale": ["Unclear"], "Confidence Level": 55},
+        "large": {"Risk Level": "High", "Rationale": ["New domain"], "Confidence Level": 85},
+    })
+
+    first = agent_workflow.run_agent_workflow(BAD_DOMAINS[0], request_id="req-1")
+    again = agent_workflow.run_agent_workflow(BAD_DOMAINS[0], request_id="req-1")
+
+    assert len(calls) == 2
+    assert again["Model Tier"] == first["Model Tier"] == {"tier": 2, "model": "large"}
+    assert again["Risk Level"] == "High" and again["Usage"]["totals"]["llm_turns"] == 0
+
+
+def test_requests_without_id_are_not_checkpointed(monkeypatch, tmp_path):
+    """Without a request id every analysis runs afresh"""
+    calls = checkpointed_tiers(monkeypatch, tmp_path, {
+        "small": {"Risk Level": "Low", "Rationale": ["Old domain"], "Confidence Level": 92},
+    })
+    checkpointed = []
+    monkeypatch.setattr(agent_workflow, "run_checkpointed", lambda *args: checkpointed.append(args))
+
+    agent_workflow.run_agent_workflow(GOOD_DOMAINS[0])
+    agent_workflow.run_agent_workflow(GOOD_DOMAINS[0])
+
+    assert len(calls) == 2 and not checkpointed
+
+
+def test_resumed_thread_counts_only_new_turns(monkeypatch, tmp_path):
+    """Turns already on a resumed thread are not counted again"""
+    checkpointed_tiers(monkeypatch, tmp_path, {
+        "small": {"Risk Level": "Low", "Rationale": ["Old domain"], "Confidence Level": 92},
+    })
+
+    def turn(input_tokens):
+        return AIMessage(content="", usage_metadata={"input_tokens": input_tokens, "output_tokens": 10,
+                                                     "total_tokens": input_tokens + 10})
+
+    history = [HumanMessage(content="check"), turn(4000)]
+    monkeypatch.setattr(agent_workflow, "history_length", lambda agent, thread: len(history))
+    monkeypatch.setattr(agent_workflow, "run_checkpointed", lambda agent, inputs, thread, saver: {
+        "messages": history + [turn(1500)],
+        "structured_response": {"Risk Level": "Low", "Rationale": ["Old domain"], "Confidence Level": 92},
+    })
+
+    reply = agent_workflow.run_agent_workflow(GOOD_DOMAINS[0], request_id="req-2")
+
+    assert reply["Usage"]["totals"]["llm_turns"] == 1
+    assert reply["Usage"]["totals"]["input_tokens"] == 1500
+
+
+def test_collect_evidence_keeps_only_tool_outputs():
+    """Only tool messages are forwarded to the larger model"""
+    evidence = collect_evidence([
+        HumanMessage(content="Is this domain legit"),
+        ToolMessage(content="registrar: Namecheap", name="get_domain_info", tool_call_id="1"),
+    ])
+
+    assert evidence == "### get_domain_info\nregistrar: Namecheap"
+
+
+def test_system_prompt_is_byte_stable():
+    """Tool order does not change the prompt, and tools are described by name, docs and arguments"""
+    tools = [get_ssl_info, get_domain_info, get_dns_info]
+    first = get_system_prompt("prompts/refined_prompt.md", tools)
+    second = get_system_prompt("prompts/refined_prompt.md", list(reversed(tools)))
+
+    assert first.encode("utf-8") == second.encode("utf-8")
+    assert first.index('"name":"get_dns_info"') < first.index('"name":"get_domain_info"') < first.index('"name":"get_ssl_info"')
+    assert "StructuredTool" not in first
+    assert '"Confidence Level"' in first
+
+
+if __name__ == "__main__":
+    test_needs_escalation()
+    test_collect_evidence_keeps_only_tool_outputs()
+    test_system_prompt_is_byte_stable()
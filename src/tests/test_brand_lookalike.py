@@ -0,0 +1,125 @@
+import json
+import time
+import random
+import string
+from tools.brand_lookalike import (
+    BrandIndex, SAMPLE_BRAND_LIST, brand_list_warning, check_lookalike, check_brand_impersonation, get_brand_index,
+    label_variants, skeleton,
+)
+from tests.test_domains import GOOD_DOMAINS, BAD_DOMAINS
+
+
+def levenshtein(a, b):
+    previous = list(range(len(b) + 1))
+    for i, x in enumerate(a, 1):
+        current = [i]
+        for j, y in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (x != y)))
+        previous = current
+    return previous[-1]
+
+
+def test_vectorized_distance_matches_reference():
+    """The bit-parallel distances equal a plain dynamic-programming Levenshtein"""
+    random.seed(7)
+    words = ["".join(random.choices("abcde", k=random.randint(4, 12))) for _ in range(300)]
+    index = BrandIndex([(word, f"{word}.com") for word in words])
+
+    for text in ["abcd", "eeddccbbaa", "a", "abcabcabcabcabc"]:
+        expected = [levenshtein(text, brand) for brand in index.skeletons]
+        assert index.distances(text).tolist() == expected
+
+
+def test_affix_and_homoglyph_variants():
+    """Hyphens, marketing affixes and homoglyphs are folded away"""
+    assert skeleton("amaz0n") == "amazon"
+    assert skeleton("rnodlily") == "modlily"
+    assert ("faherty", "affix") in label_variants("faherty-us")
+    assert ("acnestudios", "affix") in label_variants("acnestudiosus")
+
+
+def test_known_impersonators_are_flagged():
+    """BAD_DOMAINS imitating listed brands are flagged with the brand they copy"""
+    for domain, brand in [("acnestudiosus.com", "acnestudios"), ("faherty-us.com", "faherty")]:
+        result = check_lookalike(domain)
+        assert result["lookalike"], domain
+        assert result["closest_brands"][0]["brand"] == brand
+        assert result["closest_brands"][0]["technique"] == "affix"
+
+    assert check_lookalike("amaz0n-outlet.com")["lookalike"]
+    assert check_lookalike("nikr.com")["closest_brands"][0]["technique"] == "keyboard"
+
+
+def test_official_and_unrelated_domains_are_not_flagged():
+    """A brand's own domain and unrelated shops are not lookalikes"""
+    official = check_lookalike("https://www.burga.com/collections")
+    assert official["is_official_brand_domain"] and not official["lookalike"]
+
+    flagged = [domain for domain in GOOD_DOMAINS if check_lookalike(domain)["lookalike"]]
+    assert flagged == []
+
+
+def test_regional_brand_domains_are_not_flagged():
+    """The brand's exact name on a country-code suffix is regional, a typo of it is still flagged"""
+    for domain in ["adidas.de", "https://www.nike.co.jp/launch", "shop.adidas.com.au"]:
+        result = check_lookalike(domain)
+        assert result["is_regional_brand_domain"] and not result["lookalike"], domain
+        assert result["score"] == 0.0
+
+    assert check_lookalike("adidas.shop")["lookalike"]
+    assert check_lookalike("adidas.fake.de")["lookalike"]
+    assert check_lookalike("adldas.de")["lookalike"]
+    assert check_lookalike("adidas-outlet.de")["lookalike"]
+
+
+def test_brand_with_several_official_domains():
+    """Every listed official domain of a brand is recognised, not only the first"""
+    index = BrandIndex([("amazon", "amazon.com"), ("amazon", "amazon.co.uk"), ("amazon", "amazon.shop")])
+    assert len(index) == 1 and index.official[0] == ["amazon.com", "amazon.co.uk", "amazon.shop"]
+
+    for domain in ["amazon.co.uk", "www.amazon.shop", "smile.amazon.com"]:
+        result = check_lookalike(domain, index)
+        assert result["is_official_brand_domain"] and not result["lookalike"], domain
+    assert check_lookalike("amazon.co.uk")["is_official_brand_domain"]
+    assert check_lookalike("amazon.store", index)["lookalike"]
+
+
+def test_large_brand_list_is_fast():
+    """Tens of thousands of brands take single-digit milliseconds per domain"""
+    random.seed(3)
+    brands = ["".join(random.choices(string.ascii_lowercase, k=random.randint(4, 16))) for _ in range(30000)]
+    index = BrandIndex([(brand, f"{brand}.com") for brand in brands])
+    check_lookalike(BAD_DOMAINS[0], index)
+
+    start = time.perf_counter()
+    for domain in BAD_DOMAINS:
+        check_lookalike(domain, index)
+    assert (time.perf_counter() - start) / len(BAD_DOMAINS) < 0.010
+
+
+def test_brand_impersonation_tool():
+    """The agent tool returns JSON with the closest brands"""
+    result = json.loads(check_brand_impersonation.invoke({"domain": "acnestudiosus.com"}))
+
+    assert result["lookalike"] and result["brands_checked"] == len(get_brand_index())
+
+
+
+def test_sample_brand_list_warns(tmp_path):
+    """Running on the bundled sample list warns; a configured list does not"""
+    brands = tmp_path / "brands.txt"
+    brands.write_text("adidas.com\n")
+
+    assert "BRAND_LIST_PATH" in brand_list_warning(SAMPLE_BRAND_LIST)
+    assert brand_list_warning(str(brands)) is None
+
+
+if __name__ == "__main__":
+    test_vectorized_distance_matches_reference()
+    test_affix_and_homoglyph_variants()
+    test_known_impersonators_are_flagged()
+    test_official_and_unrelated_domains_are_not_flagged()
+    test_regional_brand_domains_are_not_flagged()
+    test_brand_with_several_official_domains()
+    test_brand_impersonation_tool()
+    test_sample_brand_list_warns()
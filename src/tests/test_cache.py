@@ -0,0 +1,200 @@
+import os
+import time
+import threading
+import multiprocessing
+import pytest
+from tools import cache as cache_module
+from tools.cache import MemoryCache, SQLiteCache, RedisCache, single_flight
+from tests.test_domains import BAD_DOMAINS
+
+VERDICT = {"Risk Level": "High", "Rationale": ["Registered last week"], "Confidence Level": 80}
+
+
+class FakeRedis:
+    """In-process stand-in for the redis-py calls RedisCache makes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def get(self, key):
+        with self._lock:
+            value, expires_at = self._data.get(key, (None, None))
+            return None if expires_at is not None and expires_at <= time.time() else value
+
+    def set(self, key, value, px=None, nx=False):
+        with self._lock:
+            current = self._data.get(key)
+            if nx and current is not None and current[1] > time.time():
+                return None
+            self._data[key] = (value, time.time() + px / 1000)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def eval(self, script, numkeys, key, owner):
+        # Only RedisCache.RELEASE_SCRIPT is ever evaluated: delete `key` if it holds `owner`
+        with self._lock:
+            if self._data.get(key, (None,))[0] == owner:
+                del self._data[key]
+                return 1
+            return 0
+
+
+def slow_lookup(path, marker_dir, key):
+    """One worker process asking for `key` at the same time as its siblings."""
+    cache = SQLiteCache(path)
+
+    def compute():
+        open(os.path.join(marker_dir, f"computed-{os.getpid()}"), "w").close()
+        time.sleep(0.5)
+        cache.set(key, {"pid": os.getpid()}, 60)
+        return cache.get(key)
+
+    result = single_flight(cache, key, compute, lambda: cache.get(key), lease_ttl=10)
+    with open(os.path.join(marker_dir, f"result-{os.getpid()}"), "w") as file:
+        file.write(str(result["pid"]))
+
+
+def test_single_flight_across_processes(tmp_path):
+    """Worker processes sharing the SQLite file compute a missing entry once"""
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=slow_lookup, args=(str(tmp_path / "shared.sqlite"), str(tmp_path), "whois:x"))
+               for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+
+    computed = [name for name in os.listdir(tmp_path) if name.startswith("computed-")]
+    results = {open(tmp_path / name).read() for name in os.listdir(tmp_path) if name.startswith("result-")}
+    assert len(computed) == 1 and len(results) == 1 and len(list(tmp_path.glob("result-*"))) == 4
+
+
+def test_leases(tmp_path):
+    """Leases are exclusive until released or expired, and a dead holder's lease is taken over"""
+    for cache in (MemoryCache(), SQLiteCache(str(tmp_path / "leases.sqlite")), RedisCache(FakeRedis(), "t:")):
+        assert cache.acquire_lease("k", "1:a", 60)
+        assert not cache.acquire_lease("k", "1:b", 60)
+        cache.release_lease("k", "1:b")
+        assert not cache.acquire_lease("k", "1:b", 60)
+        assert cache.lease_holder("k") == "1:a"
+        cache.release_lease("k", "1:a")
+        assert cache.lease_holder("k") is None
+        assert cache.acquire_lease("k", "1:b", 0.05)
+        time.sleep(0.1)
+        assert cache.acquire_lease("k", "1:c", 60)
+
+    shared = SQLiteCache(str(tmp_path / "leases.sqlite"))
+    assert shared.acquire_lease("dead", "999999999:a", 600)
+    assert shared.acquire_lease("dead", f"{os.getpid()}:b", 600)
+    assert not shared.acquire_lease("dead", f"{os.getpid()}:c", 600)
+
+
+def test_waiters_back_off_and_only_read(tmp_path):
+    """While the lease is held a waiter never writes, and its checks back off to MAX_POLL_INTERVAL"""
+    cache = SQLiteCache(str(tmp_path / "leases.sqlite"))
+    holder = f"{os.getpid()}:holder"
+    assert cache.acquire_lease("k", holder, 60)
+    writes, lookups = [], []
+    acquire = cache.acquire_lease
+    cache.acquire_lease = lambda *args: writes.append(args) or acquire(*args)
+    threading.Timer(2.5, lambda: cache.set("k", "value", 60)).start()
+
+    def lookup():
+        lookups.append(time.monotonic())
+        return cache.get("k")
+
+    assert single_flight(cache, "k", lambda: "computed", lookup, lease_ttl=60) == "value"
+    assert writes == []
+    assert len(lookups) <= 8
+    assert lookups[-1] - lookups[-2] >= 0.5
+
+
+def test_waiters_give_up_well_before_the_lease_expires():
+    """A waiter computes itself after a quarter of the lease TTL by default"""
+    cache = MemoryCache()
+    cache.acquire_lease("k", "1:stuck", 2)
+
+    start = time.monotonic()
+    assert single_flight(cache, "k", lambda: "computed", lambda: None, lease_ttl=2) == "computed"
+    assert 0.5 <= time.monotonic() - start < 1
+
+
+def test_redis_cache_entries():
+    """The Redis backend stores JSON values under its prefix with a TTL"""
+    client = FakeRedis()
+    cache = RedisCache(client, "rulegit:reddit:")
+    cache.set("shop.com", {"results": [1, 2]}, 0.05)
+    assert cache.get("shop.com") == {"results": [1, 2]}
+    assert "rulegit:reddit:shop.com" in client._data
+    time.sleep(0.1)
+    assert cache.get("shop.com") is None
+
+
+def test_waiters_take_over_after_a_failed_holder():
+    """When the computing caller fails, a waiter computes instead of returning nothing"""
+    cache = RedisCache(FakeRedis())
+    calls, results = [], []
+
+    def compute():
+        calls.append(threading.current_thread().name)
+        time.sleep(0.2)
+        if len(calls) == 1:
+            raise RuntimeError("upstream timeout")
+        cache.set("k", "value", 60)
+        return "value"
+
+    def caller():
+        try:
+            results.append(single_flight(cache, "k", compute, lambda: cache.get("k"), lease_ttl=10))
+        except RuntimeError:
+            results.append("failed")
+
+    threads = [threading.Thread(target=caller) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 2
+    assert sorted(results) == ["failed"] + ["value"] * 4
+
+
+def test_concurrent_requests_share_one_analysis(tmp_path, monkeypatch):
+    """Simultaneous requests for a domain run the agent once; the others wait for its verdict"""
+    from fastapi.testclient import TestClient
+    import app
+    import verdict_store
+
+    runs = []
+
+    def workflow(url, request_id=None):
+        runs.append(url)
+        time.sleep(0.5)
+        return {**VERDICT, "Usage": {"totals": {"llm_turns": 2}}}
+
+    monkeypatch.setattr(cache_module, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(cache_module, "_shared", {})
+    monkeypatch.setattr(verdict_store, "_store", verdict_store.VerdictStore(str(tmp_path / "verdicts.sqlite")))
+    monkeypatch.setattr(app, "reputation_verdict", lambda url: None)
+    monkeypatch.setattr(app, "run_agent_workflow", workflow)
+    client = TestClient(app.app)
+
+    responses = []
+    threads = [threading.Thread(target=lambda: responses.append(
+        client.get("/validate_url", params={"url": BAD_DOMAINS[0], "debug": "true"}).json())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(runs) == 1
+    assert all(response["Risk Level"] == "High" for response in responses)
+    assert sum(response["Debug"]["usage"] is None for response in responses) == 3
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
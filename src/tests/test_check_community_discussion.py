@@ -1,7 +1,30 @@
-from tools.check_community_discussion import check_reddit_reviews
+from tools import check_community_discussion as reddit_module
+from tools.cache import MemoryCache
+from tools.check_community_discussion import check_reddit_reviews, tiered_reddit_search
 from tests.test_domains import GOOD_DOMAINS, BAD_DOMAINS
 
 
+class FakeTavily:
+    """Records search calls and answers from canned per-depth results."""
+
+    def __init__(self, results):
+        self.results = results
+        self.calls = []
+
+    def search(self, query, search_depth="basic", include_domains=None, max_results=5):
+        self.calls.append((query, search_depth, include_domains))
+        return {"query": query, "results": self.results.get(search_depth, [])}
+
+
+def reddit_hit(n, domain, score=0.5):
+    return {
+        "title": f"Has anyone ordered from {domain}? ({n})",
+        "url": f"https://www.reddit.com/r/Scams/comments/{n}/post/",
+        "content": f"Post {n}: I ordered from {domain} " + " ".join(f"update{n}-{i}" for i in range(60)),
+        "score": score,
+    }
+
+
 def test_reddit_reviews_good_domain():
     """Test Reddit reviews for good domain"""
     domain = GOOD_DOMAINS[0]
@@ -26,6 +49,70 @@ def test_reddit_reviews_bad_domain():
     assert "results" in result
 
 
+def test_reddit_basic_search_is_enough(monkeypatch):
+    """Plenty of basic hits means no advanced search"""
+    domain = GOOD_DOMAINS[11]
+    fake = FakeTavily({"basic": [reddit_hit(n, domain) for n in range(4)]})
+    monkeypatch.setattr(reddit_module, "tavily_client", fake)
+
+    result = tiered_reddit_search(domain)
+
+    assert [call[1] for call in fake.calls] == ["basic"]
+    assert fake.calls[0][2] == ["reddit.com"]
+    assert result["search_depth"] == "basic"
+    assert len(result["results"]) == 4
+    assert result["results"][0]["subreddit"] == "Scams"
+    assert len(result["results"][0]["snippet"]) <= reddit_module.MAX_SNIPPET_CHARS + 3
+
+
+def test_reddit_sparse_results_escalate(monkeypatch):
+    """Too few relevant hits escalate to advanced depth, merged without duplicates"""
+    domain = BAD_DOMAINS[3]
+    unrelated = {"title": "Best jewelry shops", "url": "https://www.reddit.com/r/jewelry/x/", "content": "..."}
+    fake = FakeTavily({
+        "basic": [reddit_hit(1, domain), unrelated],
+        "advanced": [reddit_hit(1, domain), reddit_hit(2, domain, score=0.9)],
+    })
+    monkeypatch.setattr(reddit_module, "tavily_client", fake)
+
+    result = tiered_reddit_search(domain)
+
+    assert [call[1] for call in fake.calls] == ["basic", "advanced"]
+    assert result["search_depth"] == "advanced"
+    assert [hit["url"] for hit in result["results"]] == [
+        reddit_hit(2, domain)["url"], reddit_hit(1, domain)["url"]
+    ]
+
+
+def test_reddit_mirrored_threads_collapse(monkeypatch):
+    """Near-identical copies of one thread are returned once with a count"""
+    domain = BAD_DOMAINS[5]
+    thread = f"Scam alert: {domain} took my money and never shipped anything, support stopped replying " * 5
+    hits = [dict(reddit_hit(n, domain), content=thread + ("(crosspost)" if n else "")) for n in range(3)]
+    hits.append(reddit_hit(9, domain))
+    fake = FakeTavily({"basic": hits})
+    monkeypatch.setattr(reddit_module, "tavily_client", fake)
+
+    result = tiered_reddit_search(domain)
+
+    assert len(result["results"]) == 2
+    assert result["results"][0]["duplicate_count"] == 3
+
+
+def test_reddit_results_cached(monkeypatch):
+    """Variants of one domain are served from the cache"""
+    domain = GOOD_DOMAINS[0]
+    fake = FakeTavily({"basic": [reddit_hit(n, domain) for n in range(3)]})
+    monkeypatch.setattr(reddit_module, "tavily_client", fake)
+    monkeypatch.setattr(reddit_module, "_reddit_cache", MemoryCache())
+
+    first = check_reddit_reviews.invoke(domain)
+    second = check_reddit_reviews.invoke(f"https://www.{domain}/")
+
+    assert first == second
+    assert len(fake.calls) == 1
+
+
 if __name__ == "__main__":
     test_reddit_reviews_good_domain()
     test_reddit_reviews_bad_domain()
\ No newline at end of file
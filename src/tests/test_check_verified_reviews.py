@@ -1,7 +1,35 @@
-from tools.check_verified_reviews import extract_with_diffbot, get_trustpilot_review
+import time
+import asyncio
+import httpx
+import pytest
+from tools import check_verified_reviews as reviews_module
+from tools.cache import MemoryCache
+from tools.check_verified_reviews import (
+    extract_with_diffbot, get_trustpilot_review, project_trustpilot, fetch_first_review, diffbot_payload
+)
 from tests.test_domains import GOOD_DOMAINS, BAD_DOMAINS
 
 
+DIFFBOT_PAYLOAD = {
+    "request": {"pageUrl": "https://www.trustpilot.com/review/burga.com", "api": "analyze"},
+    "type": "discussion",
+    "objects": [
+        {
+            "type": "discussion",
+            "title": "BURGA Reviews | Read Customer Service Reviews of burga.com",
+            "text": "BURGA Reviews 12,345 • Excellent TrustScore 4.3 out of 5 "
+                    "5-star 78% 4-star 9% 3-star 4% 2-star 2% 1-star 7% " + "boilerplate " * 500,
+            "posts": [
+                {"date": "Mon, 03 Mar 2025 10:00:00 GMT", "rating": 5, "title": "Great case",
+                 "text": "Arrived quickly. " * 100},
+                {"date": "Sun, 02 Mar 2025 10:00:00 GMT", "rating": 1, "title": "Broke",
+                 "text": "Cracked after a week."},
+            ],
+        }
+    ],
+}
+
+
 def test_trustpilot_good_domains():
     """Test Trustpilot reviews for good domains"""
     print("Testing Trustpilot reviews for good domains:")
@@ -67,6 +95,95 @@ def test_diffbot_extraction():
         print(f"  Failed to extract data from {test_url}")
 
 
+def test_project_trustpilot():
+    """Raw Diffbot payloads are reduced to a compact record"""
+    record = project_trustpilot(DIFFBOT_PAYLOAD, "https://www.trustpilot.com/review/burga.com")
+
+    assert record["trustscore"] == 4.3
+    assert record["review_count"] == 12345
+    assert record["rating_distribution"]["5-star"] == 78
+    assert record["rating_distribution"]["1-star"] == 7
+    assert len(record["recent_reviews"]) == 2
+    assert len(record["recent_reviews"][0]["text"]) <= reviews_module.MAX_SNIPPET_CHARS + 3
+    assert len(str(record)) < len(str(DIFFBOT_PAYLOAD)) / 4
+
+
+def test_trustpilot_variants_race(monkeypatch):
+    """Both URL variants are queried concurrently and the first payload wins"""
+    async def fake_fetch(client, url):
+        if "review/www." in url:
+            await asyncio.sleep(0.1)
+            return DIFFBOT_PAYLOAD
+        await asyncio.sleep(5)
+        return None
+
+    monkeypatch.setattr(reviews_module, "fetch_diffbot", fake_fetch)
+
+    start = time.time()
+    record = asyncio.run(fetch_first_review("burga.com"))
+
+    assert time.time() - start < 1
+    assert record["url"] == "https://www.trustpilot.com/review/www.burga.com"
+
+
+def test_trustpilot_negative_result_cached(monkeypatch):
+    """A domain without Trustpilot pages returns an error and is cached"""
+    calls = []
+
+    async def fake_fetch(client, url):
+        calls.append(url)
+        return None
+
+    monkeypatch.setattr(reviews_module, "fetch_diffbot", fake_fetch)
+    monkeypatch.setattr(reviews_module, "_review_cache", MemoryCache())
+
+    first = get_trustpilot_review.invoke("mbgmlye.top")
+    second = get_trustpilot_review.invoke("www.mbgmlye.top")
+
+    assert "Error" in first
+    assert first == second
+    assert len(calls) == 2
+
+
+def diffbot_response(status, payload):
+    return httpx.Response(status, json=payload, request=httpx.Request("GET", reviews_module.DIFFBOT_URL))
+
+
+def test_diffbot_errors_are_not_not_found():
+    """Only a missing page is "not found"; auth, rate-limit and server errors raise"""
+    assert diffbot_payload(diffbot_response(200, DIFFBOT_PAYLOAD)) == DIFFBOT_PAYLOAD
+    assert diffbot_payload(diffbot_response(200, {"errorCode": 404, "error": "Could not download page"})) is None
+    assert diffbot_payload(diffbot_response(200, {"errorCode": 500, "error": "Could not download page (404)"})) is None
+    assert diffbot_payload(diffbot_response(404, {"errorCode": 404, "error": "Not found"})) is None
+
+    with pytest.raises(httpx.HTTPStatusError):
+        diffbot_payload(diffbot_response(401, {"errorCode": 401, "error": "Not authorized API token."}))
+    with pytest.raises(httpx.HTTPStatusError):
+        diffbot_payload(diffbot_response(429, {"errorCode": 429, "error": "Too many requests"}))
+    with pytest.raises(RuntimeError):
+        diffbot_payload(diffbot_response(200, {"errorCode": 500, "error": "Request timed out"}))
+
+
+def test_trustpilot_transient_error_not_cached(monkeypatch):
+    """A rate-limited variant fails the lookup instead of caching "not found" for hours"""
+    calls = []
+
+    async def fake_fetch(client, url):
+        calls.append(url)
+        if "review/www." in url:
+            return diffbot_payload(diffbot_response(429, {"errorCode": 429, "error": "Too many requests"}))
+        return None
+
+    monkeypatch.setattr(reviews_module, "fetch_diffbot", fake_fetch)
+    monkeypatch.setattr(reviews_module, "_review_cache", MemoryCache())
+
+    first = get_trustpilot_review.invoke("mbgmlye.top")
+    second = get_trustpilot_review.invoke("mbgmlye.top")
+
+    assert "Error retrieving" in first["Error"] and "Error retrieving" in second["Error"]
+    assert len(calls) == 4
+
+
 if __name__ == "__main__":
     test_trustpilot_good_domains()
     test_trustpilot_bad_domains()
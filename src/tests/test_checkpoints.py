@@ -0,0 +1,102 @@
+import sqlite3
+import pytest
+from typing import Any, List, Optional
+from langchain.agents import create_agent
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.tools import tool
+from langgraph.checkpoint.sqlite import SqliteSaver
+import checkpoints
+from checkpoints import run_checkpointed, gc_checkpoints, thread_id
+from agent_workflow import domain_response
+from tests.test_domains import BAD_DOMAINS
+
+VERDICT = {"Risk Level": "High", "Rationale": ["Domain registered last week"], "Confidence Level": 80}
+tool_calls = {"whois": 0, "reviews": 0}
+
+
+@tool
+def whois(domain: str) -> str:
+    """WHOIS lookup."""
+    tool_calls["whois"] += 1
+    return "created 3 days ago"
+
+
+@tool
+def reviews(domain: str) -> str:
+    """Review lookup; fails on its first call like a flaky upstream."""
+    tool_calls["reviews"] += 1
+    if tool_calls["reviews"] == 1:
+        raise ConnectionError("upstream timed out")
+    return "users report non-delivery"
+
+
+class ScriptedModel(BaseChatModel):
+    """Calls both tools first (when bound), then answers with the structured verdict."""
+
+    tool_names: List[str] = []
+    calls: List[int] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs: Any):
+        return self.model_copy(update={"tool_names": [getattr(t, "name", None) or t["title"] for t in tools]})
+
+    def _generate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        self.calls.append(1)
+        if "whois" not in self.tool_names or any(isinstance(m, ToolMessage) for m in messages):
+            calls = [{"name": self.tool_names[-1], "args": VERDICT, "id": "final"}]
+        else:
+            calls = [{"name": name, "args": {"domain": BAD_DOMAINS[0]}, "id": name} for name in ("whois", "reviews")]
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="", tool_calls=calls))])
+
+
+@pytest.fixture
+def saver(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "checkpoints.sqlite"), check_same_thread=False)
+    conn.execute("CREATE TABLE checkpoint_threads (thread_id TEXT PRIMARY KEY, updated_at REAL NOT NULL)")
+    return SqliteSaver(conn)
+
+
+def test_retry_resumes_from_last_completed_step(saver, monkeypatch):
+    """A failed run resumes without repeating finished tool calls, and a duplicate reuses the verdict"""
+    monkeypatch.setattr(checkpoints, "_last_gc", 0.0)
+    tool_calls.update(whois=0, reviews=0)
+    model = ScriptedModel(calls=[])
+    agent = create_agent(model=model, tools=[whois, reviews], response_format=domain_response, checkpointer=saver)
+    inputs = {"messages": [{"role": "user", "content": f"Is this domain legit: {BAD_DOMAINS[0]}"}]}
+    thread = thread_id(BAD_DOMAINS[0], "req-1")
+
+    with pytest.raises(ConnectionError):
+        run_checkpointed(agent, inputs, thread, saver)
+    response = run_checkpointed(agent, inputs, thread, saver)
+
+    assert response["structured_response"] == VERDICT
+    assert tool_calls == {"whois": 1, "reviews": 2}
+    assert len(model.calls) == 2
+
+    again = run_checkpointed(agent, inputs, thread, saver)
+    assert again["structured_response"] == VERDICT
+    assert len(model.calls) == 2
+
+
+def test_gc_removes_old_threads(saver):
+    """Threads older than the TTL lose their checkpoints"""
+    agent = create_agent(model=ScriptedModel(calls=[]), tools=[], response_format=domain_response, checkpointer=saver)
+    tool_calls.update(whois=0, reviews=0)
+    old, new = thread_id(BAD_DOMAINS[1], "old"), thread_id(BAD_DOMAINS[1], "new")
+    for thread in (old, new):
+        agent.invoke({"messages": [{"role": "user", "content": "check"}]}, {"configurable": {"thread_id": thread}})
+        saver.conn.execute("INSERT INTO checkpoint_threads VALUES (?, ?)", (thread, 0 if thread == old else 9e12))
+    saver.conn.commit()
+
+    assert gc_checkpoints(saver, max_age=3600) == 1
+    assert saver.get_tuple({"configurable": {"thread_id": old}}) is None
+    assert saver.get_tuple({"configurable": {"thread_id": new}}) is not None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,54 @@
+import time
+from tools.dedup import dedupe_snippets, dedupe_texts, cluster_near_duplicates
+
+
+COMPLAINT = ("I ordered a necklace from this store three weeks ago and it never arrived. "
+             "The tracking number does not work and support ignores every email. Avoid this site.")
+
+
+def test_near_duplicates_collapse():
+    """Copies with small edits collapse into the first item with a count"""
+    items = [
+        {"url": "https://reddit.com/r/Scams/1", "snippet": COMPLAINT},
+        {"url": "https://unddit.com/r/Scams/1", "snippet": COMPLAINT + " [mirror]"},
+        {"url": "https://reddit.com/r/jewelry/2", "snippet": "Love my ring, shipping took five days and quality is great."},
+        {"url": "https://reveddit.com/r/Scams/1", "snippet": COMPLAINT.replace("three", "3")},
+        {"url": "https://reddit.com/r/Scams/3", "snippet": ""},
+    ]
+
+    result = dedupe_snippets(items)
+
+    assert [item["url"] for item in result] == [
+        "https://reddit.com/r/Scams/1", "https://reddit.com/r/jewelry/2", "https://reddit.com/r/Scams/3"
+    ]
+    assert result[0]["duplicate_count"] == 3
+    assert "duplicate_count" not in result[1]
+    assert "duplicate_count" not in items[0]
+
+
+def test_distinct_texts_are_kept():
+    """Unrelated texts are never merged"""
+    texts = [f"Review {i}: " + " ".join(f"word{i}x{j}" for j in range(30)) for i in range(50)]
+
+    assert dedupe_texts(texts) == texts
+
+
+def test_dedup_is_fast_for_hundreds_of_snippets():
+    """Hundreds of snippets are clustered in well under a second"""
+    texts = []
+    for i in range(100):
+        base = f"Thread {i} about order {i}: " + " ".join(f"token{i}_{j}" for j in range(40))
+        texts.extend([base, base + " edited", base + " (crossposted)"])
+
+    start = time.time()
+    clusters = cluster_near_duplicates(texts)
+    elapsed = time.time() - start
+
+    assert len(set(clusters)) == 100
+    assert elapsed < 0.5
+
+
+if __name__ == "__main__":
+    test_near_duplicates_collapse()
+    test_distinct_texts_are_kept()
+    test_dedup_is_fast_for_hundreds_of_snippets()
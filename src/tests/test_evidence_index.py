@@ -0,0 +1,100 @@
+import json
+from tools import evidence_index
+from tools.evidence_index import (
+    BM25Index, evidence_to_passages, compact_evidence, start_analysis_index, with_evidence_retrieval
+)
+from tests.test_domains import BAD_DOMAINS
+
+
+def reddit_output(domain, n=40):
+    filler = [f"Post {i} about {domain}: " + " ".join(f"chat{i}w{j}" for j in range(60)) for i in range(n)]
+    filler[7] = f"I ordered from {domain} a month ago and the package never arrived, tracking number is fake."
+    filler[21] = f"Asked {domain} for a refund and they refused, had to open a chargeback with my bank."
+    return {"domain": domain, "results": [{"title": f"Thread {i}", "snippet": text} for i, text in enumerate(filler)]}
+
+
+def test_bm25_ranks_relevant_passages_first():
+    """The passage sharing rare query terms ranks first"""
+    index = BM25Index()
+    index.add([
+        {"source": "reddit", "section": None, "text": "great necklace fast shipping"},
+        {"source": "reddit", "section": None, "text": "never got my refund after the return"},
+        {"source": "trustpilot", "section": None, "text": "refund refused, customer service ignored me"},
+    ])
+
+    hits = index.search("refund return", k=2)
+
+    assert [hit["text"] for hit in hits] == [
+        "never got my refund after the return", "refund refused, customer service ignored me"
+    ]
+    assert index.search("refund", source="trustpilot")[0]["source"] == "trustpilot"
+    assert index.search("unrelated words") == []
+
+
+def test_evidence_to_passages_keeps_records_apart():
+    """Each search hit becomes its own passage"""
+    passages = evidence_to_passages("reddit", reddit_output(BAD_DOMAINS[3], n=25))
+
+    assert len(passages) == 26
+    assert passages[1]["section"] == "results"
+    assert passages[1]["text"].startswith("title: Thread 0")
+
+
+def test_compact_evidence_returns_top_passages():
+    """Large outputs are replaced by the passages answering trust questions"""
+    start_analysis_index()
+    output = reddit_output(BAD_DOMAINS[3])
+
+    compact = compact_evidence("reddit", output)
+
+    assert compact["total_passages"] == 41
+    assert "never arrived" in compact["top_passages"]["delivery"][0]["text"]
+    assert "chargeback" in compact["top_passages"]["refund"][0]["text"]
+    assert len(json.dumps(compact)) < len(json.dumps(output)) / 2
+
+    small = {"domain": BAD_DOMAINS[3], "results": []}
+    assert compact_evidence("reddit", small) == small
+
+
+def test_with_evidence_retrieval_wraps_plain_functions():
+    """Wrapped tools keep their name and arguments"""
+    def scrape_url_info(url: str, mode: str = "requests") -> dict:
+        """Scrape the review page of a domain."""
+        return reddit_output(url)
+
+    start_analysis_index()
+    wrapped = with_evidence_retrieval("scam_detector", scrape_url_info)
+
+    assert wrapped.name == "scrape_url_info"
+    assert set(wrapped.args) == {"url", "mode"}
+    assert wrapped.invoke({"url": BAD_DOMAINS[3]})["source"] == "scam_detector"
+
+
+def test_persisted_index_round_trip(monkeypatch, tmp_path):
+    """Persisted passages are reused for the same evidence and never for changed evidence"""
+    monkeypatch.setattr(evidence_index, "INDEX_DIR", str(tmp_path))
+    monkeypatch.setattr(evidence_index, "PERSIST_INDEX", True)
+    domain = BAD_DOMAINS[3]
+
+    start_analysis_index(domain)
+    compact_evidence("reddit", reddit_output(domain))
+    evidence_index.save_analysis_index(domain)
+
+    chunked = []
+    monkeypatch.setattr(evidence_index, "evidence_to_passages",
+                        lambda source, output: chunked.append(source) or evidence_to_passages(source, output))
+    index = start_analysis_index(domain)
+    compact_evidence("reddit", reddit_output(domain))
+    assert len(index) == 41 and chunked == []
+
+    # The domain's Reddit threads changed: nothing of the old evidence is retrieved
+    index = start_analysis_index(domain)
+    compact_evidence("reddit", reddit_output(domain, n=30))
+    assert len(index) == 31 and chunked == ["reddit"]
+    assert not any("Post 35 " in passage["text"] for passage in index.passages)
+
+
+if __name__ == "__main__":
+    test_bm25_ranks_relevant_passages_first()
+    test_evidence_to_passages_keeps_records_apart()
+    test_compact_evidence_returns_top_passages()
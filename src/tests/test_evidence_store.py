@@ -0,0 +1,125 @@
+import json
+import time
+import pytest
+import evidence_store
+from langchain_core.tools import tool
+from evidence_store import EvidenceStore
+from tests.test_domains import GOOD_DOMAINS, BAD_DOMAINS
+
+PANELS = ["Threat Profile", "Phishing Profile", "Malware Score", "Spam Score", "Domain Blacklist Status"]
+
+
+def scam_detector_page(domain, i):
+    """Scam-detector style output: the same panel template with a few per-domain values."""
+    return {
+        panel: f"{panel} for {domain} is {(i * 7 + k) % 100} out of 100. This score is computed from the "
+               f"website's history, its hosting, the registrar and the reports of our community of users."
+        for k, panel in enumerate(PANELS)
+    }
+
+
+def test_history_is_streamed_by_domain_and_time(tmp_path):
+    """Records come back per domain, in order, filtered by time and kind"""
+    store = EvidenceStore(str(tmp_path / "evidence.sqlite"))
+    start = time.time()
+    store.append(BAD_DOMAINS[0], "signal", "get_domain_info", {"creation_date": "2025-01-01"}, created_at=start)
+    store.append(GOOD_DOMAINS[0], "signal", "get_domain_info", {"creation_date": "1999-01-01"}, created_at=start)
+    store.append(BAD_DOMAINS[0], "signal", "get_domain_info", {"creation_date": "2025-01-02"}, created_at=start + 10)
+    store.append(BAD_DOMAINS[0], "verdict", "verdict", {"Risk Level": "High"}, created_at=start + 20)
+
+    history = store.domain_history(BAD_DOMAINS[0])
+    assert [record["kind"] for record in history] == ["signal", "signal", "verdict"]
+    assert store.latest_signals(BAD_DOMAINS[0]) == {"get_domain_info": {"creation_date": "2025-01-02"}}
+    assert store.latest_signals(BAD_DOMAINS[0], before=start + 5) == {"get_domain_info": {"creation_date": "2025-01-01"}}
+    assert [r["domain"] for r in store.iter_records(since=start, until=start + 1, batch_size=1)] == [
+        BAD_DOMAINS[0], GOOD_DOMAINS[0]
+    ]
+
+
+def test_large_payloads_compress_and_roundtrip(tmp_path):
+    """Big outputs are zstd-compressed and decode back unchanged"""
+    store = EvidenceStore(str(tmp_path / "evidence.sqlite"))
+    page = scam_detector_page(BAD_DOMAINS[0], 1)
+
+    store.append_signal(BAD_DOMAINS[0], "scrape_url_info", page)
+
+    assert store.domain_history(BAD_DOMAINS[0])[0]["value"] == page
+    stats = store.stats()
+    assert stats["stored_bytes"] < stats["raw_bytes"]
+
+
+def test_trained_dictionary_shrinks_template_pages(tmp_path, monkeypatch):
+    """After enough samples a dictionary is trained, and new template pages store much smaller"""
+    monkeypatch.setattr(evidence_store, "DICTIONARY_SAMPLES", 100)
+    monkeypatch.setattr(evidence_store, "DICTIONARY_SIZE", 4096)
+    store = EvidenceStore(str(tmp_path / "evidence.sqlite"))
+    domains = [f"shop{i}-outlet.com" for i in range(100)]
+    for i, domain in enumerate(domains):
+        store.append_signal(domain, "scrape_url_info", scam_detector_page(domain, i))
+
+    assert "scrape_url_info" in store.stats()["dictionaries"]
+    plain = store.stats()["stored_bytes"] / 100
+
+    page = scam_detector_page(BAD_DOMAINS[1], 500)
+    store.append_signal(BAD_DOMAINS[1], "scrape_url_info", page)
+    with_dictionary = store.stats()["stored_bytes"] - plain * 100
+
+    assert with_dictionary < plain / 2
+    assert store.latest_signals(BAD_DOMAINS[1]) == {"scrape_url_info": page}
+
+    # A reopened store keeps using the trained dictionary
+    reopened = EvidenceStore(store.path)
+    assert reopened.latest_signals(BAD_DOMAINS[1]) == {"scrape_url_info": page}
+
+
+def test_wrapped_tool_appends_each_call(tmp_path):
+    """Wrapped tools return their output unchanged and archive it"""
+    store = EvidenceStore(str(tmp_path / "evidence.sqlite"))
+
+    @tool
+    def get_dns_info(domain: str) -> str:
+        """DNS lookup."""
+        return json.dumps({"domain": domain, "resolves": True})
+
+    output = store.wrap(GOOD_DOMAINS[1], get_dns_info).invoke({"domain": GOOD_DOMAINS[1]})
+
+    assert json.loads(output)["resolves"]
+    assert store.latest_signals(GOOD_DOMAINS[1]) == {"get_dns_info": output}
+
+
+def test_rescore_from_stored_signals(tmp_path):
+    """Thousands of domains are re-scored from stored signals in one pass, in seconds"""
+    store = EvidenceStore(str(tmp_path / "evidence.sqlite"))
+    domains = [f"shop-{i}.com" for i in range(2000)]
+    for i, domain in enumerate(domains):
+        store.append_signal(domain, "scrape_url_info", scam_detector_page(domain, i))
+        store.append_signal(domain, "get_domain_info", {"age_days": i})
+    store.append_signal(domains[0], "get_domain_info", {"age_days": 5000})
+
+    def score(domain, signals):
+        return "High" if signals["get_domain_info"]["age_days"] < 30 else "Low"
+
+    start = time.perf_counter()
+    scores = dict(store.rescore(score))
+    assert time.perf_counter() - start < 5
+
+    assert len(scores) == 2000
+    assert scores[domains[0]] == "Low" and scores[domains[1]] == "High" and scores[domains[100]] == "Low"
+    assert dict(store.rescore(score, domains=[domains[1]])) == {domains[1]: "High"}
+
+
+def test_export_jsonl(tmp_path):
+    """Export writes one JSON record per line"""
+    store = EvidenceStore(str(tmp_path / "evidence.sqlite"))
+    for domain in BAD_DOMAINS[:3]:
+        store.append_verdict(domain, {"Risk Level": "High"})
+
+    count = store.export_jsonl(str(tmp_path / "export.jsonl"), kind="verdict")
+
+    lines = (tmp_path / "export.jsonl").read_text().splitlines()
+    assert count == len(lines) == 3
+    assert json.loads(lines[0])["value"] == {"Risk Level": "High"}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,97 @@
+import json
+import time
+from langchain_core.tools import tool
+from tools.cache import SQLiteCache
+from freshness import SignalTracker, content_hash
+from tests.test_domains import GOOD_DOMAINS, BAD_DOMAINS
+
+calls = {"get_domain_info": 0, "check_reddit_reviews": 0}
+reddit_posts = ["Got my order in a week, good quality"]
+
+
+@tool
+def get_domain_info(url: str):
+    """WHOIS lookup."""
+    calls["get_domain_info"] += 1
+    return json.dumps({"domain": url, "creation_date": "2015-03-01"})
+
+
+@tool
+def check_reddit_reviews(domain: str):
+    """Reddit search."""
+    calls["check_reddit_reviews"] += 1
+    return {"domain": domain, "results": [{"snippet": post} for post in reddit_posts]}
+
+
+def age_signals(tracker, name, seconds):
+    tracker.signals[name]["checked_at"] -= seconds
+    tracker.save(tracker.previous_verdict or {"Risk Level": "Low"})
+
+
+def test_content_hash_ignores_key_order_and_counters():
+    """Key order, JSON encoding and daily counters do not change the hash"""
+    assert content_hash({"a": 1, "b": 2}) == content_hash('{"b": 2, "a": 1}')
+    assert content_hash({"issuer": "R3", "cert_age_days": 10}) == content_hash({"issuer": "R3", "cert_age_days": 11})
+    assert content_hash({"issuer": "R3"}) != content_hash({"issuer": "E1"})
+
+
+def test_unchanged_signals_reuse_previous_verdict(tmp_path):
+    """Only the stale signal is refreshed, and an unchanged hash allows reuse"""
+    store = SQLiteCache(str(tmp_path / "signals.sqlite"))
+    tools = [get_domain_info, check_reddit_reviews]
+    calls.update(get_domain_info=0, check_reddit_reviews=0)
+
+    first = SignalTracker(GOOD_DOMAINS[0], store)
+    for base in tools:
+        first.wrap(base).invoke({next(iter(base.args)): GOOD_DOMAINS[0]})
+    first.save({"Risk Level": "Low", "Confidence Level": 90})
+
+    # A day later Reddit is stale but WHOIS is not
+    age_signals(first, "check_reddit_reviews", 2 * 86400)
+    again = SignalTracker(GOOD_DOMAINS[0], store)
+
+    assert again.refresh_stale(tools) == ["check_reddit_reviews"]
+    assert calls == {"get_domain_info": 1, "check_reddit_reviews": 2}
+    assert again.can_reuse_verdict(tools)
+    assert again.change_note() == ""
+
+
+def test_changed_signal_is_reported(tmp_path):
+    """A changed hash blocks reuse and is named in the note for the model"""
+    store = SQLiteCache(str(tmp_path / "signals.sqlite"))
+    tools = [get_domain_info, check_reddit_reviews]
+
+    first = SignalTracker(BAD_DOMAINS[0], store)
+    for base in tools:
+        first.wrap(base).invoke({next(iter(base.args)): BAD_DOMAINS[0]})
+    first.save({"Risk Level": "Low", "Confidence Level": 75})
+
+    age_signals(first, "check_reddit_reviews", 2 * 86400)
+    reddit_posts.append("Never received my package, total scam")
+    try:
+        again = SignalTracker(BAD_DOMAINS[0], store)
+        again.refresh_stale(tools)
+    finally:
+        reddit_posts.pop()
+
+    assert not again.can_reuse_verdict(tools)
+    assert again.changed == {"check_reddit_reviews"}
+    assert "check_reddit_reviews" in again.change_note() and "Low" in again.change_note()
+
+    # The agent gets the fresh WHOIS answer from the store
+    before = calls["get_domain_info"]
+    assert again.wrap(get_domain_info).invoke({"url": BAD_DOMAINS[0]}) == first.signals["get_domain_info"]["output"]
+    assert calls["get_domain_info"] == before
+
+
+def test_error_outputs_are_not_fresh(tmp_path):
+    """A failed lookup is neither cached as fresh nor counted as unchanged"""
+    tracker = SignalTracker(BAD_DOMAINS[1], SQLiteCache(str(tmp_path / "signals.sqlite")))
+    tracker.record("get_trustpilot_review", {"Error": "Error retrieving trustpilot review"})
+
+    assert not tracker.is_fresh("get_trustpilot_review", now=time.time())
+    assert tracker.failed == {"get_trustpilot_review"}
+
+
+if __name__ == "__main__":
+    test_content_hash_ignores_key_order_and_counters()
@@ -0,0 +1,101 @@
+import time
+import socket
+import asyncio
+import threading
+import dns.message
+import dns.rcode
+import dns.rrset
+from tools import get_dns_info as dns_info_module
+from tools.cache import MemoryCache
+from tools.get_dns_info import get_dns_signals, make_resolver, summarize_dns
+
+
+# Local stub zone: (name, type) -> (ttl, [rdata])
+STUB_ZONE = {
+    ("silverdz.youcan.store.", "A"): (300, ["23.227.38.65"]),
+    ("silverdz.youcan.store.", "CNAME"): (300, ["shops.youcan.shop."]),
+    ("youcan.store.", "NS"): (3600, ["kate.ns.cloudflare.com.", "rob.ns.cloudflare.com."]),
+    ("youcan.store.", "MX"): (3600, ["10 mx.zoho.com."]),
+    ("youcan.store.", "TXT"): (3600, ['"v=spf1 include:zoho.com ~all"']),
+    ("_dmarc.youcan.store.", "TXT"): (3600, ['"v=DMARC1; p=quarantine; rua=mailto:d@youcan.store"']),
+}
+
+
+def start_stub_dns_server(zone=STUB_ZONE, delay=0.0):
+    """Serve the stub zone over UDP on a random local port, returns (port, queries)."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    queries = []
+
+    def serve():
+        while True:
+            data, addr = sock.recvfrom(4096)
+            request = dns.message.from_wire(data)
+            question = request.question[0]
+            rdtype = dns.rdatatype.to_text(question.rdtype)
+            queries.append((question.name.to_text(), rdtype))
+            response = dns.message.make_response(request)
+
+            entry = zone.get((question.name.to_text(), rdtype))
+            if entry:
+                ttl, rdatas = entry
+                response.answer.append(dns.rrset.from_text_list(question.name, ttl, "IN", rdtype, rdatas))
+            elif not any(name == question.name.to_text() for name, _ in zone):
+                response.set_rcode(dns.rcode.NXDOMAIN)
+
+            time.sleep(delay)
+            sock.sendto(response.to_wire(), addr)
+
+    threading.Thread(target=serve, daemon=True).start()
+    return sock.getsockname()[1], queries
+
+
+def test_dns_signals_from_stub_server(monkeypatch):
+    """All record types are resolved and summarized into hosting signals"""
+    monkeypatch.setattr(dns_info_module, "_dns_cache", MemoryCache())
+    port, queries = start_stub_dns_server()
+    resolver = make_resolver(["127.0.0.1"], port=port)
+
+    signals = asyncio.run(get_dns_signals("https://silverdz.youcan.store/", resolver))
+
+    assert signals["domain"] == "silverdz.youcan.store"
+    assert signals["resolves"] is True
+    assert signals["ecommerce_platform"] == "YouCan"
+    assert signals["ns_provider"] == "Cloudflare"
+    assert signals["mail_configured"] is True
+    assert signals["mx"] == ["mx.zoho.com"]
+    assert signals["spf"] is True
+    assert signals["dmarc_policy"] == "quarantine"
+
+    # Second run is served from the TTL cache
+    count = len(queries)
+    asyncio.run(get_dns_signals("silverdz.youcan.store", resolver))
+    assert len(queries) == count
+
+
+def test_dns_query_timeout(monkeypatch):
+    """A stalled nameserver is cut off by the per-query timeout"""
+    monkeypatch.setattr(dns_info_module, "_dns_cache", MemoryCache())
+    monkeypatch.setattr(dns_info_module, "QUERY_TIMEOUT", 0.3)
+    port, _ = start_stub_dns_server(delay=2.0)
+    resolver = make_resolver(["127.0.0.1"], port=port)
+
+    start = time.time()
+    signals = asyncio.run(get_dns_signals("silverdz.youcan.store", resolver))
+
+    assert time.time() - start < 1.5
+    assert signals["resolves"] is False
+
+
+def test_summarize_dns_no_records():
+    """A domain without records yields empty signals"""
+    signals = summarize_dns({}, [])
+
+    assert signals["resolves"] is False
+    assert signals["ecommerce_platform"] is None
+    assert signals["ns_provider"] is None
+    assert signals["mail_configured"] is False
+
+
+if __name__ == "__main__":
+    test_summarize_dns_no_records()
@@ -1,6 +1,9 @@
-from tools.get_domain_info import get_domain_info
+from tools import get_domain_info as domain_info_module
+from tools.get_domain_info import get_domain_info, registrable_domain, cache_ttl, cached_lookup_domain
+from tools.cache import SQLiteCache
 from tests.test_domains import GOOD_DOMAINS, BAD_DOMAINS
 import json
+import threading
 from datetime import datetime, timedelta
 from dateutil import parser
 import pytz
@@ -72,6 +75,68 @@ def test_get_bad_domains():
         print(item) 
     print(f"No domain: {no_domain}")
 
+
+
+def test_registrable_domain():
+    """Subdomains and www. variants share one cache key"""
+    assert registrable_domain("silverdz.youcan.store") == "youcan.store"
+    assert registrable_domain("www.burga.com") == "burga.com"
+    assert registrable_domain("burga.com") == "burga.com"
+    assert registrable_domain("shop.example.co.uk") == "example.co.uk"
+
+
+def test_cache_ttl_scales_with_age():
+    """Older domains are cached longer, bounded by expiration and negative TTLs"""
+    now = datetime(2025, 1, 1, tzinfo=pytz.UTC)
+    old = {"creation_date": "2005-01-01 00:00:00", "expiration_date": "2030-01-01 00:00:00"}
+    new = {"creation_date": "2024-12-20 00:00:00", "expiration_date": "2025-12-20 00:00:00"}
+    expiring = {"creation_date": "2005-01-01 00:00:00", "expiration_date": "2025-01-03 00:00:00"}
+
+    assert cache_ttl(old, now) == domain_info_module.MAX_TTL
+    assert cache_ttl(new, now) == domain_info_module.MIN_TTL
+    assert cache_ttl(expiring, now) == 2 * 24 * 3600
+    assert cache_ttl({"error": "x", "error_type": "no_record"}, now) == domain_info_module.NEGATIVE_TTLS["no_record"]
+    assert cache_ttl({"error": "Domain lookup timed out"}, now) == 0
+
+
+def test_cached_lookup_domain(monkeypatch, tmp_path):
+    """Repeated lookups of variants of one domain hit the cache"""
+    calls = []
+
+    def fake_lookup(domain):
+        calls.append(domain)
+        return {"domain": domain, "creation_date": "2010-01-01 00:00:00", "registrar": "Test"}
+
+    monkeypatch.setattr(domain_info_module, "_whois_cache", SQLiteCache(str(tmp_path / "whois.sqlite")))
+    monkeypatch.setattr(domain_info_module, "lookup_domain", fake_lookup)
+
+    first = cached_lookup_domain("silverdz.youcan.store")
+    second = cached_lookup_domain("www.youcan.store")
+
+    assert calls == ["youcan.store"]
+    assert first == second
+
+
+def test_negative_answer_without_whois_is_not_cached(monkeypatch, tmp_path):
+    """RDAP's unknown TLD is not cached while every WHOIS slot is busy, only once WHOIS agrees"""
+    cache = SQLiteCache(str(tmp_path / "whois.sqlite"))
+    busy = threading.BoundedSemaphore(domain_info_module.WHOIS_WORKERS)
+    for _ in range(domain_info_module.WHOIS_WORKERS):
+        busy.acquire()
+    unknown = {"domain": "shop.de", "error": "No RDAP service for .de", "error_type": "unknown_tld"}
+    monkeypatch.setattr(domain_info_module, "_whois_cache", cache)
+    monkeypatch.setattr(domain_info_module, "_whois_slots", busy)
+    monkeypatch.setattr(domain_info_module, "rdap_lookup", lambda d: dict(unknown))
+    monkeypatch.setattr(domain_info_module, "whois_lookup", lambda d: {"error": "unknown", "error_type": "unknown_tld"})
+
+    result = cached_lookup_domain("shop.de")
+    assert result["error_type"] == "whois_skipped" and cache_ttl(result) == 0
+    assert cache.get("shop.de") is None
+
+    monkeypatch.setattr(domain_info_module, "_whois_slots", threading.BoundedSemaphore(1))
+    assert cached_lookup_domain("shop.de")["error_type"] == "unknown_tld"
+    assert cache.get("shop.de") is not None
+
     
 if __name__ == "__main__":
     test_get_good_domains()
@@ -0,0 +1,91 @@
+import time
+import socket
+import asyncio
+import threading
+from tools import get_ssl_crt as ssl_module
+from tools.cache import MemoryCache
+from tools.get_ssl_crt import parse_cert, cert_signals, probe_many
+
+
+PEER_CERT = {
+    "subject": ((("commonName", "*.youcan.store"),),),
+    "issuer": (
+        (("countryName", "US"),),
+        (("organizationName", "Let's Encrypt"),),
+        (("commonName", "R11"),),
+    ),
+    "version": 3,
+    "serialNumber": "04A1B2C3",
+    "notBefore": "Jan  1 00:00:00 2025 GMT",
+    "notAfter": "Apr  1 00:00:00 2025 GMT",
+    "subjectAltName": (("DNS", "*.youcan.store"), ("DNS", "youcan.store")),
+}
+
+
+def start_silent_server():
+    """Accept TCP connections but never answer the TLS handshake."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(16)
+    connections = []
+
+    def serve():
+        while True:
+            conn, _ = sock.accept()
+            connections.append(conn)
+
+    threading.Thread(target=serve, daemon=True).start()
+    return sock.getsockname()[1]
+
+
+def test_parse_cert_and_signals():
+    """Certificate fields and derived signals are extracted"""
+    cert_info = parse_cert(PEER_CERT)
+
+    assert cert_info["subject_common_name"] == "*.youcan.store"
+    assert cert_info["issuer"]["organizationName"] == "Let's Encrypt"
+    assert cert_info["valid_until_iso"] == "2025-04-01T00:00:00+00:00"
+
+    now = cert_info["not_before_ts"] + 10 * 86400
+    signals = cert_signals(cert_info, "silverdz.youcan.store", now=now)
+
+    assert signals["cert_age_days"] == 10
+    assert signals["validity_days"] == 90
+    assert signals["issuer_class"] == "free_dv"
+    assert signals["validation"] == "DV"
+    assert signals["san_count"] == 2
+    assert signals["wildcard"] is True
+    assert signals["hostname_covered"] is True
+    assert cert_signals(cert_info, "a.b.youcan.store", now=now)["hostname_covered"] is False
+
+
+def test_handshake_timeout_bounds_batch(monkeypatch):
+    """Stalled hosts are cut off by the handshake timeout and probed concurrently"""
+    monkeypatch.setattr(ssl_module, "HANDSHAKE_TIMEOUT", 0.3)
+    monkeypatch.setattr(ssl_module, "_host_cache", MemoryCache())
+    port = start_silent_server()
+
+    start = time.time()
+    results = asyncio.run(probe_many([f"https://127.0.0.1:{port}"] * 5))
+
+    assert time.time() - start < 1.0
+    assert all(result["https"] is False for result in results)
+    assert all("handshake failed" in result["error"] for result in results)
+
+
+def test_connect_timeout(monkeypatch):
+    """Unreachable hosts fail fast"""
+    monkeypatch.setattr(ssl_module, "_host_cache", MemoryCache())
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+
+    result = asyncio.run(probe_many([f"127.0.0.1:{port}"]))[0]
+
+    assert result["https"] is False
+    assert "connection failed" in result["error"]
+
+
+if __name__ == "__main__":
+    test_parse_cert_and_signals()
@@ -0,0 +1,97 @@
+import time
+import random
+import string
+import numpy as np
+from tools.lexical_prior import (
+    FEATURE_NAMES, extract_features, split_domain, train_logistic, predict, score_domains, lexical_prior,
+    load_labeled, load_model, prior_ready,
+)
+import agent_workflow
+from tests.test_agent_workflow import fake_tiers
+from tests.test_domains import GOOD_DOMAINS, BAD_DOMAINS
+
+
+def test_split_domain():
+    """The main label, TLD and subdomain depth are separated"""
+    assert split_domain("silverdz.youcan.store") == ("youcan", "store", 1)
+    assert split_domain("https://www.shop.example.co.uk/path") == ("example", "uk", 1)
+    assert split_domain("mbgmlye.top") == ("mbgmlye", "top", 0)
+
+
+def test_features_match_per_domain_values():
+    """Vectorized features equal the values computed by hand"""
+    features = dict(zip(FEATURE_NAMES, extract_features(["mbgmlye.top", "faherty-us.com"])[0]))
+
+    assert features["label_length"] == 7
+    assert features["risky_tld"] == 1
+    assert features["max_consonant_run"] == 5  # m-b-g-m-l
+    assert np.isclose(features["vowel_ratio"], 2 / 7)
+    assert extract_features(["faherty-us.com"])[0][FEATURE_NAMES.index("marketing_affix")] == 1
+
+
+def test_logistic_regression_separates_training_data():
+    """A random-looking label on a risky TLD scores above a plain brand name on .com"""
+    domains = list(GOOD_DOMAINS) + list(BAD_DOMAINS)
+    labels = np.array([0] * len(GOOD_DOMAINS) + [1] * len(BAD_DOMAINS), dtype=float)
+    model = train_logistic(extract_features(domains), labels)
+
+    scores = predict(model, extract_features(["xkqzvbt.top", "evryjewels.com"]))
+    assert scores[0] > 0.5 > scores[1]
+
+
+def test_shipped_model_scores_batches_fast():
+    """A 100k-domain list is scored in seconds"""
+    random.seed(5)
+    domains = [
+        "".join(random.choices(string.ascii_lowercase + "-0", k=random.randint(4, 20))) + random.choice([".com", ".top"])
+        for _ in range(100_000)
+    ]
+
+    start = time.time()
+    scores = score_domains(domains)
+    assert time.time() - start < 10
+    assert scores.shape == (100_000,) and ((scores >= 0) & (scores <= 1)).all()
+
+
+def test_lexical_prior_drivers():
+    """The single-domain prior names the features that raised it"""
+    prior = lexical_prior("mbgmlye.top")
+
+    assert 0 <= prior["score"] <= 1
+    assert "risky_tld" in prior["drivers"]
+
+
+def test_labeled_seed_data_ships_with_the_package():
+    """Training data comes from src/data, not from the test package"""
+    domains, labels = load_labeled([])
+
+    assert set(domains) == set(GOOD_DOMAINS) | set(BAD_DOMAINS)
+    assert labels.sum() == len(BAD_DOMAINS)
+
+
+def test_prior_needs_a_validated_model():
+    """Only a model that beats the base rate on a real-sized set is used as a prior"""
+    assert not prior_ready(load_model())
+    assert not prior_ready({"evaluation": {"samples": 5000, "loo_accuracy": 0.52, "base_rate": 0.5}})
+    assert prior_ready({"evaluation": {"samples": 5000, "loo_accuracy": 0.81, "base_rate": 0.6}})
+
+
+def test_prior_is_off_by_default(monkeypatch):
+    """The agent prompt carries no lexical prior unless LEXICAL_PRIOR is enabled and the model validated"""
+    calls = fake_tiers(monkeypatch, {"small": {"Risk Level": "Low", "Rationale": ["Old domain"], "Confidence Level": 92}})
+    agent_workflow.run_agent_workflow(BAD_DOMAINS[3])
+
+    monkeypatch.setattr(agent_workflow, "LEXICAL_PRIOR_ENABLED", True)
+    agent_workflow.run_agent_workflow(BAD_DOMAINS[3])
+
+    monkeypatch.setattr(agent_workflow, "prior_ready", lambda model: True)
+    agent_workflow.run_agent_workflow(BAD_DOMAINS[3])
+
+    assert ["Lexical prior" in content for _, _, content in calls] == [False, False, True]
+
+
+if __name__ == "__main__":
+    test_split_domain()
+    test_features_match_per_domain_values()
+    test_logistic_regression_separates_training_data()
+    test_lexical_prior_drivers()
@@ -0,0 +1,166 @@
+import time
+import pytest
+import llm_router
+from typing import Any, List, Optional
+from langchain.agents import create_agent
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from llm_router import LLMRouter, ProviderStats, get_provider_stats
+from agent_workflow import domain_response
+from tests.test_domains import BAD_DOMAINS
+
+VERDICT = {"Risk Level": "High", "Rationale": ["Domain registered last week"], "Confidence Level": 80}
+
+
+class FakeProvider(BaseChatModel):
+    """Local model backend: answers after `delay` seconds by calling the first bound tool with VERDICT."""
+
+    delay: float = 0.0
+    fail: bool = False
+    tool_names: List[str] = []
+    calls: List[float] = []
+    seen: List[dict] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-provider"
+
+    def bind_tools(self, tools, **kwargs: Any):
+        names = [tool["title"] if isinstance(tool, dict) else tool.name for tool in tools]
+        return self.model_copy(update={"tool_names": names})
+
+    def _generate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        self.calls.append(time.time())
+        self.seen.append({"stop": stop, "kwargs": kwargs})
+        time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("provider unavailable")
+        tool_calls = [{"name": self.tool_names[-1], "args": VERDICT, "id": "call-1"}] if self.tool_names else []
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="", tool_calls=tool_calls))])
+
+
+@pytest.fixture(autouse=True)
+def fresh_stats(monkeypatch):
+    monkeypatch.setattr(llm_router, "_provider_stats", {})
+
+
+def test_provider_stats_health():
+    """A provider turns unhealthy once most of its recent calls fail"""
+    stats = ProviderStats(window=10)
+    for _ in range(3):
+        stats.record(0.2, ok=True)
+    assert stats.healthy and stats.latency == pytest.approx(0.2)
+
+    for _ in range(7):
+        stats.record(5.0, ok=False)
+    assert not stats.healthy
+    assert stats.latency == pytest.approx(0.2)
+
+
+def test_provider_health_on_metrics():
+    """/metrics reports each provider's latency, error rate and health"""
+    from fastapi.testclient import TestClient
+    import app
+
+    for _ in range(5):
+        get_provider_stats("fast").record(0.3, ok=True)
+        get_provider_stats("broken").record(0.1, ok=False)
+
+    metrics = TestClient(app.app).get("/metrics").text
+
+    assert 'rulegit_llm_provider_latency{provider="fast"} 0.3' in metrics
+    assert 'rulegit_llm_provider_error_rate{provider="broken"} 1' in metrics
+    assert 'rulegit_llm_provider_healthy{provider="broken"} 0' in metrics
+    assert "rulegit_analyses_total" in metrics
+
+def test_routes_to_fastest_healthy_provider():
+    """Measured latency decides the order; unhealthy providers go last"""
+    router = LLMRouter(providers=[("slow", FakeProvider()), ("fast", FakeProvider()), ("broken", FakeProvider())])
+    for _ in range(5):
+        get_provider_stats("slow").record(2.0, ok=True)
+        get_provider_stats("fast").record(0.3, ok=True)
+        get_provider_stats("broken").record(0.1, ok=False)
+
+    assert [name for name, _ in router.ranked_providers()] == ["fast", "slow", "broken"]
+
+
+def test_fails_over_to_next_provider():
+    """A failing provider is recorded and the call is retried on the next one"""
+    router = LLMRouter(providers=[("down", FakeProvider(fail=True)), ("up", FakeProvider())])
+
+    message = router.invoke("hello")
+
+    assert message.response_metadata["llm_provider"] == "up"
+    assert get_provider_stats("down").error_rate == 1.0
+
+
+def test_hedges_slow_provider():
+    """After hedge_after seconds a second provider races the first, and the faster answer wins"""
+    slow, fast = FakeProvider(delay=1.0, calls=[]), FakeProvider(delay=0.05, calls=[])
+    router = LLMRouter(providers=[("slow", slow), ("fast", fast)], hedge_after=0.2)
+
+    start = time.time()
+    message = router.invoke("hello")
+
+    assert message.response_metadata["llm_provider"] == "fast"
+    assert time.time() - start < 0.8
+    assert fast.calls[0] - slow.calls[0] >= 0.2
+
+
+def test_unhealthy_provider_is_probed_after_interval():
+    """An unhealthy provider gets one probe per interval, and a successful probe restores it"""
+    router = LLMRouter(providers=[("fast", FakeProvider()), ("flaky", FakeProvider())])
+    get_provider_stats("fast").record(1.0, ok=True)
+    flaky = get_provider_stats("flaky")
+    flaky.probe_interval = 0.2
+    for _ in range(5):
+        flaky.record(0.1, ok=False)
+
+    assert [name for name, _ in router.ranked_providers()][0] == "fast"
+    time.sleep(0.25)
+    assert [name for name, _ in router.ranked_providers()][0] == "flaky"
+    assert [name for name, _ in router.ranked_providers()][0] == "fast"
+
+    time.sleep(0.25)
+    message = router.invoke("hello")
+    assert message.response_metadata["llm_provider"] == "flaky"
+    assert flaky.healthy and flaky.error_rate == 0.0
+
+
+def test_stop_kwargs_and_callbacks_reach_provider():
+    """stop, extra call kwargs and callbacks are passed through to the chosen provider"""
+    class Recorder(BaseCallbackHandler):
+        def __init__(self):
+            self.parents = []
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+            self.parents.append(parent_run_id)
+
+    provider, recorder = FakeProvider(seen=[]), Recorder()
+    router = LLMRouter(providers=[("only", provider)])
+
+    router.invoke("hello", {"callbacks": [recorder]}, stop=["END"], temperature=0)
+
+    assert provider.seen == [{"stop": ["END"], "kwargs": {"temperature": 0}}]
+    assert len(recorder.parents) == 2 and recorder.parents[0] is None and recorder.parents[1] is not None
+
+
+def test_structured_output_contract_through_agent():
+    """The agent still returns a domain_response verdict when the router picks the provider"""
+    router = LLMRouter(providers=[("down", FakeProvider(fail=True)), ("fake", FakeProvider())])
+    agent = create_agent(model=router, tools=[], system_prompt="Judge the domain", response_format=domain_response)
+
+    response = agent.invoke({"messages": [{"role": "user", "content": f"Is this domain legit {BAD_DOMAINS[0]}"}]})
+
+    assert response["structured_response"] == VERDICT
+
+
+if __name__ == "__main__":
+    test_provider_stats_health()
+    test_provider_health_on_metrics()
+    test_fails_over_to_next_provider()
+    test_hedges_slow_provider()
+    test_unhealthy_provider_is_probed_after_interval()
+    test_stop_kwargs_and_callbacks_reach_provider()
@@ -0,0 +1,70 @@
+import random
+import httpx
+import pytest
+from loadtest.stubs import Latency, Behaviour, StubUpstreams
+from loadtest.driver import DomainPicker, find_saturation, run_level, spawn_app
+
+INSTANT = {name: "fixed:0" for name in ("openai", "tavily", "diffbot", "scam_detector", "rdap", "whois")}
+
+
+def level(concurrency, throughput):
+    return {"concurrency": concurrency, "throughput_rps": throughput, "p99_ms": 100.0 * concurrency}
+
+
+def test_latency_specs():
+    """Latency specs parse into fixed, uniform and lognormal samplers"""
+    rng = random.Random(1)
+    assert Latency("fixed:0.25").sample(rng) == 0.25
+    assert all(0.1 <= Latency("uniform:0.1,0.2").sample(rng) <= 0.2 for _ in range(100))
+    samples = sorted(Latency("lognormal:1.0,0.5").sample(rng) for _ in range(2001))
+    assert 0.9 < samples[1000] < 1.1
+    with pytest.raises(ValueError):
+        Latency("pareto:1")
+
+
+def test_error_rate():
+    """A stub fails about its configured share of calls"""
+    behaviour = Behaviour(error_rate=0.2, seed=3)
+    failures = sum(behaviour.wait() for _ in range(2000))
+    assert behaviour.calls == 2000 and behaviour.errors == failures
+    assert 300 < failures < 500
+
+
+def test_saturation_is_first_flat_level():
+    """Saturation is the last level that still gained throughput"""
+    levels = [level(1, 2.0), level(2, 3.9), level(4, 7.5), level(8, 7.9), level(16, 6.0)]
+    assert find_saturation(levels) == {"concurrency": 4, "throughput_rps": 7.5, "next_level_gain": 0.053,
+                                       "p99_ms": 400.0}
+    assert find_saturation(levels[:3]) is None
+
+
+def test_hot_ratio():
+    """Hot requests reuse a small domain set, the rest are fresh"""
+    fresh = DomainPicker(0.0)
+    assert len({fresh() for _ in range(50)}) == 50
+    picker = DomainPicker(1.0, seed=1)
+    assert all(picker().startswith("loadtest-hot-") for _ in range(50))
+
+
+def test_ramp_against_stubbed_app(tmp_path):
+    """A short ramp runs full analyses through uvicorn against the stub upstreams"""
+    pytest.importorskip("uvicorn")
+    stubs = StubUpstreams(INSTANT, seed=1).start()
+    process = spawn_app({**stubs.env(), "RULEGIT_CACHE_DIR": str(tmp_path)}, port=8799, workers=1, timeout=120)
+    try:
+        with httpx.Client(timeout=60) as client:
+            report = run_level(client, "http://127.0.0.1:8799", concurrency=2, duration=2, pick_domain=DomainPicker())
+    finally:
+        process.terminate()
+        process.wait()
+        stubs.stop()
+
+    assert report["requests"] > 0 and report["errors"] == 0
+    assert report["p50_ms"] <= report["p99_ms"] <= report["max_ms"]
+    assert report["avg_input_tokens"] > 0 and report["avg_tool_tokens"] > 0
+    calls = stubs.stats()
+    assert all(calls[name]["calls"] > 0 for name in ("openai", "tavily", "diffbot", "scam_detector", "rdap"))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
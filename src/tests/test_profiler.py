@@ -0,0 +1,91 @@
+import time
+import threading
+import pytest
+import profiler
+from profiler import SamplingProfiler, profile, request_window, start_window_watcher, list_profiles
+from tests.test_domains import BAD_DOMAINS
+
+VERDICT = {"Risk Level": "High", "Rationale": ["Registered last week"], "Confidence Level": 80}
+
+
+def busy_parse(seconds):
+    end = time.time() + seconds
+    while time.time() < end:
+        sum(i * i for i in range(1000))
+
+
+@pytest.fixture
+def profile_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiler, "PROFILE_DIR", str(tmp_path / "profiles"))
+    monkeypatch.setattr(profiler, "ADMIN_TOKEN", "secret")
+    return tmp_path / "profiles"
+
+
+def test_sampler_collapses_busy_stacks():
+    """Busy threads appear as root-to-leaf collapsed stacks; idle ones are dropped"""
+    idle = threading.Event()
+    threading.Thread(target=idle.wait, name="idle-worker", daemon=True).start()
+    worker = threading.Thread(target=busy_parse, args=(0.3,), name="analysis")
+
+    sampler = SamplingProfiler(interval=0.005).start()
+    worker.start()
+    worker.join()
+    sampler.stop()
+    idle.set()
+
+    stacks = sampler.collapsed().splitlines()
+    busy = [line for line in stacks if "busy_parse (tests/test_profiler.py)" in line]
+    assert sampler.samples > 10 and busy
+    assert busy[0].startswith("analysis;") and int(busy[0].rsplit(" ", 1)[1]) > 0
+    assert not any(line.startswith("idle-worker;") for line in stacks)
+
+
+def test_one_profile_at_a_time(profile_dir):
+    """A second concurrent profile is refused instead of stacking samplers"""
+    with profile("first") as first:
+        with profile("second") as second:
+            busy_parse(0.05)
+
+    assert first.startswith("first-") and second is None
+    assert [item["name"] for item in list_profiles()] == [first]
+
+
+def test_window_is_profiled_by_watching_workers(profile_dir, monkeypatch):
+    """A requested window is picked up through the trigger file and written per worker"""
+    monkeypatch.setattr(profiler, "WATCH_INTERVAL", 0.05)
+    monkeypatch.setattr(profiler, "_watcher", None)
+    start_window_watcher()
+
+    window = request_window(0.3)
+    busy_parse(0.6)
+    deadline = time.time() + 5
+    while not list_profiles() and time.time() < deadline:
+        time.sleep(0.05)
+
+    assert list_profiles()[0]["name"].startswith(f"window-{window['id']}-")
+
+
+def test_profiled_analysis_needs_admin(profile_dir, tmp_path, monkeypatch):
+    """Only requests with the admin token are profiled and can read profiles"""
+    from fastapi.testclient import TestClient
+    import app
+    import verdict_store
+
+    monkeypatch.setattr(verdict_store, "_store", verdict_store.VerdictStore(str(tmp_path / "verdicts.sqlite")))
+    monkeypatch.setattr(app, "reputation_verdict", lambda url: None)
+    monkeypatch.setattr(app, "run_agent_workflow", lambda url, request_id=None: busy_parse(0.1) or dict(VERDICT))
+    client = TestClient(app.app)
+    params = {"url": BAD_DOMAINS[0], "profile": "true"}
+
+    assert "X-Profile" not in client.get("/validate_url", params=params).headers
+    assert client.get("/admin/profiles").status_code == 403
+
+    headers = {"X-Admin-Token": "secret"}
+    name = client.get("/validate_url", params=params, headers=headers).headers["X-Profile"]
+    assert [item["name"] for item in client.get("/admin/profiles", headers=headers).json()] == [name]
+    assert "busy_parse" in client.get(f"/admin/profiles/{name}", headers=headers).text
+    assert client.get("/admin/profiles/..%2Fverdicts.sqlite", headers=headers).status_code == 404
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,119 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from tools import get_domain_info as domain_info_module
+from tools.rdap import parse_bootstrap, parse_rdap_domain
+from tools.get_domain_info import lookup_domain, to_hostname
+from tests.test_domains import BAD_DOMAINS
+
+
+BOOTSTRAP = {
+    "version": "1.0",
+    "services": [
+        [["com", "net"], ["https://rdap.verisign.com/com/v1/"]],
+        [["store"], ["http://rdap.centralnic.com/store", "https://rdap.centralnic.com/store"]],
+        [["top"], ["https://rdap.nic.top/"]],
+    ],
+}
+
+RDAP_DOMAIN = {
+    "objectClassName": "domain",
+    "ldhName": "FAHERTY-US.COM",
+    "events": [
+        {"eventAction": "registration", "eventDate": "2024-03-02T10:11:12Z"},
+        {"eventAction": "expiration", "eventDate": "2025-03-02T10:11:12Z"},
+        {"eventAction": "last update of RDAP database", "eventDate": "2024-06-01T00:00:00Z"},
+    ],
+    "entities": [
+        {
+            "objectClassName": "entity",
+            "handle": "1068",
+            "roles": ["registrar"],
+            "vcardArray": ["vcard", [["version", {}, "text", "4.0"], ["fn", {}, "text", "NameSilo, LLC"]]],
+        }
+    ],
+}
+
+
+def test_parse_bootstrap():
+    """Bootstrap services are flattened per TLD, preferring https endpoints"""
+    services = parse_bootstrap(BOOTSTRAP)
+
+    assert services["com"] == "https://rdap.verisign.com/com/v1/"
+    assert services["net"] == services["com"]
+    assert services["store"] == "https://rdap.centralnic.com/store/"
+    assert services["top"] == "https://rdap.nic.top/"
+
+
+def test_parse_rdap_domain():
+    """RDAP JSON maps onto the legacy get_domain_info fields"""
+    result = parse_rdap_domain(RDAP_DOMAIN)
+
+    assert result["domain"] == "faherty-us.com"
+    assert result["creation_date"] == "2024-03-02 10:11:12+00:00"
+    assert result["expiration_date"] == "2025-03-02 10:11:12+00:00"
+    assert result["registrar"] == "NameSilo, LLC"
+
+
+def test_to_hostname():
+    """URLs and bare domains are reduced to a hostname"""
+    assert to_hostname("https://silverdz.youcan.store/") == BAD_DOMAINS[0]
+    assert to_hostname("https://aiueoffices.com/jp") == "aiueoffices.com"
+    assert to_hostname("Mbgmlye.TOP") == "mbgmlye.top"
+
+
+def test_lookup_domain_takes_first_complete_answer(monkeypatch):
+    """The fastest complete answer wins the race, errors are skipped"""
+    def slow_whois(domain):
+        time.sleep(0.5)
+        return {"domain": domain, "creation_date": "2001-01-01 00:00:00", "registrar": "slow"}
+
+    monkeypatch.setattr(domain_info_module, "rdap_lookup", lambda d: parse_rdap_domain(RDAP_DOMAIN))
+    monkeypatch.setattr(domain_info_module, "whois_lookup", slow_whois)
+
+    start = time.time()
+    result = lookup_domain("faherty-us.com", race_whois=True)
+
+    assert result["source"] == "rdap"
+    assert result["registrar"] == "NameSilo, LLC"
+    assert time.time() - start < 0.5
+
+    monkeypatch.setattr(domain_info_module, "rdap_lookup", lambda d: {"domain": d, "error": "No RDAP service for .com"})
+    result = lookup_domain("faherty-us.com", race_whois=True)
+
+    assert result["source"] == "whois"
+    assert result["registrar"] == "slow"
+
+
+
+def test_hung_whois_does_not_block_rdap(monkeypatch):
+    """WHOIS lookups stuck on a server use only their own slots; RDAP keeps answering"""
+    release, whois_calls = threading.Event(), []
+
+    def hung_whois(domain):
+        whois_calls.append(domain)
+        release.wait(5)
+        return {"domain": domain, "error": "timed out"}
+
+    monkeypatch.setattr(domain_info_module, "rdap_lookup", lambda d: parse_rdap_domain(RDAP_DOMAIN))
+    monkeypatch.setattr(domain_info_module, "whois_lookup", hung_whois)
+    # A fresh pool and slots, so WHOIS lookups still running from earlier tests do not count
+    workers = domain_info_module.WHOIS_WORKERS
+    pool = ThreadPoolExecutor(max_workers=workers)
+    monkeypatch.setattr(domain_info_module, "_whois_pool", pool)
+    monkeypatch.setattr(domain_info_module, "_whois_slots", threading.BoundedSemaphore(workers))
+    try:
+        start = time.time()
+        for i in range(3 * workers):
+            assert lookup_domain(f"shop-{i}.com", race_whois=True)["source"] == "rdap"
+        assert time.time() - start < 1
+        time.sleep(0.1)
+        assert len(whois_calls) == workers
+    finally:
+        release.set()
+        pool.shutdown()
+
+if __name__ == "__main__":
+    test_parse_bootstrap()
+    test_parse_rdap_domain()
+    test_to_hostname()
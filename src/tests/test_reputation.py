@@ -0,0 +1,92 @@
+import os
+import time
+import pytest
+import reputation
+from reputation import ReputationList, ReputationLists, build_list, candidate_names, reputation_verdict
+from tests.test_domains import GOOD_DOMAINS, BAD_DOMAINS
+
+
+def write_list(path, domains):
+    with open(path, "w", encoding="UTF-8") as file:
+        file.write("# test list\n" + "\n".join(domains) + "\n")
+
+
+@pytest.fixture
+def lists(tmp_path, monkeypatch):
+    source = tmp_path / "lists"
+    source.mkdir()
+    write_list(source / "allow_top_retailers.txt", [f"{i},{domain}" for i, domain in enumerate(GOOD_DOMAINS)])
+    write_list(source / "deny_confirmed.txt", BAD_DOMAINS[:-1])
+    lists = ReputationLists(str(source), str(tmp_path / "compiled"))
+    monkeypatch.setattr(reputation, "_reputation_lists", lists)
+    return lists
+
+
+def test_lookup_allow_and_deny(lists):
+    """Listed domains, their www. and subdomain forms are found; others are not"""
+    assert lists.lookup(BAD_DOMAINS[0]) == "deny"
+    assert lists.lookup(f"https://www.{GOOD_DOMAINS[0]}/some/path") == "allow"
+    assert lists.lookup(f"shop.{GOOD_DOMAINS[0]}") == "allow"
+    assert lists.lookup(BAD_DOMAINS[-1]) is None
+    assert lists.lookup("never-listed-example.com") is None
+
+
+def test_platform_subdomains_do_not_inherit(tmp_path):
+    """Stores on a platform suffix are their own names"""
+    assert candidate_names("https://silverdz.myshopify.com/products") == ["silverdz.myshopify.com"]
+    assert candidate_names("www.shop.example.co.uk") == ["shop.example.co.uk", "example.co.uk"]
+
+
+def test_exact_tier_rejects_bloom_false_positives(tmp_path):
+    """With a deliberately tiny filter, Bloom hits on unlisted names never become matches"""
+    listed = [f"listed{i}.com" for i in range(200)]
+    build_list(listed, str(tmp_path / "l.bloom"), str(tmp_path / "l.exact"), false_positive_rate=0.5)
+    reputation_list = ReputationList(str(tmp_path / "l.bloom"), str(tmp_path / "l.exact"))
+
+    others = [f"other{i}.com" for i in range(2000)]
+    assert all(domain in reputation_list for domain in listed)
+    assert any(reputation_list.might_contain(domain) for domain in others)
+    assert not any(domain in reputation_list for domain in others)
+
+
+def test_filter_size_and_lookup_speed(tmp_path):
+    """A million entries take about a megabyte of filter and lookups take microseconds"""
+    domains = [f"store{i}.example" for i in range(1_000_000)]
+    build_list(domains, str(tmp_path / "big.bloom"), str(tmp_path / "big.exact"))
+    reputation_list = ReputationList(str(tmp_path / "big.bloom"), str(tmp_path / "big.exact"))
+
+    assert os.path.getsize(tmp_path / "big.bloom") < 1.3 * 1024 * 1024
+    start = time.perf_counter()
+    found = [f"absent{i}.example" in reputation_list for i in range(1000)]
+    assert (time.perf_counter() - start) / 1000 < 100e-6
+    assert not any(found)
+    assert "store123456.example" in reputation_list
+
+
+def test_hot_reload(lists, monkeypatch):
+    """Edited source files are recompiled on the next lookup after the reload interval"""
+    monkeypatch.setattr(reputation, "RELOAD_INTERVAL", 0)
+    assert lists.lookup(BAD_DOMAINS[-1]) is None
+
+    path = os.path.join(lists.source_dir, "deny_confirmed.txt")
+    write_list(path, BAD_DOMAINS)
+    os.utime(path, (time.time() + 5, time.time() + 5))
+
+    assert lists.lookup(BAD_DOMAINS[-1]) == "deny"
+
+
+def test_validate_url_fast_path(lists, monkeypatch):
+    """Listed domains are answered without starting the agent"""
+    from fastapi.testclient import TestClient
+    import app
+
+    monkeypatch.setattr(app, "run_agent_workflow", lambda **kwargs: pytest.fail("agent should not run"))
+    response = TestClient(app.app).get("/validate_url", params={"url": BAD_DOMAINS[0]})
+
+    assert response.json()["Risk Level"] == "Critical"
+    assert response.json()["Fast Path"] == "denylist"
+    assert reputation_verdict(GOOD_DOMAINS[1])["Risk Level"] == "Low"
+
+
+if __name__ == "__main__":
+    test_platform_subdomains_do_not_inherit(None)
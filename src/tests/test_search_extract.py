@@ -0,0 +1,112 @@
+import asyncio
+from tools import search_extract
+from tools.search_extract import build_queries, run_searches, stream_evidence, query_platform, RateLimiter
+from tests.test_domains import BAD_DOMAINS
+
+
+class FakeSearch:
+    """Async stand-in for TavilySearch that tracks peak concurrency."""
+
+    def __init__(self):
+        self.queries = []
+        self.active = 0
+        self.peak = 0
+
+    async def ainvoke(self, args):
+        self.queries.append(args["query"])
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.3)
+        self.active -= 1
+        platform = query_platform(args["query"])
+        # Every query returns one shared URL plus one of its own
+        return {"results": [
+            {"url": "https://www.reddit.com/r/Scams/comments/shared/"},
+            {"url": f"https://{platform}.example/{len(self.queries)}"},
+        ]}
+
+
+class FakeExtract:
+    def __init__(self):
+        self.calls = []
+
+    async def ainvoke(self, args):
+        self.calls.append(args["urls"])
+        return {"results": [
+            {"url": url, "raw_content": " ".join(f"{url}-{i}" for i in range(20))} for url in args["urls"]
+        ]}
+
+
+def test_run_searches_runs_every_query_concurrently(monkeypatch):
+    """All platform queries run, bounded by the rate limiter"""
+    fake = FakeSearch()
+    monkeypatch.setattr(search_extract, "search_tool", fake)
+
+    results = run_searches(BAD_DOMAINS[0])
+
+    assert len(results) == len(build_queries(BAD_DOMAINS[0]))
+    assert 1 < fake.peak <= search_extract.MAX_CONCURRENT_CALLS
+    assert {result["platform"] for result in results} >= {"web", "reddit", "trustpilot"}
+
+
+def test_stream_evidence_dedups_and_batches(monkeypatch):
+    """URLs are deduplicated across queries and extracted in one batch"""
+    search, extract = FakeSearch(), FakeExtract()
+    monkeypatch.setattr(search_extract, "search_tool", search)
+    monkeypatch.setattr(search_extract, "extract_tool", extract)
+
+    async def collect():
+        return [event async for event in stream_evidence(BAD_DOMAINS[0])]
+
+    events = asyncio.run(collect())
+    searches = [event for event in events if event["type"] == "search"]
+    new_urls = [url for event in searches for url in event["new_urls"]]
+
+    assert events[-1]["type"] == "extract"
+    assert len(new_urls) == len(set(new_urls)) == len(searches) + 1
+    assert len(extract.calls) == 1
+    assert len(events[-1]["extracted"]) == search_extract.MAX_EXTRACTS
+
+
+def test_rate_limiter_spaces_calls():
+    """Call starts are spaced by the configured rate"""
+    async def run():
+        limiter = RateLimiter(max_concurrent=10, per_second=20)
+        loop = asyncio.get_running_loop()
+        starts = []
+
+        async def call():
+            async with limiter:
+                starts.append(loop.time())
+
+        await asyncio.gather(*(call() for _ in range(5)))
+        return starts
+
+    starts = asyncio.run(run())
+
+    assert max(starts) - min(starts) >= 4 * 0.05 * 0.9
+
+
+
+def test_cancelled_wait_frees_its_slot():
+    """A call cancelled while waiting for its start time gives its concurrency slot back"""
+    async def run():
+        limiter = RateLimiter(max_concurrent=1, per_second=1)
+
+        async def call():
+            async with limiter:
+                pass
+
+        await call()
+        waiting = asyncio.create_task(call())
+        await asyncio.sleep(0.05)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        return limiter._semaphore.locked()
+
+    assert not asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_rate_limiter_spaces_calls()
+    test_cancelled_wait_frees_its_slot()
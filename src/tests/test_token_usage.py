@@ -0,0 +1,85 @@
+import json
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.tools import tool
+import token_usage
+from token_usage import UsageMeter, count_tokens, metrics_text, record_usage_totals
+from tests.test_agent_workflow import fake_tiers
+from tests.test_domains import BAD_DOMAINS
+
+REVIEWS = {"reviews": [{"text": "Never received my order", "rating": 1}] * 50}
+
+
+@tool
+def get_trustpilot_review(domain: str) -> str:
+    """Trustpilot reviews."""
+    return json.dumps(REVIEWS)
+
+
+class WordEncoding:
+    def encode(self, text, disallowed_special=()):
+        return text.split()
+
+
+def turn(input_tokens, cached, output, model="gpt-5-nano"):
+    return AIMessage(
+        content="",
+        response_metadata={"model_name": model},
+        usage_metadata={"input_tokens": input_tokens, "output_tokens": output, "total_tokens": input_tokens + output,
+                        "input_token_details": {"cache_read": cached}},
+    )
+
+
+def test_token_counts(monkeypatch):
+    """tiktoken counts are used when the encoding loads, a bytes/4 estimate otherwise"""
+    monkeypatch.setattr(token_usage, "_encoding", lambda: WordEncoding())
+    assert count_tokens("three small words") == (3, False)
+
+    monkeypatch.setattr(token_usage, "_encoding", lambda: None)
+    assert count_tokens("x" * 10) == (3, True)
+
+
+def test_tool_results_and_turns_are_measured(monkeypatch):
+    """Wrapped tools record bytes and tokens per call; AI messages record provider usage per turn"""
+    monkeypatch.setattr(token_usage, "_encoding", lambda: None)
+    meter = UsageMeter()
+    measured = meter.wrap(get_trustpilot_review)
+    measured.invoke({"domain": BAD_DOMAINS[0]})
+    measured.invoke({"domain": BAD_DOMAINS[0]})
+    meter.record_turns([HumanMessage(content="hi"), turn(4000, 2048, 50), AIMessage(content="no usage")])
+    meter.record_turns([turn(1500, 0, 80, model="gpt-5-mini")], tier=2)
+
+    usage = meter.summary()
+    size = len(json.dumps(REVIEWS).encode())
+    assert usage["tools"]["get_trustpilot_review"] == {"calls": 2, "bytes": 2 * size, "tokens": 2 * -(-size // 4)}
+    assert [entry["tier"] for entry in usage["llm_turns"]] == [1, 2]
+    assert usage["totals"]["input_tokens"] == 5500 and usage["totals"]["cached_tokens"] == 2048
+    assert usage["token_counts_estimated"]
+
+    record_usage_totals(usage)
+    metrics = metrics_text()
+    assert f'rulegit_tool_bytes_total{{tool="get_trustpilot_review"}}' in metrics
+    assert 'rulegit_llm_cached_tokens_total{model="gpt-5-nano"}' in metrics
+
+
+def test_workflow_returns_usage(monkeypatch):
+    """Analyses return a Usage block; the API shows it only on ?debug=true and never stores it"""
+    from fastapi.testclient import TestClient
+    import app
+    import verdict_store
+
+    fake_tiers(monkeypatch, {"small": {"Risk Level": "High", "Rationale": ["x"], "Confidence Level": 90}})
+    monkeypatch.setattr(app, "reputation_verdict", lambda url: None)
+    monkeypatch.setattr(verdict_store, "_store", verdict_store.VerdictStore(":memory:"))
+    client = TestClient(app.app)
+
+    debug = client.get("/validate_url", params={"url": BAD_DOMAINS[0], "debug": "true"}).json()
+    assert debug["Debug"]["verdict_cache"] == "miss"
+    assert set(debug["Debug"]["usage"]["totals"]) >= {"tool_tokens", "input_tokens", "cached_tokens", "output_tokens"}
+    assert "Usage" not in verdict_store.get_verdict_store().get(BAD_DOMAINS[0])["verdict"]
+    assert "Debug" not in client.get("/validate_url", params={"url": BAD_DOMAINS[0]}).json()
+    assert "rulegit_analyses_total" in client.get("/metrics").text
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
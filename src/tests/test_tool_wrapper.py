@@ -0,0 +1,46 @@
+import pytest
+from langchain_core.tools import tool
+from tools.tool_wrapper import wrap_tool
+
+
+@tool
+def lookup(domain: str) -> dict:
+    """Look a domain up."""
+    calls.append(domain)
+    return {"domain": domain}
+
+
+calls = []
+
+
+def test_wrapped_tool_keeps_its_interface():
+    """The wrapper has the wrapped tool's name, description and arguments"""
+    wrapped = wrap_tool(lookup)
+    assert (wrapped.name, wrapped.description, wrapped.args) == (lookup.name, lookup.description, lookup.args)
+    assert wrapped.invoke({"domain": "shop.com"}) == {"domain": "shop.com"}
+
+
+def test_before_short_circuits_and_after_replaces():
+    """A value from before skips the tool and after; otherwise after sees and replaces the output"""
+    calls.clear()
+    seen = []
+    wrapped = wrap_tool(lookup, before=lambda kwargs: "stored" if kwargs["domain"] == "old.com" else None,
+                        after=lambda output: seen.append(output) or {**output, "after": True})
+
+    assert wrapped.invoke({"domain": "old.com"}) == "stored"
+    assert wrapped.invoke({"domain": "new.com"}) == {"domain": "new.com", "after": True}
+    assert calls == ["new.com"] and seen == [{"domain": "new.com"}]
+
+
+def test_stacking_order():
+    """The last wrapper applied is outermost: its after runs last"""
+    order = []
+    inner = wrap_tool(lookup, after=lambda output: order.append("inner") or output)
+    outer = wrap_tool(inner, after=lambda output: order.append("outer") or output)
+
+    outer.invoke({"domain": "shop.com"})
+    assert order == ["inner", "outer"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
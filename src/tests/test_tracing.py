@@ -0,0 +1,188 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional
+import pytest
+import requests
+from langchain.agents import create_agent
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.tools import tool
+import profiler
+import tracing
+from tracing import span, annotate, in_context, get_trace, to_otlp, instrument_requests
+from agent_workflow import domain_response
+from tests.test_domains import BAD_DOMAINS
+
+VERDICT = {"Risk Level": "High", "Rationale": ["Domain registered last week"], "Confidence Level": 80}
+
+
+@pytest.fixture(autouse=True)
+def no_export(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_EXPORT_PATH", "")
+
+
+@tool
+def whois(domain: str) -> str:
+    """WHOIS lookup."""
+    annotate(cache_hit=False)
+    return "created 3 days ago"
+
+
+class ScriptedModel(BaseChatModel):
+    """Calls the whois tool once, then answers with the structured verdict."""
+
+    tool_names: List[str] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs: Any):
+        return self.model_copy(update={"tool_names": [getattr(t, "name", None) or t["title"] for t in tools]})
+
+    def _generate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        if any(isinstance(m, ToolMessage) for m in messages):
+            calls = [{"name": self.tool_names[-1], "args": VERDICT, "id": "final"}]
+        else:
+            calls = [{"name": "whois", "args": {"domain": BAD_DOMAINS[0]}, "id": "whois"}]
+        message = AIMessage(content="", tool_calls=calls, usage_metadata={"input_tokens": 120, "output_tokens": 8, "total_tokens": 128})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def spans_by_name(trace_id):
+    return {item.name: item for item in get_trace(trace_id)}
+
+
+def test_spans_follow_thread_pools():
+    """Work submitted through in_context nests under the submitting span and records its queue time"""
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        with span("request") as root:
+            with span("lookup"):
+                futures = [executor.submit(in_context(lambda: annotate(done=True), f"job {i}")) for i in range(3)]
+                [future.result() for future in futures]
+
+    spans = spans_by_name(root.trace_id)
+    assert spans["lookup"].parent_id == root.span_id
+    assert all(spans[f"job {i}"].parent_id == spans["lookup"].span_id for i in range(3))
+    assert all(spans[f"job {i}"].attributes["done"] and "queue_ms" in spans[f"job {i}"].attributes for i in range(3))
+
+
+def test_library_spans_need_an_active_trace():
+    """Spans that require a trace are not recorded outside a request"""
+    with span("http GET example.com", require_trace=True) as current:
+        assert current is None
+
+
+def test_agent_steps_llm_and_tool_calls():
+    """LangGraph steps, model calls and tool calls become nested spans with token and byte attributes"""
+    agent = create_agent(model=ScriptedModel(), tools=[whois], response_format=domain_response)
+    with span("request") as root:
+        response = agent.invoke({"messages": [{"role": "user", "content": f"Is this domain legit: {BAD_DOMAINS[0]}"}]})
+    assert response["structured_response"] == VERDICT
+
+    spans = get_trace(root.trace_id)
+    steps = [item for item in spans if item.name.startswith("agent.step")]
+    llm_calls = [item for item in spans if item.name.startswith("llm")]
+    tool_span = next(item for item in spans if item.name == "tool whois")
+    by_id = {item.span_id: item for item in spans}
+
+    assert {item.parent_id for item in steps} == {root.span_id}
+    assert len(llm_calls) == 2 and all(by_id[item.parent_id] in steps for item in llm_calls)
+    assert llm_calls[0].attributes["input_tokens"] == 120
+    assert by_id[tool_span.parent_id].name == "agent.step tools"
+    assert tool_span.attributes["cache_hit"] is False and tool_span.attributes["output_bytes"] > 0
+
+
+def test_requests_are_traced():
+    """Upstream HTTP calls made with requests become spans with status and size"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b"x" * 100)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    instrument_requests()
+    try:
+        with span("request") as root:
+            requests.get(f"http://127.0.0.1:{server.server_port}/lookup?q=1", timeout=5)
+    finally:
+        server.shutdown()
+
+    http_span = spans_by_name(root.trace_id)["http GET 127.0.0.1"]
+    assert http_span.attributes["status_code"] == 200 and http_span.attributes["response_bytes"] == 100
+    assert "?" not in http_span.attributes["url"]
+
+
+def test_streamed_responses_are_not_drained():
+    """A streamed body is sized from Content-Length and left for the caller to read"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            if self.path == "/sized":
+                self.send_header("Content-Length", "100")
+            self.end_headers()
+            self.wfile.write(b"x" * 100)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    instrument_requests()
+    try:
+        with span("request") as root:
+            sized = requests.get(f"http://127.0.0.1:{server.server_port}/sized", stream=True, timeout=5)
+            unsized = requests.get(f"http://127.0.0.1:{server.server_port}/unsized", stream=True, timeout=5)
+            assert sized._content is False and unsized._content is False
+            assert b"".join(unsized.iter_content(10)) == b"x" * 100
+    finally:
+        server.shutdown()
+
+    spans = [item for item in get_trace(root.trace_id) if item.name == "http GET 127.0.0.1"]
+    assert [item.attributes.get("response_bytes") for item in spans] == [100, None]
+
+
+def test_validate_url_trace_and_debug_endpoints(tmp_path, monkeypatch):
+    """The API returns a trace id whose OTLP export and waterfall are served to admins and written to file"""
+    from fastapi.testclient import TestClient
+    import app
+    import verdict_store
+
+    def fake_workflow(url, request_id=None):
+        with span("tool get_domain_info", require_trace=True):
+            pass
+        return dict(VERDICT)
+
+    export_path = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(tracing, "TRACE_EXPORT_PATH", str(export_path))
+    monkeypatch.setattr(verdict_store, "_store", verdict_store.VerdictStore(str(tmp_path / "verdicts.sqlite")))
+    monkeypatch.setattr(app, "reputation_verdict", lambda url: None)
+    monkeypatch.setattr(app, "run_agent_workflow", fake_workflow)
+    monkeypatch.setattr(profiler, "ADMIN_TOKEN", "secret")
+    client = TestClient(app.app, headers={"X-Admin-Token": "secret"})
+
+    trace_id = client.get("/validate_url", params={"url": BAD_DOMAINS[0]}).headers["X-Trace-ID"]
+    names = [item["name"] for item in client.get(f"/debug/traces/{trace_id}").json()["resourceSpans"][0]["scopeSpans"][0]["spans"]]
+    waterfall = client.get(f"/debug/traces/{trace_id}/waterfall").text
+
+    assert names == ["GET /validate_url", "validate_url", "tool get_domain_info"]
+    assert "validate_url" in waterfall and "threadpool_wait_ms=" in waterfall
+    assert trace_id in [trace["trace_id"] for trace in client.get("/debug/traces").json()]
+    exported = json.loads(export_path.read_text().splitlines()[-1])
+    assert exported == to_otlp(get_trace(trace_id))
+
+    anonymous = TestClient(app.app)
+    for path in ["/debug/traces", f"/debug/traces/{trace_id}", f"/debug/traces/{trace_id}/waterfall"]:
+        assert anonymous.get(path).status_code == 403
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
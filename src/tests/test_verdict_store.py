@@ -0,0 +1,181 @@
+import time
+import random
+import string
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+import verdict_store
+from verdict_store import VerdictStore, etag_matches, cache_headers, verdict_etag, encode_snapshot, decode_snapshot
+from tests.test_domains import GOOD_DOMAINS, BAD_DOMAINS
+
+VERDICT = {"Risk Level": "High", "Rationale": ["Registered last week"], "Confidence Level": 80}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    import app
+
+    calls = []
+
+    def fake_workflow(url, request_id=None):
+        calls.append(url)
+        return dict(VERDICT)
+
+    monkeypatch.setattr(verdict_store, "_store", VerdictStore(str(tmp_path / "verdicts.sqlite")))
+    monkeypatch.setattr(app, "reputation_verdict", lambda url: None)
+    monkeypatch.setattr(app, "run_agent_workflow", fake_workflow)
+    return TestClient(app.app), calls
+
+
+def test_version_moves_only_on_content_change(tmp_path):
+    """Re-confirming an identical verdict refreshes its time but keeps its version"""
+    store = VerdictStore(str(tmp_path / "verdicts.sqlite"))
+    first = store.put(f"https://www.{BAD_DOMAINS[0]}/", VERDICT, updated_at=100)
+    again = store.put(BAD_DOMAINS[0], dict(VERDICT), updated_at=200)
+    other = store.put(GOOD_DOMAINS[0], {**VERDICT, "Risk Level": "Low"})
+
+    assert first["version"] == again["version"] == 1 and other["version"] == 2
+    assert store.get(BAD_DOMAINS[0])["updated_at"] == 200
+    assert [record["domain"] for record in store.iter_since(1)] == [GOOD_DOMAINS[0]]
+
+
+def test_etag_ignores_bookkeeping_fields(tmp_path):
+    """A reused or re-tiered verdict keeps its ETag and version; a changed risk level does not"""
+    store = VerdictStore(str(tmp_path / "verdicts.sqlite"))
+    first = store.put(BAD_DOMAINS[0], {**VERDICT, "Model Tier": 1}, updated_at=100)
+    reused = store.put(BAD_DOMAINS[0], {**VERDICT, "Model Tier": 2, "Reused Verdict": {"assessed_at": 100}},
+                       updated_at=200)
+
+    assert verdict_etag({**VERDICT, "Model Tier": 2}) == verdict_etag(VERDICT)
+    assert reused["etag"] == first["etag"] and reused["version"] == first["version"]
+    assert store.get(BAD_DOMAINS[0])["verdict"]["Model Tier"] == 2
+    assert verdict_etag({**VERDICT, "Risk Level": "Low"}) != verdict_etag(VERDICT)
+
+
+def test_etag_comparison():
+    """ETags are content-derived and compared weakly against If-None-Match lists"""
+    etag = verdict_etag(VERDICT)
+    assert etag == verdict_etag(dict(reversed(list(VERDICT.items())))) and etag.startswith('W/"')
+    assert etag_matches(f'"other", {etag}', etag) and etag_matches(etag[2:], etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag) and not etag_matches(None, etag)
+
+
+def test_conditional_requests(client):
+    """A fresh verdict is served with validators and a matching If-None-Match gets a 304 without work"""
+    client, calls = client
+    first = client.get("/validate_url", params={"url": BAD_DOMAINS[0]})
+    etag = first.headers["ETag"]
+
+    assert first.json()["Risk Level"] == "High"
+    assert "max-age=" in first.headers["Cache-Control"] and first.headers["Last-Modified"]
+
+    cached = client.get("/validate_url", params={"url": BAD_DOMAINS[0]}, headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.headers["ETag"] == etag and cached.content == b""
+    assert client.get("/validate_url", params={"url": BAD_DOMAINS[0]}).json()["url"] == BAD_DOMAINS[0]
+    assert calls == [BAD_DOMAINS[0]]
+
+    debug = client.get("/validate_url", params={"url": BAD_DOMAINS[0], "debug": "true"},
+                       headers={"If-None-Match": etag})
+    assert debug.status_code == 200 and "Debug" in debug.json()
+    assert debug.headers["Cache-Control"] == "no-store" and "ETag" not in debug.headers
+
+
+def test_stale_verdict_is_rechecked(client):
+    """Without stale-while-revalidate an expired verdict is recomputed before answering"""
+    client, calls = client
+    verdict_store.get_verdict_store().put(BAD_DOMAINS[0], VERDICT, updated_at=time.time() - 2 * verdict_store.VERDICT_TTL)
+
+    response = client.get("/validate_url", params={"url": BAD_DOMAINS[0]})
+    assert response.status_code == 200 and calls == [BAD_DOMAINS[0]]
+
+
+def test_stale_while_revalidate(client, monkeypatch):
+    """Within the stale window the old verdict is served and refreshed in the background"""
+    client, calls = client
+    monkeypatch.setattr(verdict_store, "STALE_WHILE_REVALIDATE", 3600.0)
+    store = verdict_store.get_verdict_store()
+    store.put(BAD_DOMAINS[0], {**VERDICT, "Risk Level": "Medium"}, updated_at=time.time() - verdict_store.VERDICT_TTL - 60)
+
+    response = client.get("/validate_url", params={"url": BAD_DOMAINS[0]})
+
+    assert response.json()["Risk Level"] == "Medium"
+    assert "stale-while-revalidate=3600" in response.headers["Cache-Control"]
+    assert calls == [BAD_DOMAINS[0]]
+    assert store.get(BAD_DOMAINS[0])["verdict"]["Risk Level"] == "High"
+    assert cache_headers(store.get(BAD_DOMAINS[0]))["ETag"] == verdict_etag(VERDICT)
+
+
+def test_snapshot_and_delta(client):
+    """The snapshot holds every verdict sorted by domain; a delta holds only later changes"""
+    client, _ = client
+    store = verdict_store.get_verdict_store()
+    for domain in BAD_DOMAINS[:5]:
+        store.put(domain, VERDICT)
+
+    full = client.get("/verdicts/snapshot")
+    snapshot = decode_snapshot(full.content)
+    assert snapshot["version"] == 5 and list(snapshot["verdicts"]) == sorted(BAD_DOMAINS[:5])
+    assert snapshot["verdicts"][BAD_DOMAINS[0]]["Risk Level"] == "High"
+
+    store.put(BAD_DOMAINS[1], {**VERDICT, "Risk Level": "Critical"})
+    delta = decode_snapshot(client.get("/verdicts/snapshot", params={"since": 5}).content)
+    assert delta["version"] == 6 and list(delta["verdicts"]) == [BAD_DOMAINS[1]]
+    assert delta["verdicts"][BAD_DOMAINS[1]]["Risk Level"] == "Critical"
+
+    unchanged = client.get("/verdicts/snapshot", params={"since": 6}, headers={"If-None-Match": '"6-6"'})
+    assert unchanged.status_code == 304
+
+
+def test_concurrent_snapshots_build_once(tmp_path, monkeypatch):
+    """Concurrent requests for one snapshot share a single encode while verdicts keep arriving"""
+    store = VerdictStore(str(tmp_path / "verdicts.sqlite"))
+    for domain in BAD_DOMAINS[:5]:
+        store.put(domain, VERDICT)
+    builds = []
+
+    def slow_encode(records, version, since):
+        builds.append((version, since))
+        time.sleep(0.05)
+        return encode_snapshot(records, version, since)
+
+    monkeypatch.setattr(verdict_store, "encode_snapshot", slow_encode)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: store.snapshot(), range(8)))
+        writes = [pool.submit(store.put, domain, VERDICT) for domain in GOOD_DOMAINS[:5]]
+        later = list(pool.map(lambda since: store.snapshot(since), range(8)))
+    for write in writes:
+        write.result()
+
+    assert builds.count((5, 0)) == 1 and len({result for result in results}) == 1
+    assert all(decode_snapshot(blob)["version"] == version for version, blob in later)
+
+def test_snapshot_size():
+    """100k verdicts compress to a few MB and a hundred-verdict delta to a few KB"""
+    random.seed(1)
+    reasons = [
+        "Domain registered {} days ago with privacy-protected WHOIS.",
+        "Valid TLS certificate issued {} days ago.",
+        "No Trustpilot profile or Reddit discussion found for the store ({} searches).",
+        "Scam detector trust score {}/100.",
+    ]
+    records = sorted((
+        {
+            "domain": "".join(random.choices(string.ascii_lowercase, k=random.randint(5, 14))) + ".com",
+            "verdict": {
+                "Risk Level": random.choice(["Low", "Medium", "High", "Critical"]),
+                "Confidence Level": random.randint(40, 99),
+                "Rationale": [reason.format(random.randint(1, 900)) for reason in random.sample(reasons, 3)],
+            },
+            "updated_at": time.time(),
+            "version": i + 1,
+        }
+        for i in range(100_000)
+    ), key=lambda record: record["domain"])
+
+    assert len(encode_snapshot(records, 100_000)) < 4 * 1024 * 1024
+    assert len(encode_snapshot(records[:100], 100_000, 99_900)) < 8 * 1024
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
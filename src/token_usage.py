@@ -0,0 +1,159 @@
+"""Token and payload accounting for agent runs.
+
+Every tool result is measured (UTF-8 bytes and tiktoken tokens) as it enters
+the agent context, and every LLM turn's provider usage (input, cached and
+output tokens) is recorded. A run's summary goes back with the verdict (the
+/validate_url debug block, ?debug=true) and is added to process-wide totals
+served as Prometheus metrics on /metrics.
+
+Token counts use the o200k_base encoding of the gpt-5/gpt-4o families
+(TOKEN_ENCODING). When tiktoken cannot load it (no network to fetch the BPE
+file) counts fall back to bytes / 4 and the summary says so.
+"""
+
+import os
+import json
+import math
+import threading
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+from langchain_core.messages import AIMessage
+from langchain_core.tools import BaseTool
+from tools.tool_wrapper import wrap_tool
+from termcolor import colored
+
+TOKEN_ENCODING = os.getenv("TOKEN_ENCODING", "o200k_base")
+BYTES_PER_TOKEN = 4  # fallback estimate
+
+_totals_lock = threading.Lock()
+_tool_totals: Dict[str, Dict[str, int]] = defaultdict(lambda: {"calls": 0, "bytes": 0, "tokens": 0})
+_model_totals: Dict[str, Dict[str, int]] = defaultdict(
+    lambda: {"turns": 0, "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0}
+)
+_run_totals = {"runs": 0}
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(TOKEN_ENCODING)
+    except Exception as e:
+        print(colored(f"[USAGE] tiktoken encoding {TOKEN_ENCODING} unavailable, estimating tokens: {e}", "red"))
+        return None
+
+
+def payload_text(output: Any) -> str:
+    """The text a tool output becomes in the agent context."""
+    content = getattr(output, "content", output)
+    if isinstance(content, str):
+        return content
+    try:
+        return json.dumps(content, default=str)
+    except (TypeError, ValueError):
+        return str(content)
+
+
+def count_tokens(text: str) -> Tuple[int, bool]:
+    """(token count, whether it is an estimate)."""
+    encoding = _encoding()
+    if encoding is None:
+        return math.ceil(len(text.encode("utf-8")) / BYTES_PER_TOKEN), True
+    return len(encoding.encode(text, disallowed_special=())), False
+
+
+class UsageMeter:
+    """Tool payload sizes and LLM usage of one analysis."""
+
+    def __init__(self):
+        self.tools: Dict[str, Dict[str, int]] = {}
+        self.turns: List[dict] = []
+        self.estimated = False
+        self._lock = threading.Lock()
+
+    def record_tool(self, name: str, output: Any) -> None:
+        text = payload_text(output)
+        tokens, estimated = count_tokens(text)
+        with self._lock:
+            entry = self.tools.setdefault(name, {"calls": 0, "bytes": 0, "tokens": 0})
+            entry["calls"] += 1
+            entry["bytes"] += len(text.encode("utf-8"))
+            entry["tokens"] += tokens
+            self.estimated = self.estimated or estimated
+
+    def wrap(self, base: BaseTool) -> BaseTool:
+        """Wrap a tool so its result is measured on its way into the context."""
+        def measure(output):
+            self.record_tool(base.name, output)
+            return output
+
+        return wrap_tool(base, after=measure)
+
+    def record_turns(self, messages: List, tier: int = 1) -> None:
+        """Provider usage of every model turn in `messages`."""
+        for message in messages:
+            usage = getattr(message, "usage_metadata", None)
+            if not isinstance(message, AIMessage) or not usage:
+                continue
+            self.turns.append({
+                "tier": tier,
+                "model": message.response_metadata.get("model_name") or message.response_metadata.get("model"),
+                "provider": message.response_metadata.get("llm_provider"),
+                "input_tokens": usage.get("input_tokens", 0),
+                "cached_tokens": (usage.get("input_token_details") or {}).get("cache_read", 0),
+                "output_tokens": usage.get("output_tokens", 0),
+                "tool_calls": len(message.tool_calls),
+            })
+
+    def summary(self) -> dict:
+        totals = {
+            "tool_calls": sum(entry["calls"] for entry in self.tools.values()),
+            "tool_bytes": sum(entry["bytes"] for entry in self.tools.values()),
+            "tool_tokens": sum(entry["tokens"] for entry in self.tools.values()),
+            "llm_turns": len(self.turns),
+        }
+        for key in ("input_tokens", "cached_tokens", "output_tokens"):
+            totals[key] = sum(turn[key] for turn in self.turns)
+        return {
+            # Largest context inflators first
+            "tools": dict(sorted(self.tools.items(), key=lambda item: -item[1]["tokens"])),
+            "llm_turns": self.turns,
+            "totals": totals,
+            "token_counts_estimated": self.estimated,
+        }
+
+
+def record_usage_totals(summary: dict) -> None:
+    """Add one analysis to the process-wide totals behind /metrics."""
+    with _totals_lock:
+        _run_totals["runs"] += 1
+        for name, entry in summary["tools"].items():
+            for key, value in entry.items():
+                _tool_totals[name][key] += value
+        for turn in summary["llm_turns"]:
+            totals = _model_totals[turn["model"] or "unknown"]
+            totals["turns"] += 1
+            for key in ("input_tokens", "cached_tokens", "output_tokens"):
+                totals[key] += turn[key]
+
+
+def metrics_text() -> str:
+    """Usage totals in the Prometheus text exposition format."""
+    with _totals_lock:
+        lines = [
+            "# HELP rulegit_analyses_total Agent analyses accounted.",
+            "# TYPE rulegit_analyses_total counter",
+            f"rulegit_analyses_total {_run_totals['runs']}",
+        ]
+        for key, help_text in (("calls", "Tool calls"), ("bytes", "Tool result bytes entering the agent context"),
+                               ("tokens", "Tool result tokens entering the agent context")):
+            lines += [f"# HELP rulegit_tool_{key}_total {help_text}.", f"# TYPE rulegit_tool_{key}_total counter"]
+            lines += [f'rulegit_tool_{key}_total{{tool="{name}"}} {entry[key]}' for name, entry in sorted(_tool_totals.items())]
+        for key, help_text in (("turns", "LLM turns"), ("input_tokens", "LLM input tokens"),
+                               ("cached_tokens", "LLM input tokens served from the provider prompt cache"),
+                               ("output_tokens", "LLM output tokens")):
+            lines += [f"# HELP rulegit_llm_{key}_total {help_text}.", f"# TYPE rulegit_llm_{key}_total counter"]
+            lines += [f'rulegit_llm_{key}_total{{model="{model}"}} {entry[key]}' for model, entry in sorted(_model_totals.items())]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,273 @@
+"""Lookalike (typosquat / brand impersonation) detection against a local brand list.
+
+Candidate labels and brand names are reduced to a "skeleton" that folds
+homoglyphs (0->o, 1->l, rn->m, ...). Marketing affixes a scam store adds to a
+brand (acnestudios + "us", soera + "-store") are stripped as an extra
+variant. Edit distances from every variant to every brand are then computed
+in one pass with the bit-parallel Myers/Hyyro algorithm, vectorized over the
+whole brand list with NumPy, so tens of thousands of brands take a few
+milliseconds.
+
+The bundled data/brands.txt is a sample of a couple of hundred fashion and
+retail brands, enough for tests and demos but not for production: set
+BRAND_LIST_PATH to a full list (tens of thousands of brands, in the same
+format). A warning is printed at start-up while the sample is in use.
+"""
+
+import os
+import json
+import time
+import numpy as np
+from functools import lru_cache
+from typing import List, Optional
+from langchain_core.tools import tool
+from termcolor import colored
+from tld import get_tld
+
+SAMPLE_BRAND_LIST = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "brands.txt")
+BRAND_LIST_PATH = os.getenv("BRAND_LIST_PATH", SAMPLE_BRAND_LIST)
+MIN_BRAND_LENGTH = 4  # shorter brands match too many unrelated labels
+MAX_LABEL_LENGTH = 64  # one machine word per pattern
+LOOKALIKE_THRESHOLD = 0.8
+TOP_MATCHES = 3
+
+HOMOGLYPHS = [("rn", "m"), ("vv", "w"), ("0", "o"), ("1", "l"), ("3", "e"), ("4", "a"),
+              ("5", "s"), ("7", "t"), ("8", "b"), ("9", "g")]
+AFFIX_SUFFIXES = ["official", "outlet", "online", "store", "shop", "sale", "mall", "usa", "us", "uk", "eu"]
+AFFIX_PREFIXES = ["official", "shop", "buy", "the", "my"]
+
+_KEYBOARD_ROWS = ["qwertyuiop", "asdfghjkl", "zxcvbnm"]
+_ALPHABET = "abcdefghijklmnopqrstuvwxyz0123456789-"
+_CHAR_INDEX = {char: i for i, char in enumerate(_ALPHABET)}
+
+
+def skeleton(label: str) -> str:
+    label = "".join(char for char in label.lower() if char in _CHAR_INDEX)
+    for glyph, replacement in HOMOGLYPHS:
+        label = label.replace(glyph, replacement)
+    return label
+
+
+def _keyboard_neighbours(a: str, b: str) -> bool:
+    for row_index, row in enumerate(_KEYBOARD_ROWS):
+        if a in row:
+            i = row.index(a)
+            near = set(row[max(i - 1, 0):i + 2])
+            for other in _KEYBOARD_ROWS[max(row_index - 1, 0):row_index + 2]:
+                near.update(other[max(i - 1, 0):i + 2])
+            return b in near
+    return False
+
+
+def domain_labels(domain: str) -> List[str]:
+    """Labels of a hostname left of its public suffix (silverdz.youcan.store -> [silverdz, youcan])."""
+    domain = domain.strip().lower()
+    domain = domain.split("://", 1)[-1].split("/", 1)[0].split(":", 1)[0].rstrip(".")
+    info = get_tld(domain, fix_protocol=True, fail_silently=True, as_object=True)
+    name = domain[: -len(info.tld) - 1] if info else domain.rsplit(".", 1)[0]
+    return [label for label in name.split(".") if label and label != "www"]
+
+
+def country_code_label(hostname: str) -> Optional[str]:
+    """Registrable label of a hostname on a country-code suffix (amazon.co.uk -> amazon), else None."""
+    info = get_tld(hostname, fix_protocol=True, fail_silently=True, as_object=True)
+    if info is None or len(info.tld.rsplit(".", 1)[-1]) != 2:
+        return None
+    return info.domain
+
+
+def label_variants(label: str) -> List[tuple]:
+    """(variant, technique) pairs to compare against the brand skeletons."""
+    base = skeleton(label)
+    variants = [(base, "homoglyph" if base != label.lower() else "typo")]
+    joined = base.replace("-", "")
+    if joined != base:
+        variants.append((joined, "affix"))
+
+    for suffix in AFFIX_SUFFIXES:
+        if joined.endswith(suffix) and len(joined) - len(suffix) >= MIN_BRAND_LENGTH:
+            variants.append((joined[: -len(suffix)], "affix"))
+    for prefix in AFFIX_PREFIXES:
+        if joined.startswith(prefix) and len(joined) - len(prefix) >= MIN_BRAND_LENGTH:
+            variants.append((joined[len(prefix):], "affix"))
+
+    seen, unique = set(), []
+    for variant, technique in variants:
+        if variant and variant not in seen:
+            seen.add(variant)
+            unique.append((variant[:MAX_LABEL_LENGTH], technique))
+    return unique
+
+
+class BrandIndex:
+    """Brand skeletons with precomputed Myers match masks.
+
+    Entries sharing a skeleton are one brand with several official domains
+    (amazon.com and amazon.co.uk on separate lines of the brand list).
+    """
+
+    def __init__(self, entries: List[tuple]):
+        keep = {}
+        for brand, official in entries:
+            key = skeleton(brand)
+            if not MIN_BRAND_LENGTH <= len(key) <= MAX_LABEL_LENGTH:
+                continue
+            if key not in keep:
+                keep[key] = (brand, [])
+            if official not in keep[key][1]:
+                keep[key][1].append(official)
+
+        self.skeletons = list(keep)
+        self.brands = [keep[key][0] for key in self.skeletons]
+        self.official = [keep[key][1] for key in self.skeletons]
+        self.lengths = np.array([len(key) for key in self.skeletons], dtype=np.int64)
+
+        # peq[c, b] has bit i set when brand b has character c at position i
+        self._peq = np.zeros((len(_ALPHABET) + 1, len(self.skeletons)), dtype=np.uint64)
+        for b, key in enumerate(self.skeletons):
+            for i, char in enumerate(key):
+                self._peq[_CHAR_INDEX[char], b] |= np.uint64(1) << np.uint64(i)
+        self._high_bit = np.uint64(1) << (self.lengths.astype(np.uint64) - np.uint64(1))
+
+    def __len__(self) -> int:
+        return len(self.skeletons)
+
+    def distances(self, text: str) -> np.ndarray:
+        """Levenshtein distance from `text` to every brand (Hyyro's bit-vector formulation)."""
+        n = len(self)
+        pv = np.full(n, np.iinfo(np.uint64).max, dtype=np.uint64)
+        mv = np.zeros(n, dtype=np.uint64)
+        score = self.lengths.copy()
+        one = np.uint64(1)
+        for char in text:
+            eq = self._peq[_CHAR_INDEX.get(char, len(_ALPHABET))]
+            xv = eq | mv
+            xh = (((eq & pv) + pv) ^ pv) | eq
+            ph = mv | ~(xh | pv)
+            mh = pv & xh
+            score += (ph & self._high_bit) != 0
+            score -= (mh & self._high_bit) != 0
+            ph = (ph << one) | one
+            mh = mh << one
+            pv = mh | ~(xv | ph)
+            mv = ph & xv
+        return score
+
+    def closest(self, domain: str, k: int = TOP_MATCHES) -> List[dict]:
+        """Best brand matches over every label and variant of a domain."""
+        best = {}
+        for label in domain_labels(domain):
+            for variant, technique in label_variants(label):
+                dist = self.distances(variant)
+                similarity = 1 - dist / np.maximum(self.lengths, len(variant))
+                for b in np.argsort(-similarity)[:k]:
+                    score = float(similarity[b])
+                    if b not in best or score > best[b]["similarity"]:
+                        if dist[b] == 0 and technique == "typo":
+                            technique_name = "exact"
+                        elif technique == "typo" and len(variant) == self.lengths[b] and dist[b] == 1:
+                            diff = [(x, y) for x, y in zip(variant, self.skeletons[b]) if x != y]
+                            technique_name = "keyboard" if _keyboard_neighbours(*diff[0]) else "typo"
+                        else:
+                            technique_name = technique
+                        best[b] = {
+                            "brand": self.brands[b],
+                            "official_domain": self.official[b][0],
+                            "official_domains": self.official[b],
+                            "label": label,
+                            "similarity": round(score, 3),
+                            "distance": int(dist[b]),
+                            "technique": technique_name,
+                        }
+        return sorted(best.values(), key=lambda match: -match["similarity"])[:k]
+
+
+def read_brand_list(path: str) -> List[tuple]:
+    entries = []
+    with open(path, "r", encoding="UTF-8") as file:
+        for line in file:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            brand, _, official = line.rpartition(",")
+            official = official.strip().lower()
+            entries.append((brand.strip() or official.split(".")[0], official))
+    return entries
+
+
+def brand_list_warning(path: Optional[str] = None) -> Optional[str]:
+    """Why the brand list at `path` is unfit for production, or None."""
+    path = path or BRAND_LIST_PATH
+    if os.path.abspath(path) != SAMPLE_BRAND_LIST:
+        return None
+    return (
+        f"BRAND_LIST_PATH is unset, so only the {len(read_brand_list(path))} sample brands in {path} are checked; "
+        "lookalikes of any other brand go unflagged"
+    )
+
+
+@lru_cache(maxsize=1)
+def get_brand_index() -> BrandIndex:
+    return BrandIndex(read_brand_list(BRAND_LIST_PATH))
+
+
+_warning = brand_list_warning()
+if _warning:
+    print(colored(f"[BRANDS] {_warning}", "red"))
+
+
+def check_lookalike(domain: str, index: Optional[BrandIndex] = None) -> dict:
+    index = index or get_brand_index()
+    hostname = domain.strip().lower().split("://", 1)[-1].split("/", 1)[0]
+    hostname = hostname[4:] if hostname.startswith("www.") else hostname
+    matches = index.closest(hostname)
+
+    # The brand's own domains (or subdomains of them) are not lookalikes
+    official = next(
+        (m for m in matches for site in m["official_domains"] if hostname == site or hostname.endswith("." + site)),
+        None,
+    )
+    # Nor is the brand's exact name on a country-code suffix (adidas.de, amazon.co.uk):
+    # regional storefronts are rarely all listed, and a typo or affix there is still flagged
+    registrable = country_code_label(hostname)
+    regional = next(
+        (m for m in matches if m["technique"] == "exact" and m["label"] == registrable),
+        None,
+    ) if official is None else None
+    top = matches[0] if matches else None
+    trusted = official is not None or regional is not None
+    lookalike = bool(not trusted and top and top["similarity"] >= LOOKALIKE_THRESHOLD)
+    return {
+        "domain": hostname,
+        "is_official_brand_domain": official is not None,
+        "is_regional_brand_domain": regional is not None,
+        "lookalike": lookalike,
+        "score": top["similarity"] if top and not trusted else 0.0,
+        "closest_brands": matches,
+        "brands_checked": len(index),
+    }
+
+
+@tool
+def check_brand_impersonation(domain: str) -> str:
+    """
+    Description: Checks whether a domain imitates a known brand (typosquatting, homoglyphs
+    such as 0 for o or rn for m, keyboard slips, or a brand plus affixes like "us", "-store",
+    "-outlet"). Runs locally against a brand list and returns the closest brands with a
+    similarity score (1.0 = identical to the brand name).
+
+    Input: A domain name as a string.
+
+    Output: A JSON string with the lookalike flag, score and closest brands, or an error message.
+    """
+    print(colored(50 * "=", "green"))
+    start_time = time.time()
+
+    try:
+        return json.dumps(check_lookalike(domain), indent=2)
+
+    except Exception as e:
+        return json.dumps({"domain": domain, "error": f"Error checking brand impersonation: {e}"})
+
+    finally:
+        print(colored(f"[TIME] Time taken for check_brand_impersonation: {time.time() - start_time} seconds", "blue"))
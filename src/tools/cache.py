@@ -0,0 +1,323 @@
+"""Small key/value caches shared by the tools.
+
+Values are JSON-serialisable objects stored with an absolute expiry time.
+MemoryCache lives for the process; SQLiteCache persists across restarts so
+slow, rate-limited lookups are paid for once per entry lifetime rather than
+once per analysis.
+
+Every backend also hands out leases, which `single_flight` uses so one
+caller computes a missing entry while the others wait for it. With several
+uvicorn workers, `shared_cache` gives each process the same SQLite file (WAL
+mode, so readers never block the writer and hot pages sit in the shared OS
+page cache), which makes both the entries and the leases cross-process.
+CACHE_BACKEND=redis switches shared caches to a Redis-compatible server at
+REDIS_URL instead, for deployments spanning hosts.
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from typing import Any, Callable, Optional
+
+CACHE_DIR = os.getenv(
+    "RULEGIT_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache"),
+)
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "sqlite")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+PURGE_EVERY = 1000  # SQLite writes between sweeps of expired rows
+MAX_POLL_INTERVAL = 1.0  # seconds between a waiter's checks once backed off
+
+
+class MemoryCache:
+    """In-process TTL cache. The oldest entries are evicted past max_entries."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._data = {}
+        self._leases = {}
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._data[key]
+                return None
+            return entry[0]
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (value, time.time() + ttl)
+            while len(self._data) > self.max_entries:
+                del self._data[next(iter(self._data))]
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def purge_expired(self) -> int:
+        """Drop expired entries and return how many were removed."""
+        now = time.time()
+        with self._lock:
+            expired = [key for key, entry in self._data.items() if entry[1] <= now]
+            for key in expired:
+                del self._data[key]
+        return len(expired)
+
+    def acquire_lease(self, key: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            holder = self._leases.get(key)
+            if holder is not None and holder[1] > now and holder[0] != owner:
+                return False
+            self._leases[key] = (owner, now + ttl)
+            return True
+
+    def release_lease(self, key: str, owner: str) -> None:
+        with self._lock:
+            if self._leases.get(key, (None,))[0] == owner:
+                del self._leases[key]
+
+    def lease_holder(self, key: str) -> Optional[str]:
+        with self._lock:
+            holder = self._leases.get(key)
+        return holder[0] if holder is not None and holder[1] > time.time() else None
+
+
+class SQLiteCache:
+    """Persistent TTL cache backed by a single SQLite table.
+
+    Any number of processes may open the same file; leases live in a second
+    table of it.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        self._pid = os.getpid()
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS leases ("
+            " key TEXT PRIMARY KEY,"
+            " owner TEXT NOT NULL,"
+            " expires_at REAL NOT NULL);"
+        )
+        conn.commit()
+        return conn
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # A connection must not be used across fork(); workers forked after import reopen it
+        if self._pid != os.getpid():
+            self._conn = self._connect()
+        return self._conn
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + ttl),
+            )
+            self.conn.commit()
+            self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            self.purge_expired()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self.conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self.conn.commit()
+
+    def purge_expired(self) -> int:
+        """Drop expired rows and return how many were removed."""
+        with self._lock:
+            cursor = self.conn.execute(
+                "DELETE FROM cache WHERE expires_at <= ?", (time.time(),)
+            )
+            self.conn.commit()
+        return cursor.rowcount
+
+    def acquire_lease(self, key: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            cursor = self.conn.execute(
+                "INSERT INTO leases (key, owner, expires_at) VALUES (?, ?, ?)"
+                " ON CONFLICT (key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at"
+                " WHERE leases.expires_at <= ? OR leases.owner = excluded.owner",
+                (key, owner, now + ttl, now),
+            )
+            acquired = cursor.rowcount == 1
+            if not acquired:
+                # A worker that died holding a lease would otherwise block the key until it expires
+                row = self.conn.execute("SELECT owner FROM leases WHERE key = ?", (key,)).fetchone()
+                if row is not None and not _owner_alive(row[0]):
+                    cursor = self.conn.execute(
+                        "UPDATE leases SET owner = ?, expires_at = ? WHERE key = ? AND owner = ?",
+                        (owner, now + ttl, key, row[0]),
+                    )
+                    acquired = cursor.rowcount == 1
+            self.conn.commit()
+        return acquired
+
+    def release_lease(self, key: str, owner: str) -> None:
+        with self._lock:
+            self.conn.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+            self.conn.commit()
+
+    def lease_holder(self, key: str) -> Optional[str]:
+        """Live holder of the lease, read without taking the write lock."""
+        with self._lock:
+            row = self.conn.execute("SELECT owner, expires_at FROM leases WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] <= time.time() or not _owner_alive(row[0]):
+            return None
+        return row[0]
+
+
+class RedisCache:
+    """TTL cache and leases on a Redis-compatible server, under a key prefix.
+
+    `client` is anything with redis-py's get/set/delete (set taking px and nx)
+    and eval, returning str values.
+    """
+
+    # Compare-and-delete, so a holder whose lease expired cannot release its successor's
+    RELEASE_SCRIPT = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+    )
+
+    def __init__(self, client, prefix: str = ""):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, prefix: str = "") -> "RedisCache":
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("CACHE_BACKEND=redis needs the redis package (pip install redis)") from e
+        return cls(redis.Redis.from_url(url, decode_responses=True), prefix)
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.client.get(self.prefix + key)
+        return None if value is None else json.loads(value)
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        if ttl > 0:
+            self.client.set(self.prefix + key, json.dumps(value), px=int(ttl * 1000))
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+    def purge_expired(self) -> int:
+        """Redis expires keys itself."""
+        return 0
+
+    def acquire_lease(self, key: str, owner: str, ttl: float) -> bool:
+        lease = f"{self.prefix}lease:{key}"
+        if self.client.set(lease, owner, px=int(ttl * 1000), nx=True):
+            return True
+        return self.client.get(lease) == owner
+
+    def release_lease(self, key: str, owner: str) -> None:
+        self.client.eval(self.RELEASE_SCRIPT, 1, f"{self.prefix}lease:{key}", owner)
+
+    def lease_holder(self, key: str) -> Optional[str]:
+        return self.client.get(f"{self.prefix}lease:{key}")
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_cache(name: str):
+    """The cache `name` that every worker process shares (one instance per process)."""
+    with _shared_lock:
+        if name not in _shared:
+            if CACHE_BACKEND == "redis":
+                _shared[name] = RedisCache.from_url(REDIS_URL, prefix=f"rulegit:{name}:")
+            else:
+                _shared[name] = SQLiteCache(os.path.join(CACHE_DIR, f"{name}.sqlite"))
+        return _shared[name]
+
+
+def lease_owner() -> str:
+    """A unique lease holder id, prefixed with this process id."""
+    return f"{os.getpid()}:{uuid.uuid4().hex}"
+
+
+def _owner_alive(owner: str) -> bool:
+    pid = owner.partition(":")[0]
+    if not pid.isdigit():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def single_flight(
+    cache,
+    key: str,
+    compute: Callable[[], Any],
+    lookup: Callable[[], Optional[Any]],
+    lease_ttl: float = 60,
+    wait_timeout: Optional[float] = None,
+    poll_interval: float = 0.05,
+) -> Any:
+    """Run `compute` for `key` in one caller at a time across threads and processes.
+
+    The caller holding the lease computes; the others poll `lookup` until its
+    result appears, or take the lease once it is released without one (the
+    holder failed). Waiters only read while the lease is held, backing off
+    from `poll_interval` to MAX_POLL_INTERVAL between checks. After
+    `wait_timeout` (default: a quarter of the lease TTL) a waiter stops
+    waiting and computes itself.
+    """
+    owner = lease_owner()
+    deadline = time.monotonic() + (lease_ttl / 4 if wait_timeout is None else wait_timeout)
+    delay = poll_interval
+    while True:
+        if cache.lease_holder(key) is None and cache.acquire_lease(key, owner, lease_ttl):
+            try:
+                # The previous holder may have finished between our miss and the lease
+                result = lookup()
+                return compute() if result is None else result
+            finally:
+                cache.release_lease(key, owner)
+        result = lookup()
+        if result is not None:
+            return result
+        if time.monotonic() >= deadline:
+            return compute()
+        time.sleep(min(delay, max(deadline - time.monotonic(), 0)))
+        delay = min(delay * 2, MAX_POLL_INTERVAL)
@@ -2,12 +2,91 @@ from langchain_core.tools import tool
 from tavily import TavilyClient
 from termcolor import colored
 import os
+import re
 import time
 from dotenv import load_dotenv
+from tools.cache import shared_cache, single_flight
+from tools.dedup import dedupe_snippets
 
 load_dotenv()
 
-tavily_client = TavilyClient(api_key= os.getenv("TAVILY_API_KEY"))
+tavily_client = TavilyClient(api_key= os.getenv("TAVILY_API_KEY"), api_base_url=os.getenv("TAVILY_API_BASE_URL"))
+
+MAX_RESULTS = 10
+MIN_RELEVANT_HITS = 3  # escalate to an advanced search below this
+MAX_SNIPPET_CHARS = 400
+REDDIT_TTL = 12 * 3600
+
+SUBREDDIT_RE = re.compile(r"reddit\.com/r/([^/]+)", re.IGNORECASE)
+
+_reddit_cache = shared_cache("reddit")
+
+
+def normalize_domain(domain: str) -> str:
+   domain = domain.strip().lower()
+   domain = re.sub(r"^[a-z]+://", "", domain).split("/")[0]
+   return domain[4:] if domain.startswith("www.") else domain
+
+
+def is_relevant(hit: dict, domain: str) -> bool:
+   """A hit counts when it mentions the domain or its brand label."""
+   brand = domain.split(".")[0]
+   haystack = " ".join(str(hit.get(key) or "") for key in ("title", "content", "url")).lower()
+   return domain in haystack or (len(brand) > 3 and brand in haystack)
+
+
+def compact_hit(hit: dict) -> dict:
+   url = hit.get("url") or ""
+   match = SUBREDDIT_RE.search(url)
+   snippet = " ".join((hit.get("content") or "").split())
+   if len(snippet) > MAX_SNIPPET_CHARS:
+      snippet = snippet[:MAX_SNIPPET_CHARS].rstrip() + "..."
+   return {
+      "title": hit.get("title"),
+      "url": url,
+      "subreddit": match.group(1) if match else None,
+      "score": round(hit["score"], 3) if isinstance(hit.get("score"), (int, float)) else None,
+      "published_date": hit.get("published_date"),
+      "snippet": snippet,
+   }
+
+
+def search_reddit(domain: str, search_depth: str) -> list:
+   """One Tavily search restricted to reddit.com, returning only relevant hits."""
+   if search_depth == "basic":
+      query = f'"{domain}" reviews'
+   else:
+      query = f"{domain} reviews legit or scam experience"
+
+   response = tavily_client.search(
+      query,
+      search_depth=search_depth,
+      include_domains=["reddit.com"],
+      max_results=MAX_RESULTS,
+   )
+   return [hit for hit in response.get("results", []) if is_relevant(hit, domain)]
+
+
+def tiered_reddit_search(domain: str) -> dict:
+   """Run a cheap basic search first and escalate to advanced depth only when sparse."""
+   hits = search_reddit(domain, "basic")
+   depth = "basic"
+
+   if len(hits) < MIN_RELEVANT_HITS:
+      depth = "advanced"
+      seen = {hit.get("url") for hit in hits}
+      for hit in search_reddit(domain, "advanced"):
+         if hit.get("url") not in seen:
+            seen.add(hit.get("url"))
+            hits.append(hit)
+
+   hits.sort(key=lambda hit: hit.get("score") or 0, reverse=True)
+   return {
+      "domain": domain,
+      "search_depth": depth,
+      # Mirrors and crossposts of one thread collapse into the best-scored copy
+      "results": dedupe_snippets([compact_hit(hit) for hit in hits], text_key="snippet"),
+   }
 
 
 @tool
@@ -18,13 +97,26 @@ def check_reddit_reviews(domain: str):
 
    Input: A domain name as a string.
 
-   Output: The search results from Reddit containing reviews or discussions about the domain.
+   Output: The search results from Reddit containing reviews or discussions about the domain,
+   each with its title, url, subreddit, relevance score, date and a short snippet.
    """
    print(colored(50 * "=", "green"))
    start_time = time.time()
+   domain = normalize_domain(domain)
+
+   response = _reddit_cache.get(domain)
+   if response is not None:
+      print(colored(f"[CACHE] Reddit reviews hit for {domain}", "blue"))
+      return response
+
+   def search():
+      result = tiered_reddit_search(domain)
+      _reddit_cache.set(domain, result, REDDIT_TTL)
+      return result
+
    try:
-      query = f"get the reddit reviews for {domain}"
-      response = tavily_client.search(query, search_depth="advanced")
+      # Concurrent analyses of a domain, in any worker, share one search
+      response = single_flight(_reddit_cache, domain, search, lambda: _reddit_cache.get(domain))
 
    except Exception as e:
       print(colored(f"Error retrieving reddit reviews for {domain}: {e}", "red"))
@@ -32,5 +124,5 @@ def check_reddit_reviews(domain: str):
 
    finally:
       print(colored(f"[TIME] Time taken for reddit review check: {time.time() - start_time} seconds", "blue"))
-   
+
    return response
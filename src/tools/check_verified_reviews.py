@@ -1,34 +1,172 @@
 from langchain_core.tools import tool
 from termcolor import colored
+from typing import Optional
 import requests
-import json
+import asyncio
+import httpx
 import os
+import re
 from dotenv import load_dotenv
 import time
+from tools.cache import shared_cache, single_flight
 
 load_dotenv()
 
 DIFFBOT_API_KEY = os.getenv("DIFFBOT_API_KEY")
+DIFFBOT_URL = os.getenv("DIFFBOT_URL", "https://api.diffbot.com/v3/analyze")
+DIFFBOT_TIMEOUT = 30  # seconds per Diffbot call
+REVIEW_TTL = 24 * 3600
+NOT_FOUND_TTL = 6 * 3600
+MAX_RECENT_REVIEWS = 5
+MAX_SNIPPET_CHARS = 300
+NOT_FOUND_CODES = {404, 410}
+
+TRUSTSCORE_RE = re.compile(r"TrustScore\s*([0-5](?:\.\d)?)", re.IGNORECASE)
+REVIEW_COUNT_RE = re.compile(r"([\d,]+)\s+(?:total\s+)?reviews|reviews\s+([\d,]+)", re.IGNORECASE)
+DISTRIBUTION_RE = re.compile(r"([1-5])[- ]star\s*(\d{1,3})\s*%", re.IGNORECASE)
+PAGE_STATUS_RE = re.compile(r"\((\d{3})\)")
+
+_review_cache = shared_cache("trustpilot")
+
 
 @tool
 def extract_with_diffbot(url: str):
    """Extract data from URL using Diffbot API"""
-   base_url = f"https://api.diffbot.com/v3/analyze?token={DIFFBOT_API_KEY}"
-    
+   base_url = f"{DIFFBOT_URL}?token={DIFFBOT_API_KEY}"
+
    params = {
       'url': url
       }
-   
-   
-   
+
+
+
    headers = {"accept": "application/json"}
 
-   response = requests.request("GET", base_url, params=params, headers=headers)
-    
-   if "errorCode" in response.text:
+   response = requests.request("GET", base_url, params=params, headers=headers, timeout=DIFFBOT_TIMEOUT)
+
+   return diffbot_payload(response)
+
+
+def diffbot_payload(response) -> Optional[dict]:
+   """Payload of a Diffbot response (requests or httpx), or None when the page does not exist.
+
+   Diffbot reports a missing page as errorCode 404/410, or as a download error
+   naming the page's status ("Could not download page (404)"). Any other error,
+   such as a bad token (401), a rate limit (429) or a Diffbot outage (5xx), raises
+   so that callers never cache it as "not found".
+   """
+   if response.status_code >= 400 and response.status_code not in NOT_FOUND_CODES:
+      response.raise_for_status()
+   payload = response.json()
+   if "errorCode" not in payload:
+      return payload
+
+   code, message = payload.get("errorCode"), str(payload.get("error", ""))
+   page_status = PAGE_STATUS_RE.search(message)
+   if code in NOT_FOUND_CODES or (page_status and int(page_status.group(1)) in NOT_FOUND_CODES):
+      return None
+   raise RuntimeError(f"Diffbot error {code}: {message}")
+
+
+async def fetch_diffbot(client: httpx.AsyncClient, url: str) -> Optional[dict]:
+   """Async Diffbot analyze call. Returns None when the page does not exist."""
+   response = await client.get(
+      DIFFBOT_URL,
+      params={"token": DIFFBOT_API_KEY, "url": url},
+      headers={"accept": "application/json"},
+   )
+   return diffbot_payload(response)
+
+
+def _as_number(value):
+   if isinstance(value, (int, float)):
+      return value
+   try:
+      return float(str(value).replace(",", ""))
+   except (TypeError, ValueError):
       return None
-    
-   return json.loads(response.text)
+
+
+def _trim(text: Optional[str]) -> Optional[str]:
+   if not text:
+      return None
+   text = " ".join(text.split())
+   return text if len(text) <= MAX_SNIPPET_CHARS else text[:MAX_SNIPPET_CHARS].rstrip() + "..."
+
+
+def project_trustpilot(payload: dict, url: str) -> dict:
+   """Reduce a raw Diffbot analyze payload to a compact Trustpilot record.
+
+   Structured fields are used when Diffbot provides them, otherwise the
+   TrustScore, review count and star distribution are read from the page text.
+   """
+   objects = payload.get("objects") or []
+   page = objects[0] if objects else {}
+   text = page.get("text") or ""
+
+   trustscore = _as_number(page.get("rating"))
+   if trustscore is None:
+      match = TRUSTSCORE_RE.search(text)
+      trustscore = float(match.group(1)) if match else None
+
+   review_count = _as_number(page.get("reviewCount") or page.get("numReviews"))
+   if review_count is None:
+      match = REVIEW_COUNT_RE.search(text)
+      review_count = _as_number(match.group(1) or match.group(2)) if match else None
+
+   distribution = {f"{stars}-star": int(pct) for stars, pct in DISTRIBUTION_RE.findall(text)}
+
+   recent_reviews = []
+   for post in (page.get("posts") or page.get("reviews") or [])[:MAX_RECENT_REVIEWS]:
+      recent_reviews.append({
+         "date": post.get("date"),
+         "rating": _as_number(post.get("rating") or post.get("score")),
+         "title": _trim(post.get("title")),
+         "text": _trim(post.get("text")),
+      })
+
+   return {
+      "url": url,
+      "title": page.get("title"),
+      "trustscore": trustscore,
+      "review_count": int(review_count) if review_count is not None else None,
+      "rating_distribution": distribution,
+      "recent_reviews": recent_reviews,
+   }
+
+
+async def fetch_first_review(domain: str) -> Optional[dict]:
+   """Query the bare and www. Trustpilot pages concurrently.
+
+   The first variant that yields a payload wins and the other request is
+   cancelled. Returns None only when Diffbot reports both pages missing, and
+   raises when either call failed so transient errors are never cached as
+   "not found".
+   """
+   urls = [
+      f"https://www.trustpilot.com/review/{domain}",
+      f"https://www.trustpilot.com/review/www.{domain}",
+   ]
+   async with httpx.AsyncClient(timeout=DIFFBOT_TIMEOUT) as client:
+      tasks = {asyncio.create_task(fetch_diffbot(client, url)): url for url in urls}
+      pending = set(tasks)
+      errors = []
+      try:
+         while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+               if task.exception() is not None:
+                  errors.append(task.exception())
+               elif task.result() is not None:
+                  return project_trustpilot(task.result(), tasks[task])
+      finally:
+         for task in pending:
+            task.cancel()
+
+   # Only a definitive "not found" for every variant counts as a negative result
+   if errors:
+      raise errors[0]
+   return None
 
 
 @tool
@@ -39,27 +177,41 @@ def get_trustpilot_review(domain: str):
    It helps to gather verified reviews from Trustpilot to assess the credibility of the domain.
 
    Input: A domain name as a string.
-   
-   Output: A dictionary containing extracted Trustpilot reviews or an error message.
+
+   Output: A dictionary with the TrustScore, review count, rating distribution and a few
+   recent review snippets, or an error message.
    """
     print(colored(50 * "=", "green"))
     start_time = time.time()
-    # print(f"[TIME] Starting trustpilot review extraction for: {domain} at {start_time}")
 
     print(f"[DEBUG] Domain: {domain}")
+    domain = domain.strip().lower()
+    if domain.startswith("www."):
+        domain = domain[4:]
+
+    trustpilot_review = _review_cache.get(domain)
+    if trustpilot_review is not None:
+        print(colored(f"[CACHE] Trustpilot review hit for {domain}", "blue"))
+        return trustpilot_review
+
+    def extract():
+        review = asyncio.run(fetch_first_review(domain))
+        print(f"[DEBUG] Trustpilot review: {review}")
+
+        if review is None:
+            review = {"Error": f"No Trustpilot reviews found for {domain}"}
+            _review_cache.set(domain, review, NOT_FOUND_TTL)
+        else:
+            _review_cache.set(domain, review, REVIEW_TTL)
+        return review
 
     try:
-        url = f"https://www.trustpilot.com/review/{domain}"
-        trustpilot_review = extract_with_diffbot.invoke(url)
-        print(f"[DEBUG] Trustpilot review: {trustpilot_review}")
-        
-        if trustpilot_review is None:
-            url = f"https://www.trustpilot.com/review/www.{domain}"
-            trustpilot_review = extract_with_diffbot.invoke(url)
-            print(f"[DEBUG] Trustpilot review 2: {trustpilot_review}")
+        # Concurrent analyses of a domain, in any worker, share one Diffbot extraction
+        trustpilot_review = single_flight(_review_cache, domain, extract, lambda: _review_cache.get(domain))
 
     except Exception as e:
         print(colored(f"Error retrieving trustpilot review for {domain}: {e}", "red"))
+        trustpilot_review = {"Error": f"Error retrieving trustpilot review for {domain}: {e}"}
 
     finally:
         print(colored(f"[TIME] Time taken for trustpilot review extraction: {time.time() - start_time} seconds", "blue"))
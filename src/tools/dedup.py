@@ -0,0 +1,121 @@
+"""Near-duplicate elimination for text evidence.
+
+Search results from Tavily, Reddit mirrors and Trustpilot often repeat the
+same complaint thread or page boilerplate. Snippets are shingled, MinHash
+signatures are computed for all of them at once with NumPy, and LSH banding
+finds candidate pairs so only likely duplicates are compared. Each group of
+near-duplicates collapses to its first item, annotated with a count.
+"""
+
+import re
+import numpy as np
+import xxhash
+from typing import List
+
+SHINGLE_SIZE = 3  # words per shingle
+NUM_PERM = 64
+BANDS = 16  # NUM_PERM must be divisible by BANDS
+SIMILARITY_THRESHOLD = 0.7
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def shingle_hashes(text: str, k: int = SHINGLE_SIZE) -> np.ndarray:
+    """32-bit hashes of the word k-shingles of a text."""
+    words = _WORD_RE.findall((text or "").lower())
+    if len(words) <= k:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [" ".join(words[i:i + k]) for i in range(len(words) - k + 1)]
+    return np.fromiter((xxhash.xxh32_intdigest(s) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+
+def minhash_signatures(texts: List[str]) -> np.ndarray:
+    """MinHash signatures for all texts, shape (len(texts), NUM_PERM)."""
+    hashes = [shingle_hashes(text) for text in texts]
+    lengths = np.array([len(h) for h in hashes])
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    all_hashes = np.concatenate(hashes)
+
+    # One universal hash per permutation, applied to every shingle at once
+    permuted = (np.outer(all_hashes, _PERM_A) + _PERM_B) % _MERSENNE_PRIME & _MAX_HASH
+    return np.minimum.reduceat(permuted, offsets, axis=0)
+
+
+def _find(parent: List[int], i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def cluster_near_duplicates(texts: List[str], threshold: float = SIMILARITY_THRESHOLD) -> List[int]:
+    """Return a cluster id per text; near-duplicates share the id of their first member."""
+    n = len(texts)
+    parent = list(range(n))
+    if n < 2:
+        return parent
+
+    signatures = minhash_signatures(texts)
+    rows = NUM_PERM // BANDS
+
+    candidates = set()
+    for band in range(BANDS):
+        buckets = {}
+        band_sig = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        for i in range(n):
+            buckets.setdefault(band_sig[i].tobytes(), []).append(i)
+        for members in buckets.values():
+            for j in members[1:]:
+                candidates.add((members[0], j))
+
+    if candidates:
+        pairs = np.array(sorted(candidates))
+        # Estimated Jaccard similarity = share of agreeing signature slots
+        similarity = (signatures[pairs[:, 0]] == signatures[pairs[:, 1]]).mean(axis=1)
+        for (i, j), sim in zip(pairs, similarity):
+            if sim >= threshold:
+                root_i, root_j = _find(parent, i), _find(parent, j)
+                parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    return [_find(parent, i) for i in range(n)]
+
+
+def dedupe_snippets(items: List[dict], text_key: str = "snippet",
+                    threshold: float = SIMILARITY_THRESHOLD, count_key: str = "duplicate_count") -> List[dict]:
+    """Collapse near-duplicate items, keeping the first of each group in order.
+
+    Kept items that absorbed duplicates get `count_key` set to the group size.
+    Items without text are kept as they are.
+    """
+    indexed = [(i, item) for i, item in enumerate(items) if (item.get(text_key) or "").strip()]
+    if len(indexed) < 2:
+        return list(items)
+
+    clusters = cluster_near_duplicates([item[text_key] for _, item in indexed], threshold)
+    sizes = {}
+    for root in clusters:
+        sizes[root] = sizes.get(root, 0) + 1
+
+    dropped = set()
+    kept = {}
+    for position, (i, item) in enumerate(indexed):
+        root = clusters[position]
+        if root != position:
+            dropped.add(i)
+        elif sizes[root] > 1:
+            kept[i] = {**item, count_key: sizes[root]}
+
+    return [kept.get(i, item) for i, item in enumerate(items) if i not in dropped]
+
+
+def dedupe_texts(texts: List[str], threshold: float = SIMILARITY_THRESHOLD) -> List[str]:
+    """Plain-string variant of dedupe_snippets."""
+    clusters = cluster_near_duplicates(texts, threshold)
+    return [text for i, text in enumerate(texts) if clusters[i] == i]
@@ -0,0 +1,267 @@
+"""Local BM25 retrieval over the evidence collected during one analysis.
+
+Evidence-heavy tools (scam-detector panels, Reddit/Tavily search, Trustpilot
+reviews) can return far more text than the model needs. Their outputs are
+chunked into passages and added to a per-analysis BM25 index; the agent then
+receives only the top passages for a fixed set of trust questions, so the
+prompt stays roughly the same size however much evidence a domain has.
+Pure Python/NumPy, no external vector service.
+
+With EVIDENCE_INDEX_PERSIST, a domain's passages are saved keyed by a hash of
+the tool output they were chunked from. A later analysis reuses them only for
+evidence that is byte-for-byte the same, so passages of outdated evidence
+never reach the prompt.
+"""
+
+import os
+import re
+import json
+import numpy as np
+import xxhash
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+from langchain_core.tools import BaseTool
+from tools.cache import CACHE_DIR
+from tools.tool_wrapper import wrap_tool
+
+CHUNK_WORDS = 80
+CHUNK_OVERLAP = 20
+TOP_K = 3  # passages per trust question
+RETRIEVAL_MIN_CHARS = 2000  # smaller tool outputs are passed through untouched
+PERSIST_INDEX = os.getenv("EVIDENCE_INDEX_PERSIST", "false").lower() == "true"
+INDEX_DIR = os.path.join(CACHE_DIR, "evidence_index")
+
+TRUST_QUESTIONS = {
+    "delivery": "order never arrived not delivered shipping delay tracking number package received",
+    "refund": "refund return money back chargeback dispute cancel order",
+    "impersonation": "fake copy impersonating official brand counterfeit replica clone website",
+    "payment": "charged credit card unauthorized payment paypal bank fraud",
+    "legitimacy": "scam legit legitimate fraud trust trustworthy safe blacklist phishing",
+    "quality": "quality cheap not as described poor product material size",
+}
+
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "from", "has", "have",
+    "i", "in", "is", "it", "its", "my", "of", "on", "or", "that", "the", "this", "to",
+    "was", "were", "with", "you", "your", "we", "they", "them", "me",
+}
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+_current_index: ContextVar[Optional["BM25Index"]] = ContextVar("evidence_index", default=None)
+# evidence hash -> passages, as saved for the domain and as used by the current analysis
+_saved_passages: ContextVar[Dict[str, List[dict]]] = ContextVar("saved_passages", default={})
+_analysis_passages: ContextVar[Optional[Dict[str, List[dict]]]] = ContextVar("analysis_passages", default=None)
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in _STOPWORDS:
+            continue
+        # Light plural folding so "refunds" matches "refund"
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def chunk_text(text: str, max_words: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    words = text.split()
+    if len(words) <= max_words:
+        return [" ".join(words)] if words else []
+    step = max_words - overlap
+    return [" ".join(words[i:i + max_words]) for i in range(0, len(words) - overlap, step)]
+
+
+def _flatten(value: Any, prefix: str = "") -> List[str]:
+    """Render nested tool output as 'key: value' lines."""
+    if isinstance(value, dict):
+        return [line for key, item in value.items() for line in _flatten(item, f"{key}: ")]
+    if isinstance(value, list):
+        return [line for item in value for line in _flatten(item, prefix)]
+    if value is None or value == "":
+        return []
+    return [f"{prefix}{value}"]
+
+
+def evidence_to_passages(source: str, output: Any) -> List[dict]:
+    """Split a tool output into passages.
+
+    Lists of records (search hits, reviews) and top-level sections (scam-detector
+    panels) become one unit each before chunking, so passages keep their context.
+    """
+    if isinstance(output, str):
+        try:
+            output = json.loads(output)
+        except ValueError:
+            pass
+
+    units = []
+    if isinstance(output, dict):
+        for key, value in output.items():
+            records = value if isinstance(value, list) and value and isinstance(value[0], dict) else None
+            if records:
+                units.extend((key, " ".join(_flatten(record))) for record in records)
+            else:
+                units.append((key, " ".join(_flatten({key: value}))))
+    elif isinstance(output, list):
+        units = [(None, " ".join(_flatten(item))) for item in output]
+    else:
+        units = [(None, str(output))]
+
+    passages = []
+    for section, text in units:
+        for chunk in chunk_text(text):
+            passages.append({"source": source, "section": section, "text": chunk})
+    return passages
+
+
+class BM25Index:
+    """Okapi BM25 over passages, with postings stored as NumPy arrays."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.passages: List[dict] = []
+        self._term_counts: List[Counter] = []
+        self._postings: Dict[str, tuple] = {}
+        self._seen = set()
+        self._built = True
+
+    def __len__(self) -> int:
+        return len(self.passages)
+
+    def add(self, passages: List[dict]) -> None:
+        """Add passages, skipping exact repeats of already indexed ones."""
+        for passage in passages:
+            key = (passage["source"], passage["text"])
+            if key in self._seen:
+                continue
+            self._seen.add(key)
+            self.passages.append(passage)
+            self._term_counts.append(Counter(tokenize(passage["text"])))
+        self._built = False
+
+    def _build(self) -> None:
+        postings = {}
+        for doc_id, counts in enumerate(self._term_counts):
+            for term, tf in counts.items():
+                postings.setdefault(term, ([], []))
+                postings[term][0].append(doc_id)
+                postings[term][1].append(tf)
+
+        n = len(self.passages)
+        self._doc_len = np.array([sum(c.values()) for c in self._term_counts], dtype=np.float32)
+        avg_len = self._doc_len.mean() if n else 1.0
+        self._norm = self.k1 * (1 - self.b + self.b * self._doc_len / max(avg_len, 1e-9))
+        self._postings = {}
+        for term, (ids, tfs) in postings.items():
+            idf = np.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+            self._postings[term] = (np.array(ids), np.array(tfs, dtype=np.float32), idf)
+        self._built = True
+
+    def search(self, query: str, k: int = TOP_K, source: Optional[str] = None) -> List[dict]:
+        """Top-k passages for a query, optionally restricted to one source."""
+        if not self.passages:
+            return []
+        if not self._built:
+            self._build()
+
+        scores = np.zeros(len(self.passages), dtype=np.float32)
+        for term in set(tokenize(query)):
+            if term not in self._postings:
+                continue
+            ids, tfs, idf = self._postings[term]
+            scores[ids] += idf * tfs * (self.k1 + 1) / (tfs + self._norm[ids])
+
+        if source is not None:
+            scores[[p["source"] != source for p in self.passages]] = 0
+
+        top = np.argsort(-scores)[:k]
+        return [
+            {**self.passages[i], "score": round(float(scores[i]), 3)}
+            for i in top if scores[i] > 0
+        ]
+
+
+def domain_index_path(domain: str) -> str:
+    return os.path.join(INDEX_DIR, f"{re.sub(r'[^a-z0-9.-]', '_', domain.lower())}.json")
+
+
+def evidence_hash(source: str, output: Any) -> str:
+    return xxhash.xxh3_64_hexdigest(json.dumps([source, output], sort_keys=True, default=str))
+
+
+def _load_passages(domain: str) -> Dict[str, List[dict]]:
+    try:
+        with open(domain_index_path(domain), "r", encoding="UTF-8") as file:
+            saved = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    # Files from before passages were keyed by evidence hash cannot be matched to evidence
+    return saved if isinstance(saved, dict) else {}
+
+
+def start_analysis_index(domain: Optional[str] = None) -> BM25Index:
+    """Bind a fresh index to the current analysis, with the domain's saved passages when persisted."""
+    index = BM25Index()
+    _current_index.set(index)
+    _saved_passages.set(_load_passages(domain) if domain and PERSIST_INDEX else {})
+    _analysis_passages.set({})
+    return index
+
+
+def save_analysis_index(domain: str) -> None:
+    """Persist this analysis' passages, keyed by evidence hash, when EVIDENCE_INDEX_PERSIST is on."""
+    passages = _analysis_passages.get()
+    if PERSIST_INDEX and passages:
+        os.makedirs(INDEX_DIR, exist_ok=True)
+        with open(domain_index_path(domain), "w", encoding="UTF-8") as file:
+            json.dump(passages, file)
+
+
+def current_index() -> BM25Index:
+    index = _current_index.get()
+    if index is None:
+        index = start_analysis_index()
+    return index
+
+
+def retrieve_for_questions(index: BM25Index, k: int = TOP_K, source: Optional[str] = None) -> Dict[str, List[dict]]:
+    """Top passages per trust question; each passage is reported once, under its best question."""
+    best = {}
+    for question, query in TRUST_QUESTIONS.items():
+        for hit in index.search(query, k=k, source=source):
+            key = (hit["source"], hit["text"])
+            if key not in best or hit["score"] > best[key][1]["score"]:
+                best[key] = (question, hit)
+
+    answers = {question: [] for question in TRUST_QUESTIONS}
+    for question, hit in best.values():
+        answers[question].append({"section": hit["section"], "text": hit["text"], "score": hit["score"]})
+    return {question: hits for question, hits in answers.items() if hits}
+
+
+def compact_evidence(source: str, output: Any) -> Any:
+    """Index a tool output and return only its top passages per trust question."""
+    index = current_index()
+    key = evidence_hash(source, output)
+    passages = _saved_passages.get().get(key) or evidence_to_passages(source, output)
+    _analysis_passages.get()[key] = passages
+    index.add(passages)
+
+    if len(json.dumps(output, default=str)) <= RETRIEVAL_MIN_CHARS:
+        return output
+
+    return {
+        "source": source,
+        "total_passages": len(passages),
+        "note": "Only the passages most relevant to each trust question are shown.",
+        "top_passages": retrieve_for_questions(index, source=source),
+    }
+
+
+def with_evidence_retrieval(source: str, base) -> BaseTool:
+    """Wrap a tool (or plain function) so its output goes through compact_evidence."""
+    return wrap_tool(base, after=lambda output: compact_evidence(source, output))
@@ -0,0 +1,201 @@
+from langchain_core.tools import tool
+from typing import Dict, List, Optional
+import dns.asyncresolver
+import dns.exception
+import dns.resolver
+import asyncio
+import json
+import os
+import time
+from termcolor import colored
+from tools.cache import MemoryCache
+from tools.get_domain_info import to_hostname, registrable_domain
+
+QUERY_TIMEOUT = 2.0  # seconds per record type, across all nameservers
+NEGATIVE_TTL = 300
+MAX_TTL = 24 * 3600
+RECORD_TYPES = ["A", "AAAA", "MX", "NS", "TXT", "CNAME"]
+
+# Optional comma-separated resolver override, e.g. "1.1.1.1,8.8.8.8"
+DNS_NAMESERVERS = [ns.strip() for ns in os.getenv("DNS_NAMESERVERS", "").split(",") if ns.strip()]
+
+# Hosting fingerprints: substrings of CNAME/NS targets, or A record prefixes
+ECOMMERCE_PLATFORMS = {
+    "Shopify": {"cname": ["myshopify.com", "shopify.com"], "a": ["23.227.38."]},
+    "YouCan": {"cname": ["youcan.shop", "youcan.store"], "a": []},
+    "Wix": {"cname": ["wixdns.net", "wixsite.com"], "a": ["185.230.63.", "185.230.61."]},
+    "Squarespace": {"cname": ["squarespace.com", "squarespacedns.com"], "a": ["198.185.159.", "198.49.23."]},
+    "BigCommerce": {"cname": ["bigcommerce.com", "mybigcommerce.com"], "a": []},
+    "Shopline": {"cname": ["myshopline.com", "shoplineapp.com"], "a": []},
+    "Shoplazza": {"cname": ["shoplazza.com", "myshoplaza.com"], "a": []},
+    "Ecwid": {"cname": ["ecwid.com", "company.site"], "a": []},
+    "Weebly": {"cname": ["weebly.com"], "a": []},
+}
+
+NS_PROVIDERS = {
+    "cloudflare.com": "Cloudflare",
+    "domaincontrol.com": "GoDaddy",
+    "awsdns": "Amazon Route 53",
+    "registrar-servers.com": "Namecheap",
+    "googledomains.com": "Google",
+    "google.com": "Google",
+    "wixdns.net": "Wix",
+    "squarespacedns.com": "Squarespace",
+    "dnsowl.com": "NameSilo",
+    "name-services.com": "eNom",
+    "hichina.com": "Alibaba Cloud",
+    "nsone.net": "NS1",
+    "azure-dns": "Azure DNS",
+    "shopify.com": "Shopify",
+    "hostinger": "Hostinger",
+    "bluehost.com": "Bluehost",
+}
+
+# Per process, with no disk or network hop; entries expire on their record TTLs
+_dns_cache = MemoryCache()
+
+
+def make_resolver(nameservers: Optional[List[str]] = None, port: int = 53) -> dns.asyncresolver.Resolver:
+    """Build an async resolver with strict timeouts.
+
+    Uses the system configuration unless nameservers are given (or set via
+    DNS_NAMESERVERS), which is also how tests point it at a local stub server.
+    """
+    nameservers = nameservers or DNS_NAMESERVERS
+    resolver = dns.asyncresolver.Resolver(configure=not nameservers)
+    if nameservers:
+        resolver.nameservers = nameservers
+        resolver.port = port
+    resolver.timeout = QUERY_TIMEOUT
+    resolver.lifetime = QUERY_TIMEOUT
+    return resolver
+
+
+async def query_records(resolver: dns.asyncresolver.Resolver, name: str, rdtype: str) -> List[str]:
+    """Resolve one record type, honouring the answer TTL through the in-process cache."""
+    key = f"{name}|{rdtype}"
+    cached = _dns_cache.get(key)
+    if cached is not None:
+        return cached
+
+    try:
+        answer = await asyncio.wait_for(
+            resolver.resolve(name, rdtype, raise_on_no_answer=False),
+            timeout=QUERY_TIMEOUT,
+        )
+    except dns.resolver.NXDOMAIN:
+        _dns_cache.set(key, [], NEGATIVE_TTL)
+        return []
+    except (asyncio.TimeoutError, dns.exception.Timeout, dns.resolver.NoNameservers):
+        # Not cached, the next analysis gets a fresh attempt
+        return []
+
+    if answer.rrset is None:
+        _dns_cache.set(key, [], NEGATIVE_TTL)
+        return []
+
+    records = [rdata.to_text() for rdata in answer.rrset]
+    _dns_cache.set(key, records, min(max(answer.rrset.ttl, 1), MAX_TTL))
+    return records
+
+
+def _match_platform(cnames: List[str], ns: List[str], a_records: List[str]) -> Optional[str]:
+    # Names are the stronger fingerprint, shared IP ranges are only a fallback
+    targets = [name.lower() for name in cnames + ns]
+    for platform, marks in ECOMMERCE_PLATFORMS.items():
+        if any(mark in target for mark in marks["cname"] for target in targets):
+            return platform
+    for platform, marks in ECOMMERCE_PLATFORMS.items():
+        if any(ip.startswith(prefix) for prefix in marks["a"] for ip in a_records):
+            return platform
+    return None
+
+
+def _match_ns_provider(ns: List[str]) -> Optional[str]:
+    for host in ns:
+        for mark, provider in NS_PROVIDERS.items():
+            if mark in host.lower():
+                return provider
+    # Unknown provider: report the nameserver's own domain
+    return registrable_domain(ns[0].rstrip(".")) if ns else None
+
+
+def _unquote_txt(record: str) -> str:
+    # TXT rdata text is a list of quoted strings that belong together
+    return "".join(part.strip('"') for part in record.split('" "'))
+
+
+def summarize_dns(records: Dict[str, List[str]], dmarc: List[str]) -> dict:
+    """Reduce raw records to compact hosting signals."""
+    txt = [_unquote_txt(record) for record in records.get("TXT", [])]
+    dmarc = [_unquote_txt(record) for record in dmarc]
+    spf = next((record for record in txt if record.lower().startswith("v=spf1")), None)
+    dmarc_record = next((record for record in dmarc if record.lower().startswith("v=dmarc1")), None)
+
+    dmarc_policy = None
+    if dmarc_record:
+        for tag in dmarc_record.split(";"):
+            key, _, value = tag.strip().partition("=")
+            if key.lower() == "p":
+                dmarc_policy = value.strip().lower()
+
+    mx_hosts = sorted({record.split()[-1].rstrip(".").lower() for record in records.get("MX", [])})
+    ns_hosts = sorted(record.rstrip(".").lower() for record in records.get("NS", []))
+    cnames = [record.rstrip(".").lower() for record in records.get("CNAME", [])]
+
+    return {
+        "resolves": bool(records.get("A") or records.get("AAAA") or cnames),
+        "ipv4": records.get("A", [])[:4],
+        "ipv6": bool(records.get("AAAA")),
+        "cname": cnames[0] if cnames else None,
+        "ecommerce_platform": _match_platform(cnames, ns_hosts, records.get("A", [])),
+        "ns_provider": _match_ns_provider(ns_hosts),
+        "mail_configured": bool(mx_hosts),
+        "mx": mx_hosts[:3],
+        "spf": bool(spf),
+        "dmarc_policy": dmarc_policy,
+    }
+
+
+async def get_dns_signals(domain: str, resolver: Optional[dns.asyncresolver.Resolver] = None) -> dict:
+    """Resolve all record types concurrently and return the compact DNS signals."""
+    resolver = resolver or make_resolver()
+    hostname = to_hostname(domain)
+    zone = registrable_domain(hostname)
+
+    # A/AAAA/CNAME describe the site host, NS/MX/TXT the registered zone
+    names = {"A": hostname, "AAAA": hostname, "CNAME": hostname, "NS": zone, "MX": zone, "TXT": zone}
+    lookups = [query_records(resolver, names[rdtype], rdtype) for rdtype in RECORD_TYPES]
+    lookups.append(query_records(resolver, f"_dmarc.{zone}", "TXT"))
+
+    results = await asyncio.gather(*lookups)
+    records = dict(zip(RECORD_TYPES, results[:-1]))
+
+    signals = {"domain": hostname}
+    signals.update(summarize_dns(records, results[-1]))
+    return signals
+
+
+@tool
+def get_dns_info(domain: str) -> str:
+    """
+    Description: Resolves the DNS records (A/AAAA, MX, NS, TXT, CNAME) of a domain
+    and returns compact hosting signals: whether the site resolves, whether it runs
+    on a known e-commerce platform (Shopify, Wix, YouCan, ...), who provides its
+    nameservers, and whether mail (MX, SPF, DMARC) is configured.
+
+    Input: A domain name as a string.
+
+    Output: A JSON string containing the DNS hosting signals or an error message.
+    """
+    print(colored(50 * "=", "green"))
+    start_time = time.time()
+
+    try:
+        return json.dumps(asyncio.run(get_dns_signals(domain)), indent=2)
+
+    except Exception as e:
+        return json.dumps({"domain": domain, "error": f"Error resolving DNS records: {e}"})
+
+    finally:
+        print(colored(f"[TIME] Time taken for get_dns_info: {time.time() - start_time} seconds", "blue"))
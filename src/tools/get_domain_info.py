@@ -1,10 +1,219 @@
 from langchain_core.tools import tool
 from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError
+from datetime import datetime, timezone
+from dateutil import parser
+from tld import get_fld
 import whois
 from whois.exceptions import UnknownTldError
+from whois.parser import WhoisEntry
+import os
 import json
+import socket
+import threading
 import time
 from termcolor import colored
+from tools.rdap import rdap_lookup
+from tools.cache import SQLiteCache, shared_cache, single_flight
+from tracing import annotate, in_context, span
+
+# Race legacy port-43 WHOIS against RDAP and keep the first complete answer
+RACE_WHOIS = os.getenv("RDAP_RACE_WHOIS", "true").lower() == "true"
+LOOKUP_TIMEOUT = 20  # seconds
+WHOIS_TIMEOUT = 10  # seconds per WHOIS socket operation
+WHOIS_WORKERS = 4  # concurrent WHOIS lookups; RDAP-only answers when all are busy
+# "host:port" of one WHOIS server to ask for every TLD (e.g. the load-test stub)
+WHOIS_SERVER = os.getenv("WHOIS_SERVER", "")
+
+# Cache TTLs (seconds). Registration data of old domains is stable, so the
+# TTL grows with domain age but never runs past the expiration date.
+AGE_TTL_FRACTION = 0.05
+MIN_TTL = 24 * 3600
+MAX_TTL = 30 * 24 * 3600
+EXPIRY_RECHECK_TTL = 3600
+NEGATIVE_TTLS = {
+    "unknown_tld": 6 * 3600,
+    "no_record": 3600,
+}
+
+# WHOIS has its own small pool, so hung port-43 servers can never hold the threads RDAP needs
+_rdap_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="rdap")
+_whois_pool = ThreadPoolExecutor(max_workers=WHOIS_WORKERS, thread_name_prefix="whois")
+_whois_slots = threading.BoundedSemaphore(WHOIS_WORKERS)
+_whois_cache = None
+
+
+def get_whois_cache() -> SQLiteCache:
+    global _whois_cache
+    if _whois_cache is None:
+        _whois_cache = shared_cache("whois_cache")
+    return _whois_cache
+
+
+def to_hostname(url: str) -> str:
+    """Strip scheme, path and port so both URLs and bare domains can be looked up."""
+    url = url.strip()
+    parsed = urlparse(url if "://" in url else f"//{url}")
+    return (parsed.hostname or url).rstrip(".").lower()
+
+
+def registrable_domain(hostname: str) -> str:
+    """Reduce a hostname to its registrable domain (silverdz.youcan.store -> youcan.store).
+
+    Only ICANN suffixes are considered since WHOIS records exist for the
+    registered name, not for subdomains handed out by hosting platforms.
+    """
+    fld = get_fld(hostname, fix_protocol=True, fail_silently=True, search_private=False)
+    return (fld or hostname).lower()
+
+
+def _parse_date(value: str) -> datetime:
+    date = parser.parse(value)
+    return date if date.tzinfo else date.replace(tzinfo=timezone.utc)
+
+
+def cache_ttl(result: dict, now: datetime = None) -> float:
+    """Pick how long a lookup result stays cached.
+
+    Successful answers live for a fraction of the domain age, clamped to
+    [MIN_TTL, MAX_TTL] and cut short near expiration. Known negative answers
+    get short TTLs, anything else (timeouts, transient errors) is not cached.
+    """
+    if result.get("error"):
+        return NEGATIVE_TTLS.get(result.get("error_type"), 0)
+
+    now = now or datetime.now(timezone.utc)
+    try:
+        age = (now - _parse_date(result["creation_date"])).total_seconds()
+    except (KeyError, TypeError, ValueError, OverflowError):
+        return MIN_TTL
+    ttl = min(max(age * AGE_TTL_FRACTION, MIN_TTL), MAX_TTL)
+
+    if result.get("expiration_date"):
+        try:
+            to_expiry = (_parse_date(result["expiration_date"]) - now).total_seconds()
+            ttl = min(ttl, max(to_expiry, EXPIRY_RECHECK_TTL))
+        except (TypeError, ValueError, OverflowError):
+            pass
+    return ttl
+
+
+def query_whois_server(domain: str, server: str, timeout: int = WHOIS_TIMEOUT) -> WhoisEntry:
+    """Query one WHOIS server directly and parse the answer with python-whois."""
+    host, _, port = server.rpartition(":")
+    chunks = []
+    with socket.create_connection((host, int(port)), timeout=timeout) as conn:
+        conn.sendall(f"{domain}\r\n".encode("utf-8"))
+        while True:
+            chunk = conn.recv(4096)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    return WhoisEntry.load(domain, b"".join(chunks).decode("utf-8", "replace"))
+
+
+def whois_lookup(domain: str) -> dict:
+    """Legacy port-43 WHOIS lookup through python-whois."""
+    try:
+        with span("whois port-43", require_trace=True, domain=domain):
+            domain_info = (query_whois_server(domain, WHOIS_SERVER) if WHOIS_SERVER
+                           else whois.whois(domain, timeout=WHOIS_TIMEOUT))
+    except UnknownTldError:
+        return {"domain": domain,
+                "error": "Could not check domain for domain, unknown TLD.",
+                "error_type": "unknown_tld"}
+
+    if not domain_info or not domain_info.creation_date:
+        return {"error": f"No domain info found for {domain}. This is a red flag.",
+                "error_type": "no_record"}
+
+    creation_date = domain_info.creation_date
+    if isinstance(creation_date, list):
+        creation_date = creation_date[0] if creation_date else None
+
+    expiration_date = domain_info.expiration_date
+    if isinstance(expiration_date, list):
+        expiration_date = expiration_date[0] if expiration_date else None
+
+    return {
+        "domain": domain_info.domain_name,
+        "creation_date": str(creation_date) if creation_date else None,
+        "expiration_date": str(expiration_date) if expiration_date else None,
+        "registrar": domain_info.registrar
+    }
+
+
+def _whois_in_slot(domain: str, slots: threading.BoundedSemaphore) -> dict:
+    try:
+        return whois_lookup(domain)
+    finally:
+        slots.release()
+
+
+def lookup_domain(domain: str, race_whois: bool = RACE_WHOIS) -> dict:
+    """Run RDAP (and optionally WHOIS) concurrently and return the first complete answer.
+
+    An answer is complete when it carries a creation date. When no source
+    produces one, the RDAP error is preferred as it is the more specific.
+    WHOIS is skipped while WHOIS_WORKERS lookups are already in flight, rather
+    than queueing behind them. A negative answer is only final once WHOIS gave
+    one too (many ccTLDs have no RDAP service); otherwise its error_type is
+    "whois_skipped", which is never cached.
+    """
+    sources = {_rdap_pool.submit(in_context(rdap_lookup, "rdap_lookup"), domain): "rdap"}
+    slots = _whois_slots
+    if race_whois and slots.acquire(blocking=False):
+        sources[_whois_pool.submit(in_context(_whois_in_slot, "whois_lookup"), domain, slots)] = "whois"
+
+    errors = {}
+    try:
+        for future in as_completed(sources, timeout=LOOKUP_TIMEOUT):
+            source = sources[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"domain": domain, "error": f"Error getting domain info: {e}"}
+
+            if result.get("creation_date"):
+                print(f"[INFO] Domain info for {domain} answered by {source}")
+                result["source"] = source
+                return result
+            errors[source] = result
+    except TimeoutError:
+        errors.setdefault("timeout", {"domain": domain,
+                                      "error": f"Domain lookup timed out after {LOOKUP_TIMEOUT}s"})
+    finally:
+        # Losing lookups are left to finish in the background
+        for future in sources:
+            future.cancel()
+
+    result = errors.get("rdap") or errors.get("whois") or errors["timeout"]
+    if race_whois and not errors.get("whois", {}).get("error_type"):
+        result = {**result, "error_type": "whois_skipped"}
+    return result
+
+
+def cached_lookup_domain(hostname: str) -> dict:
+    """lookup_domain behind the persistent WHOIS cache, keyed on the registrable domain."""
+    domain = registrable_domain(hostname)
+    cache = get_whois_cache()
+
+    result = cache.get(domain)
+    annotate(whois_cache_hit=result is not None)
+    if result is not None:
+        print(colored(f"[CACHE] Domain info hit for {domain}", "blue"))
+        return result
+
+    def lookup():
+        result = lookup_domain(domain)
+        ttl = cache_ttl(result)
+        if ttl > 0:
+            cache.set(domain, result, ttl)
+        return result
+
+    # Concurrent analyses of a domain, in any worker, share one RDAP/WHOIS lookup
+    return single_flight(cache, domain, lookup, lambda: cache.get(domain))
+
 
 # --- Get Domain Info ---
 @tool
@@ -21,37 +230,16 @@ def get_domain_info(url: str) -> str:
     """
     print(colored(50 * "=", "green"))
     start_time = time.time()
-    
-    try:   
-        domain_info = whois.whois(url)
-
-        if not domain_info or not domain_info.creation_date:
-            return json.dumps({"error": f"No domain info found for {url}. This is a red flag."})
-        
-        creation_date = domain_info.creation_date
-        if isinstance(creation_date, list):
-            creation_date = creation_date[0] if creation_date else None
-        
-        expiration_date = domain_info.expiration_date
-        if isinstance(expiration_date, list):
-            expiration_date = expiration_date[0] if expiration_date else None
-        
-        result = {
-            "domain": domain_info.domain_name,
-            "creation_date": str(creation_date) if creation_date else None,
-            "expiration_date": str(expiration_date) if expiration_date else None,
-            "registrar": domain_info.registrar
-        }
-        
+
+    try:
+        result = cached_lookup_domain(to_hostname(url))
+        if result.get("error"):
+            return json.dumps(result)
         return json.dumps(result, indent=2)
-    
-    except UnknownTldError:
-        return json.dumps({"domain": url, 
-                           "error": "Could not check domain for domain, unknown TLD."})
-    
+
     except Exception as e:
-       return json.dumps({"domain": url, 
+       return json.dumps({"domain": url,
                            "error": f"Error getting domain info: {e}"})
-    
+
     finally:
-        print(f"[TIME] Time taken for get_domain_info: {time.time() - start_time} seconds")
\ No newline at end of file
+        print(f"[TIME] Time taken for get_domain_info: {time.time() - start_time} seconds")
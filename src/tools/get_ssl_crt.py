@@ -1,28 +1,54 @@
 import ssl
 import socket
+import asyncio
+import hashlib
+import time
 from urllib.parse import urlparse
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional
 import json
+from langchain_core.tools import tool
+from termcolor import colored
+from tools.cache import shared_cache
+
+CONNECT_TIMEOUT = 5  # seconds
+HANDSHAKE_TIMEOUT = 5
+HOST_RECHECK_TTL = 24 * 3600  # a host may rotate its certificate before notAfter
+ERROR_TTL = 600
+MAX_CONCURRENCY = 20
+
+ISSUER_CLASSES = {
+    "free_dv": ["let's encrypt", "zerossl", "buypass", "ssl.com free"],
+    "cloud_managed": ["google trust services", "amazon", "cloudflare", "microsoft"],
+    "commercial": ["digicert", "sectigo", "comodo", "globalsign", "godaddy", "entrust",
+                   "geotrust", "thawte", "rapidssl", "starfield", "certum", "identrust"],
+}
+
+# hostname -> certificate fingerprint, fingerprint -> parsed certificate (valid until notAfter)
+_host_cache = shared_cache("tls_hosts")
+_cert_cache = shared_cache("tls_certs")
+
+
+def _hostname_port(url: str):
+    parsed = urlparse(url if "://" in url else f"https://{url}")
+    return parsed.hostname, parsed.port or 443
+
 
 def get_ssl_cert(url):
-    parsed = urlparse(url)
-    hostname = parsed.hostname
-    port = parsed.port or 443
-    
+    hostname, port = _hostname_port(url)
+
     context = ssl.create_default_context()
-    with socket.create_connection((hostname, port)) as sock:
+    with socket.create_connection((hostname, port), timeout=CONNECT_TIMEOUT) as sock:
+        sock.settimeout(HANDSHAKE_TIMEOUT)
         with context.wrap_socket(sock, server_hostname=hostname) as ssock:
             return ssock.getpeercert()
 
-def extract_cert_info(url):
-    cert = get_ssl_cert(url)
-
-    # Helper function to safely extract a field
-    def safe_get(dic, key, default=None):
-        return dic.get(key, default) if isinstance(dic, dict) else default
 
+def parse_cert(cert: dict) -> dict:
+    """Flatten a getpeercert() dict into JSON-friendly fields."""
     cert_info = {
         "subject_common_name": None,
+        "subject_organization": None,
         "subject_alt_names": [],
         "issuer": {},
         "valid_from": cert.get("notBefore"),
@@ -33,11 +59,13 @@ def extract_cert_info(url):
         "raw_issuer": cert.get("issuer"),
     }
 
-    # Extract subject common name
+    # Extract subject common name and organization
     for item in cert.get("subject", []):
         for key, value in item:
             if key == "commonName":
                 cert_info["subject_common_name"] = value
+            elif key == "organizationName":
+                cert_info["subject_organization"] = value
 
     # Extract issuer info
     issuer_dict = {}
@@ -47,22 +75,181 @@ def extract_cert_info(url):
     cert_info["issuer"] = issuer_dict
 
     # Extract Subject Alternative Names
-    alt_names = []
-    for typ, name in cert.get("subjectAltName", []):
-        if typ == "DNS":
-            alt_names.append(name)
-    cert_info["subject_alt_names"] = alt_names
-
-    # Convert validity dates to ISO format for JSON
-    fmt = "%b %d %H:%M:%S %Y %Z"
+    cert_info["subject_alt_names"] = [
+        name for typ, name in cert.get("subjectAltName", []) if typ == "DNS"
+    ]
+
+    # cert_time_to_seconds parses the fixed OpenSSL format without strptime
     try:
-        cert_info["valid_from_iso"] = datetime.strptime(cert["notBefore"], fmt).isoformat()
-        cert_info["valid_until_iso"] = datetime.strptime(cert["notAfter"], fmt).isoformat()
-    except Exception:
+        not_before = ssl.cert_time_to_seconds(cert["notBefore"])
+        not_after = ssl.cert_time_to_seconds(cert["notAfter"])
+        cert_info["not_before_ts"] = not_before
+        cert_info["not_after_ts"] = not_after
+        cert_info["valid_from_iso"] = datetime.fromtimestamp(not_before, timezone.utc).isoformat()
+        cert_info["valid_until_iso"] = datetime.fromtimestamp(not_after, timezone.utc).isoformat()
+    except (KeyError, ValueError):
         pass
 
     return cert_info
 
+
+def issuer_class(issuer: dict) -> str:
+    name = " ".join(str(issuer.get(key, "")) for key in ("organizationName", "commonName")).lower()
+    for cls, marks in ISSUER_CLASSES.items():
+        if any(mark in name for mark in marks):
+            return cls
+    return "unknown"
+
+
+def _covers(pattern: str, hostname: str) -> bool:
+    pattern = pattern.lower()
+    if pattern.startswith("*."):
+        return hostname.count(".") == pattern.count(".") and hostname.endswith(pattern[1:])
+    return pattern == hostname
+
+
+def cert_signals(cert_info: dict, hostname: str, now: Optional[float] = None) -> dict:
+    """Derive compact trust signals from a parsed certificate."""
+    now = now or time.time()
+    sans = cert_info.get("subject_alt_names", [])
+    not_before = cert_info.get("not_before_ts")
+    not_after = cert_info.get("not_after_ts")
+
+    return {
+        "cert_age_days": round((now - not_before) / 86400, 1) if not_before else None,
+        "days_to_expiry": round((not_after - now) / 86400, 1) if not_after else None,
+        "validity_days": round((not_after - not_before) / 86400) if not_before and not_after else None,
+        "issuer_org": cert_info["issuer"].get("organizationName"),
+        "issuer_class": issuer_class(cert_info["issuer"]),
+        # DV certificates carry no subject organization
+        "validation": "OV/EV" if cert_info.get("subject_organization") else "DV",
+        "san_count": len(sans),
+        "wildcard": any(name.startswith("*.") for name in sans),
+        "hostname_covered": any(_covers(name, hostname.lower()) for name in sans),
+    }
+
+
+async def probe_tls(hostname: str, port: int = 443) -> dict:
+    """Handshake with a host and return its parsed certificate.
+
+    Connect and handshake are bounded by separate timeouts. Hosts are cached
+    to their certificate fingerprint, and parsed certificates are cached per
+    SHA-256 fingerprint until notAfter, so hosts sharing a certificate
+    (e.g. a platform wildcard) are parsed once.
+    """
+    key = f"{hostname}:{port}"
+    cached = _host_cache.get(key)
+    if cached is not None and "error" in cached:
+        return {"domain": hostname, "https": False, **cached}
+    if cached is not None:
+        cert_info = _cert_cache.get(cached["fingerprint"])
+        if cert_info is not None:
+            return {"domain": hostname, "https": True, **cert_info}
+
+    try:
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(hostname, port), timeout=CONNECT_TIMEOUT
+        )
+    except (asyncio.TimeoutError, OSError) as e:
+        # Unreachable hosts are not cached, the next analysis retries
+        return {"domain": hostname, "https": False, "error": f"TLS connection failed: {e!r}"}
+
+    try:
+        await asyncio.wait_for(
+            writer.start_tls(
+                ssl.create_default_context(), server_hostname=hostname,
+                ssl_handshake_timeout=HANDSHAKE_TIMEOUT,
+            ),
+            timeout=HANDSHAKE_TIMEOUT,
+        )
+        ssl_object = writer.get_extra_info("ssl_object")
+        der = ssl_object.getpeercert(binary_form=True)
+        cert = ssl_object.getpeercert()
+        tls_version = ssl_object.version()
+    except ssl.SSLCertVerificationError as e:
+        error = f"Certificate verification failed: {e.verify_message}"
+        _host_cache.set(key, {"error": error}, ERROR_TTL)
+        return {"domain": hostname, "https": False, "error": error}
+    except (asyncio.TimeoutError, ssl.SSLError, OSError) as e:
+        return {"domain": hostname, "https": False, "error": f"TLS handshake failed: {e!r}"}
+    finally:
+        writer.close()
+
+    fingerprint = hashlib.sha256(der).hexdigest()
+    cert_info = _cert_cache.get(fingerprint)
+    if cert_info is None:
+        cert_info = parse_cert(cert)
+        cert_info["fingerprint_sha256"] = fingerprint
+        cert_info["tls_version"] = tls_version
+        ttl = cert_info.get("not_after_ts", 0) - time.time()
+        if ttl > 0:
+            _cert_cache.set(fingerprint, cert_info, ttl)
+
+    ttl = min(cert_info.get("not_after_ts", 0) - time.time(), HOST_RECHECK_TTL)
+    if ttl > 0:
+        _host_cache.set(key, {"fingerprint": fingerprint}, ttl)
+
+    return {"domain": hostname, "https": True, **cert_info}
+
+
+async def probe_many(urls: Iterable[str], concurrency: int = MAX_CONCURRENCY) -> List[dict]:
+    """Probe a batch of hosts concurrently, at most `concurrency` handshakes at a time."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(url):
+        async with semaphore:
+            return await probe_tls(*_hostname_port(url))
+
+    return await asyncio.gather(*(bounded(url) for url in urls))
+
+
+def extract_cert_info(url):
+    hostname, port = _hostname_port(url)
+    cert_info = asyncio.run(probe_tls(hostname, port))
+    if cert_info.get("https"):
+        cert_info["signals"] = cert_signals(cert_info, hostname)
+    return cert_info
+
+
+@tool
+def get_ssl_info(domain: str) -> str:
+    """
+    Description: Inspects the TLS/SSL certificate served by a domain.
+    Returns whether HTTPS works, the issuer, validity dates and derived signals such as
+    certificate age, issuer class (free DV, cloud-managed, commercial), validation level
+    (DV vs OV/EV) and the number of names sharing the certificate.
+
+    Input: A domain name as a string.
+
+    Output: A JSON string containing certificate signals or an error message.
+    """
+    print(colored(50 * "=", "green"))
+    start_time = time.time()
+
+    try:
+        cert_info = extract_cert_info(domain)
+        if not cert_info.get("https"):
+            return json.dumps(cert_info)
+
+        signals = cert_info["signals"]
+        result = {
+            "domain": cert_info["domain"],
+            "https": True,
+            "subject_common_name": cert_info["subject_common_name"],
+            "subject_organization": cert_info["subject_organization"],
+            "valid_from": cert_info.get("valid_from_iso"),
+            "valid_until": cert_info.get("valid_until_iso"),
+            "tls_version": cert_info.get("tls_version"),
+            **signals,
+        }
+        return json.dumps(result, indent=2)
+
+    except Exception as e:
+        return json.dumps({"domain": domain, "error": f"Error checking SSL certificate: {e}"})
+
+    finally:
+        print(colored(f"[TIME] Time taken for get_ssl_info: {time.time() - start_time} seconds", "blue"))
+
 # Example usage
 if __name__ == "__main__":
     url = "https://google.com"
@@ -0,0 +1,234 @@
+"""Lexical risk prior computed from the domain string alone.
+
+Features (length, digit/hyphen/vowel ratios, character entropy, longest
+consonant run, share of uncommon bigrams, risky TLD, subdomain depth,
+marketing affixes) are extracted for whole arrays of domains at once with
+NumPy, and a small logistic regression turns them into a probability that the
+domain is a scam store. The model is trained offline:
+
+    python -m tools.lexical_prior train [labeled.csv ...]
+
+from data/labeled_domains.csv plus any other "domain,label" CSV files (label
+1 = scam), and the weights are written to data/lexical_model.json together
+with a leave-one-out evaluation and the majority-class base rate. Batch
+scoring:
+
+    python -m tools.lexical_prior score domains.txt > scores.csv
+
+The agent only sees the prior when LEXICAL_PRIOR=true and the shipped model
+is `prior_ready`: evaluated on at least MIN_EVAL_SAMPLES domains with an
+accuracy above the base rate. The seed list is far too small for that, so
+out of the box the score is available to batch tooling only.
+"""
+
+import os
+import sys
+import json
+import numpy as np
+from functools import lru_cache
+from typing import List, Sequence, Tuple
+
+MODEL_PATH = os.getenv(
+    "LEXICAL_MODEL_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "lexical_model.json"),
+)
+LABELED_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "labeled_domains.csv")
+MAX_LABEL_CHARS = 48
+MIN_EVAL_SAMPLES = 1000
+MIN_ACCURACY_GAIN = 0.05  # over the base rate
+
+RISKY_TLDS = {
+    "top", "store", "shop", "xyz", "online", "site", "icu", "buzz", "club", "live", "vip", "bond",
+    "cfd", "sbs", "click", "today", "fun", "monster", "rest", "quest", "cyou", "life", "space",
+}
+AFFIXES = ("us", "usa", "store", "shop", "outlet", "online", "official", "sale", "mall")
+COMMON_BIGRAMS = set(
+    "th he in er an re on at en nd ti es or te of ed is it al ar st to nt ng se ha as ou io le ve co me de hi ri "
+    "ro ic ne ea ra ce li ch ll be ma si om ur ca el ta la ns di fo ho pe ec pr no ct us ac ot il tr ly nc et ut "
+    "ss so rs un lo wa ge ie wh ee wi em ad ol rt po we na ul ni ts mo ow pa im mi ai sh ir su id os iv ia am fi "
+    "ci vi pl ig tu ev ld ry mp fe bl ab gh ty op wo sa ay ex ke fr oo av ag if ap gr od bo sp rd do uc bu ei ov "
+    "by rm ep tt oc fa ef cu rn sc gi da yo cr cl du ga qu ue ff ba ey ls va um pp ua up lu go ht ru ug ds lt pi "
+    "rc rr eg au ck ew mu br bi pt ak pu ui rg ib tl ny ki rk ys ob mm fu ph og ms ye ud mb ip ub oi rl gu dr hr "
+    "cc tw ft wn nu af hu nn eo vo rv nf xp gn sm fl iz ok nl my gl aw ju oa eq sy sl ps jo lf nv je nk kn gs dy "
+    "hy ze ks xt bs ik dd cy rp sk xi oe oy ws lv dl rf eu dg wr xa yi nm eb rb tm xc eh tc gy ja hn yp za gg ym "
+    "sw bj lm cs ii ix xe oh lk dv lp ax ox uf dm iu sf bt ka yt ek pm ya gt wl rh yl hs ah yc yn rw hm lw hl ae "
+    "zi az lc py aj iq nj bb nh uo kl lb wy".split()
+)
+FEATURE_NAMES = [
+    "label_length", "digit_ratio", "hyphen_ratio", "vowel_ratio", "char_entropy", "max_consonant_run",
+    "uncommon_bigram_ratio", "risky_tld", "subdomain_depth", "marketing_affix",
+]
+
+_ALPHABET = "abcdefghijklmnopqrstuvwxyz0123456789-"
+_CODES = np.full(256, len(_ALPHABET), dtype=np.int64)
+for _i, _char in enumerate(_ALPHABET):
+    _CODES[ord(_char)] = _i
+_PAD = len(_ALPHABET) + 1
+_VOWELS = np.zeros(_PAD + 1, dtype=bool)
+_VOWELS[[_ALPHABET.index(v) for v in "aeiouy"]] = True
+_CONSONANTS = np.zeros(_PAD + 1, dtype=bool)
+_CONSONANTS[[_ALPHABET.index(c) for c in "bcdfghjklmnpqrstvwxz"]] = True
+_DIGITS = np.zeros(_PAD + 1, dtype=bool)
+_DIGITS[[_ALPHABET.index(d) for d in "0123456789"]] = True
+_COMMON = np.zeros((_PAD + 1) * (_PAD + 1), dtype=bool)
+for _bigram in COMMON_BIGRAMS:
+    _COMMON[_ALPHABET.index(_bigram[0]) * (_PAD + 1) + _ALPHABET.index(_bigram[1])] = True
+
+
+def split_domain(domain: str) -> Tuple[str, str, int]:
+    """(main label, tld, subdomain depth); e.g. silverdz.youcan.store -> (youcan, store, 1)."""
+    domain = domain.strip().lower().split("://", 1)[-1].split("/", 1)[0].rstrip(".")
+    labels = [label for label in domain.split(".") if label]
+    if labels and labels[0] == "www":
+        labels = labels[1:]
+    if len(labels) < 2:
+        return (labels[0] if labels else ""), "", 0
+    # Two-letter second-level suffixes such as co.uk / com.au
+    if len(labels) >= 3 and len(labels[-1]) == 2 and labels[-2] in {"co", "com", "net", "org", "ac", "gov"}:
+        return labels[-3], labels[-1], len(labels) - 3
+    return labels[-2], labels[-1], len(labels) - 2
+
+
+def extract_features(domains: Sequence[str]) -> np.ndarray:
+    """Feature matrix of shape (len(domains), len(FEATURE_NAMES))."""
+    parts = [split_domain(domain) for domain in domains]
+    n = len(parts)
+    labels = [label[:MAX_LABEL_CHARS] for label, _, _ in parts]
+    lengths = np.array([len(label) for label in labels], dtype=np.float64)
+    safe_lengths = np.maximum(lengths, 1)
+
+    # Characters as a padded code matrix, one row per domain
+    raw = np.frombuffer("".join(label.ljust(MAX_LABEL_CHARS, "\0") for label in labels).encode("latin-1", "replace"),
+                        dtype=np.uint8).reshape(n, MAX_LABEL_CHARS)
+    codes = np.where(raw == 0, _PAD, _CODES[raw])
+    valid = codes != _PAD
+
+    digit_ratio = _DIGITS[codes].sum(axis=1) / safe_lengths
+    hyphen_ratio = (codes == _ALPHABET.index("-")).sum(axis=1) / safe_lengths
+    vowel_ratio = _VOWELS[codes].sum(axis=1) / safe_lengths
+
+    counts = np.zeros((n, _PAD + 1))
+    np.add.at(counts, (np.repeat(np.arange(n), MAX_LABEL_CHARS), codes.ravel()), 1)
+    probabilities = counts[:, :_PAD] / safe_lengths[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        entropy = -np.nansum(np.where(probabilities > 0, probabilities * np.log2(probabilities), 0), axis=1)
+
+    # Longest consonant run: distance to the last non-consonant position
+    consonant = _CONSONANTS[codes]
+    positions = np.arange(MAX_LABEL_CHARS)
+    last_break = np.maximum.accumulate(np.where(consonant, -1, positions), axis=1)
+    max_run = (positions - last_break).max(axis=1) * (lengths > 0)
+
+    bigrams = codes[:, :-1] * (_PAD + 1) + codes[:, 1:]
+    bigram_valid = valid[:, :-1] & valid[:, 1:]
+    uncommon = (~_COMMON[bigrams] & bigram_valid).sum(axis=1) / np.maximum(bigram_valid.sum(axis=1), 1)
+
+    risky_tld = np.array([tld in RISKY_TLDS for _, tld, _ in parts], dtype=np.float64)
+    depth = np.array([d for _, _, d in parts], dtype=np.float64)
+    affix = np.array([
+        any(label.replace("-", "").endswith(a) and len(label) > len(a) + 3 for a in AFFIXES) for label in labels
+    ], dtype=np.float64)
+
+    return np.column_stack([
+        lengths, digit_ratio, hyphen_ratio, vowel_ratio, entropy, max_run, uncommon, risky_tld, depth, affix,
+    ])
+
+
+def train_logistic(X: np.ndarray, y: np.ndarray, l2: float = 1.0, epochs: int = 2000,
+                   learning_rate: float = 0.1) -> dict:
+    """Fit a standardized, L2-regularized logistic regression with batch gradient descent."""
+    mean, std = X.mean(axis=0), X.std(axis=0)
+    std[std == 0] = 1
+    Z = (X - mean) / std
+    weights, bias = np.zeros(X.shape[1]), 0.0
+    for _ in range(epochs):
+        p = 1 / (1 + np.exp(-(Z @ weights + bias)))
+        weights -= learning_rate * (Z.T @ (p - y) / len(y) + l2 * weights / len(y))
+        bias -= learning_rate * float(np.mean(p - y))
+    return {
+        "features": FEATURE_NAMES,
+        "mean": mean.tolist(),
+        "std": std.tolist(),
+        "weights": weights.tolist(),
+        "bias": bias,
+    }
+
+
+def predict(model: dict, X: np.ndarray) -> np.ndarray:
+    Z = (X - np.array(model["mean"])) / np.array(model["std"])
+    return 1 / (1 + np.exp(-(Z @ np.array(model["weights"]) + model["bias"])))
+
+
+@lru_cache(maxsize=1)
+def load_model(path: str = MODEL_PATH) -> dict:
+    with open(path, "r", encoding="UTF-8") as file:
+        return json.load(file)
+
+
+def score_domains(domains: Sequence[str], model: dict = None) -> np.ndarray:
+    """Scam probability for every domain, computed in one vectorized pass."""
+    if not len(domains):
+        return np.zeros(0)
+    return predict(model or load_model(), extract_features(domains))
+
+
+def lexical_prior(domain: str, model: dict = None) -> dict:
+    """Prior score for one domain with the features that pushed it up the most."""
+    model = model or load_model()
+    features = extract_features([domain])[0]
+    contributions = (features - np.array(model["mean"])) / np.array(model["std"]) * np.array(model["weights"])
+    drivers = [FEATURE_NAMES[i] for i in np.argsort(-contributions)[:3] if contributions[i] > 0]
+    return {
+        "score": round(float(predict(model, features[None, :])[0]), 3),
+        "drivers": drivers,
+        "features": {name: round(float(value), 3) for name, value in zip(FEATURE_NAMES, features)},
+    }
+
+
+def evaluate(domains: List[str], labels: np.ndarray, **train_args) -> dict:
+    """Leave-one-out accuracy of the model on the labeled domains."""
+    X = extract_features(domains)
+    correct = 0
+    for i in range(len(domains)):
+        mask = np.arange(len(domains)) != i
+        model = train_logistic(X[mask], labels[mask], **train_args)
+        correct += int((predict(model, X[i:i + 1])[0] >= 0.5) == labels[i])
+    base_rate = max(float(labels.mean()), 1 - float(labels.mean())) if len(labels) else 0.0
+    return {"samples": len(domains), "loo_accuracy": round(correct / len(domains), 3), "base_rate": round(base_rate, 3)}
+
+
+def prior_ready(model: dict) -> bool:
+    """Whether the model's evaluation is large enough and beats always guessing the majority class."""
+    evaluation = model.get("evaluation") or {}
+    return (evaluation.get("samples", 0) >= MIN_EVAL_SAMPLES
+            and evaluation.get("loo_accuracy", 0) >= evaluation.get("base_rate", 1) + MIN_ACCURACY_GAIN)
+
+
+def load_labeled(paths: Sequence[str]) -> Tuple[List[str], np.ndarray]:
+    domains, labels = [], []
+    for path in [LABELED_PATH, *paths]:
+        with open(path, "r", encoding="UTF-8") as file:
+            for line in file:
+                domain, _, label = line.strip().rpartition(",")
+                if domain and label.strip() in ("0", "1"):
+                    domains.append(domain)
+                    labels.append(int(label))
+    return domains, np.array(labels, dtype=np.float64)
+
+
+if __name__ == "__main__":
+    command, args = (sys.argv[1], sys.argv[2:]) if len(sys.argv) > 1 else ("train", [])
+
+    if command == "train":
+        domains, labels = load_labeled(args)
+        model = train_logistic(extract_features(domains), labels)
+        model["evaluation"] = evaluate(domains, labels)
+        with open(MODEL_PATH, "w", encoding="UTF-8") as file:
+            json.dump(model, file, indent=2)
+        print(f"Trained on {len(domains)} domains: {model['evaluation']} -> {MODEL_PATH}")
+
+    elif command == "score":
+        with open(args[0], "r", encoding="UTF-8") as file:
+            domains = [line.strip().rsplit(",", 1)[-1] for line in file if line.strip()]
+        for domain, score in zip(domains, score_domains(domains)):
+            print(f"{domain},{score:.4f}")
@@ -0,0 +1,153 @@
+"""Minimal RDAP (RFC 9083) client used by get_domain_info.
+
+RDAP replaces port-43 WHOIS with structured JSON over HTTPS. The registry
+for a TLD is found through the IANA bootstrap file, which is kept as a
+local cached copy and only re-downloaded when it gets old.
+"""
+
+import os
+import json
+import time
+import requests
+from typing import Dict, Optional
+from dateutil import parser
+from requests.adapters import HTTPAdapter
+from termcolor import colored
+from tools.cache import CACHE_DIR
+
+IANA_BOOTSTRAP_URL = os.getenv("RDAP_BOOTSTRAP_URL", "https://data.iana.org/rdap/dns.json")
+BOOTSTRAP_PATH = os.path.join(CACHE_DIR, "rdap_dns.json")
+BOOTSTRAP_MAX_AGE = 7 * 24 * 3600  # seconds
+CONNECT_TIMEOUT = 3
+READ_TIMEOUT = 8
+
+# Pooled HTTPS connections shared by every lookup in the process
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=16))
+_session.headers.update({"Accept": "application/rdap+json, application/json"})
+
+_bootstrap = {"mtime": None, "services": {}}
+
+
+def parse_bootstrap(data: dict) -> Dict[str, str]:
+    """Flatten the IANA bootstrap 'services' list into a {tld: base_url} map."""
+    services = {}
+    for entry in data.get("services", []):
+        if len(entry) < 2 or not entry[1]:
+            continue
+        tlds, urls = entry[0], entry[1]
+        # Prefer https endpoints when a registry lists several
+        base_url = next((u for u in urls if u.startswith("https://")), urls[0])
+        if not base_url.endswith("/"):
+            base_url += "/"
+        for tld in tlds:
+            services[tld.lower()] = base_url
+    return services
+
+
+def refresh_bootstrap(path: str = BOOTSTRAP_PATH) -> None:
+    """Download the IANA bootstrap file into the local cache."""
+    response = _session.get(IANA_BOOTSTRAP_URL, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+    response.raise_for_status()
+    data = response.json()
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="UTF-8") as file:
+        json.dump(data, file)
+    os.replace(tmp_path, path)
+
+
+def load_bootstrap(path: str = BOOTSTRAP_PATH) -> Dict[str, str]:
+    """Return the {tld: base_url} map, refreshing the cached copy when it is stale.
+
+    A stale copy is still used if the refresh fails, so an IANA outage never
+    blocks lookups once the file has been fetched at least once.
+    """
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    if mtime is None or time.time() - mtime > BOOTSTRAP_MAX_AGE:
+        try:
+            refresh_bootstrap(path)
+            mtime = os.path.getmtime(path)
+        except Exception as e:
+            print(colored(f"[WARN] Could not refresh RDAP bootstrap: {e}", "yellow"))
+            if mtime is None:
+                return {}
+
+    if _bootstrap["mtime"] != mtime:
+        with open(path, "r", encoding="UTF-8") as file:
+            _bootstrap["services"] = parse_bootstrap(json.load(file))
+        _bootstrap["mtime"] = mtime
+
+    return _bootstrap["services"]
+
+
+def _vcard_name(entity: dict) -> Optional[str]:
+    vcard = entity.get("vcardArray")
+    if not isinstance(vcard, list) or len(vcard) < 2:
+        return None
+    for field in vcard[1]:
+        if len(field) >= 4 and field[0] in ("fn", "org") and field[3]:
+            return field[3]
+    return None
+
+
+def _format_date(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    try:
+        # Match the str(datetime) format python-whois results are rendered with
+        return str(parser.isoparse(value))
+    except ValueError:
+        return value
+
+
+def parse_rdap_domain(data: dict) -> dict:
+    """Project an RDAP domain object onto the get_domain_info output fields."""
+    events = {
+        event.get("eventAction"): event.get("eventDate")
+        for event in data.get("events", [])
+    }
+
+    registrar = None
+    for entity in data.get("entities", []):
+        if "registrar" in entity.get("roles", []):
+            registrar = _vcard_name(entity) or entity.get("handle")
+            break
+
+    domain = data.get("ldhName") or data.get("unicodeName")
+    return {
+        "domain": domain.lower() if domain else None,
+        "creation_date": _format_date(events.get("registration")),
+        "expiration_date": _format_date(events.get("expiration")),
+        "registrar": registrar,
+    }
+
+
+def rdap_lookup(domain: str) -> dict:
+    """Look up a domain over RDAP.
+
+    Returns the parsed fields, or a dict with an 'error' key when the TLD has
+    no RDAP service or the registry has no record for the domain.
+    """
+    domain = domain.strip().rstrip(".").lower()
+    tld = domain.rsplit(".", 1)[-1]
+
+    services = load_bootstrap()
+    if not services:
+        raise RuntimeError("RDAP bootstrap registry is unavailable")
+
+    base_url = services.get(tld)
+    if base_url is None:
+        return {"domain": domain, "error": f"No RDAP service for .{tld}",
+                "error_type": "unknown_tld"}
+
+    response = _session.get(
+        f"{base_url}domain/{domain}", timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
+    )
+    if response.status_code == 404:
+        return {"domain": domain, "error": f"No RDAP record found for {domain}",
+                "error_type": "no_record"}
+    response.raise_for_status()
+
+    return parse_rdap_domain(response.json())
@@ -1,5 +1,6 @@
 import re
 # from __future__ import annotations
+import os
 import argparse
 import time
 import json
@@ -8,6 +9,7 @@ from typing import List, Optional
 from requests_html import HTMLSession
 import requests
 from urllib.parse import urljoin
+from tracing import annotate
 from bs4 import BeautifulSoup
 from playwright.sync_api import sync_playwright
 import undetected_chromedriver as uc
@@ -417,13 +419,16 @@ def extract_panels(soup: BeautifulSoup) -> dict:
 import re
 
 
+SCAM_DETECTOR_URL = os.getenv("SCAM_DETECTOR_URL", "https://www.scam-detector.com/validator/")
+
+
 def url_to_review_slug(domain: str) -> str:
 
     # Replace dots with hyphens
     slug = domain.replace(".", "-")
 
     # Add "-review"
-    return f"https://www.scam-detector.com/validator/{slug}-review"
+    return f"{SCAM_DETECTOR_URL}{slug}-review"
 
 
 def scrape_url_info(url: str, mode: str = "requests") -> dict:
@@ -443,6 +448,7 @@ def scrape_url_info(url: str, mode: str = "requests") -> dict:
     print(f"[INFO] Converted URL to review slug: {url}")
 
     url = url_to_review_slug(url)
+    annotate(fetch_mode=mode)
 
     if mode == "requests":
         html = fetch_requests(url)
@@ -1,11 +1,13 @@
 # core imports (your existing environment)
 import os
 import json
+import asyncio
 from dotenv import load_dotenv
 from langchain_tavily import TavilySearch, TavilyExtract
 from langchain_openai import ChatOpenAI
 from langchain.chat_models import init_chat_model
 from langchain_core.prompts import PromptTemplate
+from tools.dedup import dedupe_snippets
 # from langchain.agents import create_openai_tools_agent, AgentExecutor
 
 load_dotenv("../../.env")
@@ -16,6 +18,9 @@ TEMPERATURE = 0
 MAX_RESULTS = 8
 MAX_EXTRACTS = 10
 MAX_CONTENT_CHARS = 4000
+MAX_CONCURRENT_CALLS = 6
+CALLS_PER_SECOND = 10
+EXTRACT_BATCH_SIZE = 20  # TavilyExtract accepts up to 20 urls per call
 
 
 # init LLM
@@ -67,46 +72,132 @@ def build_queries(domain):
     return base + platforms
 
 
+def query_platform(query):
+    """Tag a query with the platform it targets ('web' for untargeted queries)."""
+    if query.startswith("site:"):
+        return query.split()[0][len("site:"):].split(".")[0]
+    return "web"
+
+
+class RateLimiter:
+    """Caps concurrent calls and spaces out call starts to stay under the API rate limit."""
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT_CALLS, per_second=CALLS_PER_SECOND):
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._interval = 1.0 / per_second
+        self._lock = asyncio.Lock()
+        self._next_start = 0.0
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        try:
+            async with self._lock:
+                loop = asyncio.get_running_loop()
+                delay = self._next_start - loop.time()
+                self._next_start = max(self._next_start, loop.time()) + self._interval
+            if delay > 0:
+                await asyncio.sleep(delay)
+        except BaseException:
+            # Cancelled before the body ran, so __aexit__ never will
+            self._semaphore.release()
+            raise
+
+    async def __aexit__(self, *exc):
+        self._semaphore.release()
+
+
+async def _search(query, limiter):
+    async with limiter:
+        try:
+            res = await search_tool.ainvoke({"query": query})  # returns structured results depending on SDK
+            # store results (title, snippet, url, domain, platform tag)
+            return {"query": query, "platform": query_platform(query), "raw": res}
+        except Exception as e:
+            print(f"Error running search for query '{query}': {e}")
+            return {"query": query, "platform": query_platform(query), "raw": {}, "error": str(e)}
+
+
+async def stream_searches(domain, limiter=None):
+    """Run every platform query concurrently and yield each result as it completes."""
+    limiter = limiter or RateLimiter()
+    tasks = [asyncio.create_task(_search(q, limiter)) for q in build_queries(domain)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
 # run searches across mltiple queries and collect results
 def run_searches(domain):
-    queries = build_queries(domain)
-    results = []
-    for q in queries:
+    async def collect():
+        return [result async for result in stream_searches(domain)]
+
+    return asyncio.run(collect())
+
+
+def collect_urls(search_results):
+    """Unique result URLs across all queries, in first-seen order."""
+    urls = []
+    seen = set()
+    for result in search_results:
+        raw = result.get("raw")
+        if not isinstance(raw, dict):
+            continue
+        for entry in raw.get("results", []):
+            url = entry.get("url")
+            if url and url not in seen:
+                seen.add(url)
+                urls.append(url)
+    return urls
+
+
+async def _extract_batch(batch, limiter):
+    async with limiter:
         try:
-            res = search_tool.invoke({"query": q})  # returns structured results depending on SDK
-            # store results (title, snippet, url, domain, platform tag)
-            # structure depends on Tavily SDK return format
-            results.append({"query": q, "raw": res})
+            res = await extract_tool.ainvoke({"urls": batch})
         except Exception as e:
-            print(f"Error running search for query '{q}': {e}")
+            print(f"Extraction error for batch of {len(batch)} urls: {e}")
+            return []
+    contents = {item.get("url"): item.get("raw_content") for item in res.get("results", [])}
+    return [{"url": url, "content": contents[url]} for url in batch if url in contents]
 
-        break
-    return results
+
+async def extract_urls_async(urls, limiter=None):
+    """Extract up to MAX_EXTRACTS urls in as few TavilyExtract calls as possible."""
+    limiter = limiter or RateLimiter()
+    urls = list(dict.fromkeys(urls))[:MAX_EXTRACTS]
+    batches = [urls[i:i + EXTRACT_BATCH_SIZE] for i in range(0, len(urls), EXTRACT_BATCH_SIZE)]
+    results = await asyncio.gather(*(_extract_batch(batch, limiter) for batch in batches))
+    return [item for batch in results for item in batch]
 
 
 def extract_urls(urls):
     """Extract content from each URL using TavilyExtract."""
-    extracted = []
-    for url in urls[:MAX_EXTRACTS]:
-        try:
-            res = extract_tool.invoke({"urls": [url]})
-            extracted.append({"url": url, "content": res})
-        except Exception as e:
-            print(f"Extraction error for {url}: {e}")
-    return extracted
+    return asyncio.run(extract_urls_async(urls))
 
 
-# Load markdown prompt
-prompt_path = os.path.join(os.path.dirname(__file__), '../prompts/extract_prompt.md')
+async def stream_evidence(domain):
+    """Multi-source evidence pipeline.
 
-with open(prompt_path, 'r') as f:
-    prompt_template = f.read()
+    Yields {"type": "search", ...} events per query as searches complete
+    (URLs deduplicated across queries), then one {"type": "extract", ...}
+    event carrying the batched extractions of every new URL, with
+    near-duplicate pages collapsed.
+    """
+    limiter = RateLimiter()
+    seen = set()
+    urls = []
+    async for result in stream_searches(domain, limiter):
+        new_urls = [url for url in collect_urls([result]) if url not in seen]
+        seen.update(new_urls)
+        urls.extend(new_urls)
+        yield {"type": "search", "new_urls": new_urls, **result}
+
+    extracted = await extract_urls_async(urls, limiter)
+    yield {"type": "extract", "extracted": dedupe_snippets(extracted, text_key="content")}
 
-# Define PromptTemplate (still dynamic)
-prompt = PromptTemplate(
-    input_variables=["domain", "search_results", "extracted_contents"],
-    template=prompt_template,
-)
 
 # Create agent with the prompt template (not formatted yet)
 # agent = create_openai_tools_agent(llm, tools, prompt, verbose=True)
@@ -114,23 +205,29 @@ prompt = PromptTemplate(
 
 # Execute search and extraction
 if __name__ == "__main__":
+    # Load markdown prompt
+    prompt_path = os.path.join(os.path.dirname(__file__), '../prompts/extract_prompt.md')
+
+    with open(prompt_path, 'r') as f:
+        prompt_template = f.read()
+
+    # Define PromptTemplate (still dynamic)
+    prompt = PromptTemplate(
+        input_variables=["domain", "search_results", "extracted_contents"],
+        template=prompt_template,
+    )
+
     domain = "silverdz.youcan.store"
     search_results = run_searches(domain)
 
     # Collect URLs from search results for extraction
-    urls_to_extract = []
     for result in search_results:
         print(result)
-        if isinstance(result.get("raw"), dict):
-            for entry in result.get("raw", {}).get("results", []):
-                if "url" in entry:
-                    urls_to_extract.append(entry.get("url"))
-    
-    
-    urls = list(set(urls_to_extract))  # deduplicate
+
+    urls = collect_urls(search_results)  # deduplicate
     print(f"Extracting content from {len(urls)} unique URLs...")
 
-    extracted_contents = extract_urls(urls)
+    extracted_contents = dedupe_snippets(extract_urls(urls), text_key="content")
 
     # Run agent with collected data
     search_results_formatted = [
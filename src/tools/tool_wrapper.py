@@ -0,0 +1,46 @@
+"""One way to layer behaviour around an agent tool.
+
+`wrap_tool` returns a tool with the same name, description and argument
+schema as the one it wraps, so the agent sees no difference. `before` may
+answer a call without running the wrapped tool (a fresh stored signal);
+`after` sees, and may replace, the output on its way out (recording it,
+compacting it, measuring it). Wrappers stack: the last one applied is the
+outermost, and its `after` sees the output every inner layer produced.
+"""
+
+from typing import Any, Callable, Optional
+from langchain_core.tools import BaseTool, StructuredTool, tool
+
+
+def as_tool(base) -> BaseTool:
+    """A tool for a tool or a plain function."""
+    return base if isinstance(base, BaseTool) else tool(base)
+
+
+def wrap_tool(
+    base,
+    before: Optional[Callable[[dict], Optional[Any]]] = None,
+    after: Optional[Callable[[Any], Any]] = None,
+) -> BaseTool:
+    """Wrap a tool (or plain function) with optional `before` and `after` hooks.
+
+    `before(kwargs)` returning anything but None is the call's output, and the
+    wrapped tool and `after` are skipped. Otherwise the wrapped tool runs and
+    `after(output)` returns what the caller gets.
+    """
+    base_tool = as_tool(base)
+
+    def run(**kwargs):
+        if before is not None:
+            output = before(kwargs)
+            if output is not None:
+                return output
+        output = base_tool.invoke(kwargs)
+        return output if after is None else after(output)
+
+    return StructuredTool.from_function(
+        func=run,
+        name=base_tool.name,
+        description=base_tool.description,
+        args_schema=base_tool.args_schema,
+    )
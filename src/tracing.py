@@ -0,0 +1,363 @@
+"""Lightweight request tracing.
+
+Spans cover the API handler, every agent step (LangGraph node), tool call,
+LLM call and upstream HTTP/WHOIS request, linked parent to child through a
+context variable that also follows work handed to thread pools (see
+`in_context`). Finished traces are kept in an in-memory ring buffer for the
+/debug/traces endpoints (admin only, see profiler.is_admin) and appended to
+an OTLP/JSON lines file:
+
+    GET /debug/traces                       recent traces, slowest first
+    GET /debug/traces/{trace_id}            the trace as OTLP/JSON
+    GET /debug/traces/{trace_id}/waterfall  a text waterfall of one request
+
+Every /validate_url response carries its trace id in the X-Trace-ID header.
+"""
+
+import os
+import json
+import time
+import secrets
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+from tools.cache import CACHE_DIR
+
+TRACING_ENABLED = os.getenv("TRACING", "1").lower() not in ("0", "false", "no")
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "200"))
+# OTLP/JSON lines file, one finished trace per line; empty disables the export
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", os.path.join(CACHE_DIR, "traces.otlp.jsonl"))
+TRACE_EXPORT_MAX_BYTES = 50 * 1024 * 1024
+SERVICE_NAME = "rulegit"
+
+_current: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+_traces: "OrderedDict[str, List[Span]]" = OrderedDict()
+_traces_lock = threading.Lock()
+
+
+class Span:
+    """One timed operation inside a trace."""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, **attributes):
+        self.trace_id = parent.trace_id if parent is not None else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = {"thread": threading.current_thread().name, **attributes}
+        self.error = None
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def set(self, **attributes) -> "Span":
+        self.attributes.update(attributes)
+        return self
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        _finish(self)
+
+
+def _finish(span: Span) -> None:
+    with _traces_lock:
+        spans = _traces.setdefault(span.trace_id, [])
+        spans.append(span)
+        _traces.move_to_end(span.trace_id)
+        while len(_traces) > TRACE_BUFFER_SIZE:
+            _traces.popitem(last=False)
+    if span.parent_id is None and TRACE_EXPORT_PATH:
+        try:
+            export_trace(span.trace_id, TRACE_EXPORT_PATH)
+        except OSError as e:
+            print(f"[TRACE] Export failed: {e}")
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def annotate(**attributes) -> None:
+    """Add attributes to the current span, if any (cache hits, fetch mode, sizes)."""
+    span = _current.get()
+    if span is not None:
+        span.set(**attributes)
+
+
+@contextmanager
+def span(name: str, require_trace: bool = False, new_trace: bool = False, **attributes):
+    """Run a block as a span, child of the current one.
+
+    With require_trace nothing is recorded unless a trace is already active, so
+    library code (tools, HTTP calls) only traces inside a traced request;
+    new_trace starts a separate trace (background work outliving its request).
+    """
+    if not TRACING_ENABLED or (require_trace and _current.get() is None):
+        yield None
+        return
+    current = Span(name, None if new_trace else _current.get(), **attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.end(e)
+        raise
+    finally:
+        _current.reset(token)
+        current.end()
+
+
+def traced(name: Optional[str] = None, require_trace: bool = True):
+    """Decorator form of `span`."""
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name or func.__name__, require_trace=require_trace):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def in_context(func: Callable, name: Optional[str] = None, **attributes) -> Callable:
+    """Bind `func` to the caller's trace context so it can be handed to a thread pool.
+
+    With a name, the call runs in its own span carrying queue_ms, the time it
+    waited for a worker thread.
+    """
+    context = copy_context()
+    submitted = time.time_ns()
+
+    def run(*args, **kwargs):
+        if name is None:
+            return context.run(func, *args, **kwargs)
+
+        def call():
+            with span(name, require_trace=True, queue_ms=round((time.time_ns() - submitted) / 1e6, 1), **attributes):
+                return func(*args, **kwargs)
+
+        return context.run(call)
+
+    return run
+
+
+# --- Agent steps, LLM calls and tool calls through LangChain callbacks ---
+
+class TraceCallbackHandler(BaseCallbackHandler):
+    """Opens spans for LangGraph nodes, chat model calls and tool calls of a traced request."""
+
+    def __init__(self):
+        self._runs: Dict[UUID, tuple] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, name: str, **attributes) -> None:
+        parent = _current.get()
+        if parent is None:
+            return
+        started = Span(name, parent, **attributes)
+        with self._lock:
+            self._runs[run_id] = (started, parent)
+        # Callbacks run in the context the step/tool body is then copied from
+        _current.set(started)
+
+    def _end(self, run_id: UUID, error: Optional[BaseException] = None, **attributes) -> None:
+        with self._lock:
+            entry = self._runs.pop(run_id, None)
+        if entry is None:
+            return
+        ended, parent = entry
+        ended.set(**attributes).end(error)
+        if _current.get() is ended:
+            _current.set(parent)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs) -> None:
+        node = (metadata or {}).get("langgraph_node")
+        if node and kwargs.get("name") == node:
+            self._start(run_id, f"agent.step {node}", step=metadata.get("langgraph_step"))
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs) -> None:
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs) -> None:
+        self._end(run_id, error)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, invocation_params=None, **kwargs) -> None:
+        params = invocation_params or {}
+        model = params.get("model") or params.get("model_name") or (serialized or {}).get("name", "chat_model")
+        self._start(run_id, f"llm {model}", model=model, input_messages=sum(len(batch) for batch in messages))
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        attributes = {}
+        try:
+            message = response.generations[0][0].message
+            usage = getattr(message, "usage_metadata", None) or {}
+            attributes = {
+                "input_tokens": usage.get("input_tokens"),
+                "output_tokens": usage.get("output_tokens"),
+                "cached_tokens": (usage.get("input_token_details") or {}).get("cache_read"),
+                "provider": message.response_metadata.get("llm_provider"),
+                "tool_calls": len(getattr(message, "tool_calls", None) or []),
+            }
+        except (IndexError, AttributeError):
+            pass
+        self._end(run_id, **{key: value for key, value in attributes.items() if value is not None})
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        self._end(run_id, error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name", "tool")
+        self._start(run_id, f"tool {name}", tool=name, input_bytes=len(str(input_str).encode()))
+
+    def on_tool_end(self, output, *, run_id, **kwargs) -> None:
+        content = getattr(output, "content", output)
+        self._end(run_id, output_bytes=len(str(content).encode()))
+
+    def on_tool_error(self, error, *, run_id, **kwargs) -> None:
+        self._end(run_id, error)
+
+
+_callback_handler: ContextVar[Optional[TraceCallbackHandler]] = ContextVar(
+    "trace_callback_handler", default=TraceCallbackHandler() if TRACING_ENABLED else None
+)
+# Every LangChain/LangGraph run picks the handler up without threading it through configs
+register_configure_hook(_callback_handler, inheritable=True)
+
+
+# --- Upstream HTTP calls ---
+
+_requests_instrumented = False
+
+
+def instrument_requests() -> None:
+    """Trace every `requests` call (Diffbot, Tavily, RDAP, scam-detector scraping)."""
+    global _requests_instrumented
+    if _requests_instrumented or not TRACING_ENABLED:
+        return
+    import requests
+    from urllib.parse import urlsplit
+
+    send = requests.Session.send
+
+    def traced_send(session, request, **kwargs):
+        with span(f"http {request.method} {urlsplit(request.url).hostname}", require_trace=True,
+                  method=request.method, url=request.url.split("?", 1)[0]) as current:
+            response = send(session, request, **kwargs)
+            if current is not None:
+                current.set(status_code=response.status_code)
+                # Reading .content would drain a streamed body; unstreamed ones are already read
+                size = response.headers.get("Content-Length")
+                if size is not None and size.isdigit():
+                    current.set(response_bytes=int(size))
+                elif not kwargs.get("stream"):
+                    current.set(response_bytes=len(response.content))
+            return response
+
+    requests.Session.send = traced_send
+    _requests_instrumented = True
+
+
+# --- Reading and exporting traces ---
+
+def get_trace(trace_id: str) -> List[Span]:
+    with _traces_lock:
+        return sorted(_traces.get(trace_id, []), key=lambda item: item.start_ns)
+
+
+def recent_traces(limit: int = 50) -> List[dict]:
+    """Finished root spans, slowest first."""
+    with _traces_lock:
+        roots = [item for spans in _traces.values() for item in spans if item.parent_id is None]
+    roots.sort(key=lambda item: -item.duration_ms)
+    return [
+        {"trace_id": item.trace_id, "name": item.name, "duration_ms": round(item.duration_ms, 1),
+         "start": item.start_ns // 1_000_000_000, "error": item.error, **item.attributes}
+        for item in roots[:limit]
+    ]
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans: List[Span]) -> dict:
+    """Spans in the OTLP/JSON trace format (what an OTLP collector's file exporter writes)."""
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+        "scopeSpans": [{
+            "scope": {"name": "rulegit.tracing"},
+            "spans": [{
+                "traceId": item.trace_id,
+                "spanId": item.span_id,
+                "parentSpanId": item.parent_id or "",
+                "name": item.name,
+                "kind": 2 if item.parent_id is None else 1,
+                "startTimeUnixNano": str(item.start_ns),
+                "endTimeUnixNano": str(item.end_ns or time.time_ns()),
+                "attributes": [
+                    {"key": key, "value": _otlp_value(value)}
+                    for key, value in item.attributes.items() if value is not None
+                ],
+                "status": {"code": 2, "message": item.error} if item.error else {"code": 1},
+            } for item in spans],
+        }],
+    }]}
+
+
+def export_trace(trace_id: str, path: str) -> None:
+    """Append one trace to an OTLP/JSON lines file, rotating it once it is large."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if os.path.exists(path) and os.path.getsize(path) > TRACE_EXPORT_MAX_BYTES:
+        os.replace(path, path + ".1")
+    with open(path, "a", encoding="UTF-8") as file:
+        file.write(json.dumps(to_otlp(get_trace(trace_id)), separators=(",", ":")) + "\n")
+
+
+def render_waterfall(trace_id: str, width: int = 60) -> str:
+    """Text waterfall of one trace: offset, duration and a bar per span, indented by depth."""
+    spans = get_trace(trace_id)
+    if not spans:
+        return f"No trace {trace_id}"
+    start = min(item.start_ns for item in spans)
+    total = max((item.end_ns or time.time_ns()) for item in spans) - start or 1
+    by_id = {item.span_id: item for item in spans}
+
+    def depth(item: Span) -> int:
+        level = 0
+        while item.parent_id in by_id:
+            item, level = by_id[item.parent_id], level + 1
+        return level
+
+    skip = {"thread"}
+    lines = [f"trace {trace_id}  {total / 1e6:.1f} ms  {len(spans)} spans"]
+    for item in spans:
+        offset = int((item.start_ns - start) / total * width)
+        length = max(1, int(((item.end_ns or time.time_ns()) - item.start_ns) / total * width))
+        bar = " " * offset + "█" * min(length, width - offset)
+        details = " ".join(f"{key}={value}" for key, value in item.attributes.items()
+                           if key not in skip and value is not None)
+        lines.append(
+            f"{(item.start_ns - start) / 1e6:9.1f} ms {item.duration_ms:9.1f} ms |{bar.ljust(width)}| "
+            f"{'  ' * depth(item)}{item.name}{' ERROR ' + item.error if item.error else ''}"
+            f"{'  ' + details if details else ''}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,211 @@
+"""Current verdict per domain, served to clients with HTTP validators.
+
+Each verdict is stored with a weak ETag derived from its verdict-bearing fields
+(risk level, confidence, rationale) and the time it was last confirmed. The
+tag is weak because bodies sharing it may still differ in bookkeeping fields
+("Model Tier", "Reused Verdict") and the echoed url. A verdict is fresh for VERDICT_TTL seconds after that;
+/validate_url answers fresh verdicts (or a 304) without running the agent.
+Every content change bumps a store-wide version number so clients can ask
+for what changed since the version they hold; /verdicts/snapshot returns
+all verdicts, or the delta since a version, as zstd-compressed msgpack.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+import xxhash
+import ormsgpack
+import zstandard
+from email.utils import formatdate
+from typing import Iterable, Iterator, Optional, Tuple
+from tools.cache import CACHE_DIR
+from tools.get_domain_info import to_hostname
+
+VERDICT_STORE_PATH = os.path.join(CACHE_DIR, "verdicts.sqlite")
+VERDICT_TTL = float(os.getenv("VERDICT_TTL", str(24 * 3600)))
+# Seconds past VERDICT_TTL during which the old verdict is served while a refresh runs; 0 disables
+STALE_WHILE_REVALIDATE = float(os.getenv("VERDICT_STALE_WHILE_REVALIDATE", "0"))
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_LEVEL = 10  # level 19 is ~15% smaller but 30x slower on 100k verdicts
+# The verdict proper: what the ETag covers and what the extension needs to answer a lookup
+# locally. Bookkeeping fields ("Reused Verdict", "Model Tier") change on every run.
+VERDICT_FIELDS = ("Risk Level", "Confidence Level", "Rationale")
+SNAPSHOT_FIELDS = VERDICT_FIELDS
+
+_store = None
+
+
+def get_verdict_store() -> "VerdictStore":
+    global _store
+    if _store is None:
+        _store = VerdictStore(VERDICT_STORE_PATH)
+    return _store
+
+
+def normalize_domain(url: str) -> str:
+    hostname = to_hostname(url)
+    return hostname[4:] if hostname.startswith("www.") else hostname
+
+
+def verdict_etag(verdict: dict) -> str:
+    canonical = json.dumps({field: verdict.get(field) for field in VERDICT_FIELDS},
+                           sort_keys=True, separators=(",", ":"), default=str)
+    return f'W/"{xxhash.xxh3_64_hexdigest(canonical)}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """RFC 9110 weak comparison against an If-None-Match header value."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return any((tag[2:] if tag.startswith("W/") else tag) == opaque for tag in tags)
+
+
+class VerdictStore:
+    """SQLite table of the latest verdict per domain, with a change version."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._snapshots = {}  # (version, since) -> encoded snapshot of the current version
+        self._snapshot_lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS verdicts ("
+            " domain TEXT PRIMARY KEY,"
+            " verdict TEXT NOT NULL,"
+            " etag TEXT NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " version INTEGER NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS verdicts_version ON verdicts (version);"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _record(row) -> dict:
+        domain, verdict, etag, updated_at, version = row
+        return {
+            "domain": domain,
+            "verdict": json.loads(verdict),
+            "etag": etag,
+            "updated_at": updated_at,
+            "version": version,
+        }
+
+    def get(self, url: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT domain, verdict, etag, updated_at, version FROM verdicts WHERE domain = ?",
+                (normalize_domain(url),),
+            ).fetchone()
+        return self._record(row) if row else None
+
+    def put(self, url: str, verdict: dict, updated_at: Optional[float] = None) -> dict:
+        """Store a verdict; the version only moves when its verdict-bearing fields changed."""
+        domain = normalize_domain(url)
+        etag = verdict_etag(verdict)
+        updated_at = updated_at or time.time()
+        with self._lock:
+            # Take the write lock first so workers sharing the file never hand out the same version
+            self._conn.execute("BEGIN IMMEDIATE")
+            row = self._conn.execute("SELECT etag, version FROM verdicts WHERE domain = ?", (domain,)).fetchone()
+            if row is not None and row[0] == etag:
+                version = row[1]
+                self._conn.execute("UPDATE verdicts SET verdict = ?, updated_at = ? WHERE domain = ?",
+                                   (json.dumps(verdict, default=str), updated_at, domain))
+            else:
+                (version,) = self._conn.execute("SELECT COALESCE(MAX(version), 0) + 1 FROM verdicts").fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO verdicts (domain, verdict, etag, updated_at, version)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (domain, json.dumps(verdict, default=str), etag, updated_at, version),
+                )
+            self._conn.commit()
+        return {"domain": domain, "verdict": verdict, "etag": etag, "updated_at": updated_at, "version": version}
+
+    @property
+    def version(self) -> int:
+        with self._lock:
+            (version,) = self._conn.execute("SELECT COALESCE(MAX(version), 0) FROM verdicts").fetchone()
+        return version
+
+    def iter_since(self, version: int = 0, until: Optional[int] = None) -> Iterator[dict]:
+        """Records changed after `version` (and up to `until`), sorted by domain."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT domain, verdict, etag, updated_at, version FROM verdicts"
+                " WHERE version > ? AND version <= ? ORDER BY domain",
+                (version, until if until is not None else 2 ** 62),
+            ).fetchall()
+        for row in rows:
+            yield self._record(row)
+
+    def snapshot(self, since: int = 0) -> Tuple[int, bytes]:
+        """(version, compressed snapshot) of every verdict changed after `since`."""
+        # Held while encoding, so concurrent requests for one snapshot build it once
+        with self._snapshot_lock:
+            version = self.version
+            if len(self._snapshots) >= 32 or not any(key[0] == version for key in self._snapshots):
+                self._snapshots.clear()
+            if (version, since) not in self._snapshots:
+                self._snapshots[(version, since)] = encode_snapshot(self.iter_since(since, version), version, since)
+            return version, self._snapshots[(version, since)]
+
+
+def encode_snapshot(records: Iterable[dict], version: int, since: int = 0) -> bytes:
+    """Columnar msgpack of the records, compressed with zstd.
+
+    Columns keep each field's values next to each other (risk levels, rationale
+    phrasing), which is what lets zstd shrink 100k verdicts to a few MB.
+    """
+    columns = {"domain": [], "updated_at": [], "version": []}
+    columns.update({field: [] for field in SNAPSHOT_FIELDS})
+    for record in records:
+        columns["domain"].append(record["domain"])
+        columns["updated_at"].append(int(record["updated_at"]))
+        columns["version"].append(record["version"])
+        for field in SNAPSHOT_FIELDS:
+            columns[field].append(record["verdict"].get(field))
+    payload = {"format": SNAPSHOT_FORMAT, "version": version, "since": since, "columns": columns}
+    return zstandard.ZstdCompressor(level=SNAPSHOT_LEVEL).compress(ormsgpack.packb(payload))
+
+
+def decode_snapshot(data: bytes) -> dict:
+    """Inverse of encode_snapshot: {"version", "since", "verdicts": {domain: verdict}}."""
+    payload = ormsgpack.unpackb(zstandard.ZstdDecompressor().decompress(data))
+    if payload.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported snapshot format: {payload.get('format')}")
+    columns = payload["columns"]
+    verdicts = {}
+    for i, domain in enumerate(columns["domain"]):
+        verdicts[domain] = {field: columns[field][i] for field in SNAPSHOT_FIELDS}
+        verdicts[domain].update({"updated_at": columns["updated_at"][i], "version": columns["version"][i]})
+    return {"version": payload["version"], "since": payload["since"], "verdicts": verdicts}
+
+
+def is_fresh(record: dict, now: Optional[float] = None) -> bool:
+    return (now or time.time()) < record["updated_at"] + VERDICT_TTL
+
+
+def can_serve_stale(record: dict, now: Optional[float] = None) -> bool:
+    return STALE_WHILE_REVALIDATE > 0 and (now or time.time()) < record["updated_at"] + VERDICT_TTL + STALE_WHILE_REVALIDATE
+
+
+def cache_headers(record: dict, now: Optional[float] = None) -> dict:
+    """ETag, Last-Modified and Cache-Control reflecting the verdict's remaining freshness."""
+    max_age = max(0, int(record["updated_at"] + VERDICT_TTL - (now or time.time())))
+    cache_control = f"private, max-age={max_age}"
+    if STALE_WHILE_REVALIDATE > 0:
+        cache_control += f", stale-while-revalidate={int(STALE_WHILE_REVALIDATE)}"
+    return {
+        "ETag": record["etag"],
+        "Last-Modified": formatdate(record["updated_at"], usegmt=True),
+        "Cache-Control": cache_control,
+    }